@@ -0,0 +1,116 @@
+from typing import Dict, Optional
+import numpy as np
+
+import constants
+
+def _sequential_sum(values : np.ndarray) -> np.ndarray:
+    # Adds the time steps one after the other like the Python sum in Vizualizer, so the metrics give the same numbers
+    return np.cumsum(values, axis=-1)[..., -1] if values.shape[-1] > 0 else np.zeros(values.shape[:-1])
+
+def _energy(power : np.ndarray) -> np.ndarray:
+    # kW to kWh per time step, multiplied and divided in the order of Vizualizer, which rounds differently from * 0.25
+    return power * constants.TIME_STEP_SECONDS / 3600
+
+def grid_metrics(total_load : np.ndarray, renewable_share : np.ndarray, reference_load : Optional[np.ndarray] = None,
+                 pv_generation : Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+    """
+    Metrics of the total load of one run, shape (time steps), or of many runs at once, shape (runs, time steps)
+
+    - energy_export, energy_import (in kWh) and renewable_percentage, as Vizualizer.print_metrics_renewable_share_total_load
+    - peak_load, minimum_load and average_load (in kW), peak_to_average_ratio and daily_profile, as StreamingMetrics
+    - with reference_load: reference_peak_load, peak_reduction (relative to the reference) and reference_energy_import
+    - with pv_generation, the total PV consumption (negative, in kW) with the shape of total_load: pv_generation (in
+      kWh) and self_consumption, the share of the generated energy that is not exported
+
+    renewable_share and reference_load have one value per time step and are the same for all runs. The values have the
+    shape of total_load without its time axis.
+    """
+    total_load = np.asarray(total_load, dtype=np.float64)
+    steps = total_load.shape[-1]
+    renewable_share = np.asarray(renewable_share, dtype=np.float64)[:steps]
+    importing = total_load > 0
+    imported = np.where(importing, total_load, 0.0)
+
+    energy_import = _sequential_sum(_energy(imported))
+    energy_export = np.abs(_sequential_sum(_energy(np.where(total_load < 0, total_load, 0.0))))
+    renewable_import = _energy(_sequential_sum(imported * renewable_share))
+    peak_load = total_load.max(axis=-1)
+    average_load = total_load.mean(axis=-1)
+    days = steps // constants.AMOUNT_OF_TIME_STEPS_IN_DAY
+    with np.errstate(divide='ignore', invalid='ignore'):
+        metrics = {'energy_export': energy_export,
+                   'energy_import': energy_import,
+                   'renewable_percentage': np.where(energy_import > 0, renewable_import / energy_import * 100, np.nan),
+                   'peak_load': peak_load,
+                   'minimum_load': total_load.min(axis=-1),
+                   'average_load': average_load,
+                   'peak_to_average_ratio': np.where(average_load != 0, peak_load / average_load, np.nan),
+                   'daily_profile': total_load[..., :days * constants.AMOUNT_OF_TIME_STEPS_IN_DAY].reshape(
+                       total_load.shape[:-1] + (days, constants.AMOUNT_OF_TIME_STEPS_IN_DAY)).mean(axis=-2)}
+
+        if reference_load is not None:
+            reference_load = np.asarray(reference_load, dtype=np.float64)[:steps]
+            reference_peak_load = reference_load.max()
+            metrics['reference_peak_load'] = np.full(peak_load.shape, reference_peak_load)
+            metrics['peak_reduction'] = 1 - peak_load / reference_peak_load
+            metrics['reference_energy_import'] = np.full(peak_load.shape,
+                                                         _sequential_sum(_energy(np.maximum(reference_load, 0.0))))
+
+        if pv_generation is not None:
+            generation = - _sequential_sum(_energy(np.asarray(pv_generation, dtype=np.float64)))
+            metrics['pv_generation'] = generation
+            metrics['self_consumption'] = np.where(generation > 0, 1 - np.minimum(energy_export, generation) / generation,
+                                                   np.nan)
+    return metrics
+
+def load_duration_curve(total_load : np.ndarray) -> np.ndarray:
+    """
+    Load of every time step sorted from high to low, per run
+    """
+    return -np.sort(-np.asarray(total_load, dtype=np.float64), axis=-1)
+
+def storage_metrics(energy_history : np.ndarray, size : np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    State of charge statistics per battery or EV, from the energy (in kWh) at the start of every time step, shape
+    (time steps, houses) or (runs, time steps, houses), and the size of every asset (houses)
+
+    - soc_mean, soc_min, soc_max: statistics of energy / size
+    - soc_range: soc_max - soc_min, the part of the capacity that is used
+    - equivalent_full_cycles: the energy charged and discharged, divided by twice the size
+    """
+    soc = np.asarray(energy_history, dtype=np.float64) / np.asarray(size, dtype=np.float64)
+    soc_min = soc.min(axis=-2)
+    soc_max = soc.max(axis=-2)
+    return {'soc_mean': soc.mean(axis=-2), 'soc_min': soc_min, 'soc_max': soc_max, 'soc_range': soc_max - soc_min,
+            'equivalent_full_cycles': np.abs(np.diff(soc, axis=-2)).sum(axis=-2) / 2}
+
+def simulator_metrics(simulator) -> Dict[str, np.ndarray]:
+    """
+    grid_metrics and, when the simulator kept its history, storage_metrics of the batteries and EVs of a finished
+    simulation, with the storage metrics prefixed with batt_ and ev_
+    """
+    if simulator.fleet is not None:
+        pv = simulator.fleet.pv.consumption
+        pv_generation = pv.astype(np.float64).sum(axis=1) if pv.shape[0] == simulator.sim_length else None
+        histories = {asset: (simulator.fleet.asset_fleets_by_name[asset].energy_history,
+                             simulator.fleet.asset_fleets_by_name[asset].size) for asset in ['batt', 'ev']}
+    else:
+        houses = simulator.list_of_houses
+        pv_generation = None
+        if simulator.keep_history and len(houses) > 0:
+            pv_generation = np.stack([np.asarray(house.pv.consumption.values, dtype=np.float64) for house in houses],
+                                     axis=1).sum(axis=1)
+        histories = {}
+        for asset in ['batt', 'ev']:
+            assets = [getattr(house, asset) for house in houses]
+            histories[asset] = (None if len(assets) == 0 or assets[0].energy_history is None
+                                else np.stack([a.energy_history for a in assets], axis=1),
+                                np.array([a.size for a in assets], dtype=np.float64))
+
+    metrics = grid_metrics(simulator.total_load, simulator.ren_share, getattr(simulator, 'reference_load', None),
+                           pv_generation)
+    for asset, (energy_history, size) in histories.items():
+        if energy_history is not None:
+            for name, value in storage_metrics(energy_history, size).items():
+                metrics[f'{asset}_{name}'] = value
+    return metrics
@@ -0,0 +1,134 @@
+from typing import Dict, List, Optional
+import argparse
+import datetime
+import json
+import os.path
+import platform
+import time
+import numpy as np
+
+import constants
+import main
+from Simulator import Simulator, StrategyOrder
+from ScenarioStore import is_scenario_store, read_store_index
+from SyntheticScenario import write_synthetic_store
+
+PHASES = ['initialize', 'set_min_max_ders', 'control_strategy', 'response']
+
+def _timed(timings : Dict[str, float], phase : str, method):
+    def timed(*args, **kwargs):
+        start = time.perf_counter()
+        result = method(*args, **kwargs)
+        timings[phase] += time.perf_counter() - start
+        return result
+    return timed
+
+def ensure_synthetic_store(path_to_store : str, number_of_houses : int, number_of_days : int, seed : int = 0) -> str:
+    """
+    Generates a synthetic scenario store, unless path_to_store already holds one that is large enough
+    """
+    if is_scenario_store(path_to_store):
+        index = read_store_index(path_to_store)
+        if index['number_of_houses'] >= number_of_houses and \
+                index['length'] >= number_of_days * constants.AMOUNT_OF_TIME_STEPS_IN_DAY:
+            return path_to_store
+    print(f"Generating a synthetic scenario with {number_of_houses} houses and {number_of_days} days in {path_to_store}")
+    write_synthetic_store(path_to_store, number_of_houses, number_of_days, seed)
+    return path_to_store
+
+def benchmark_simulation(number_of_houses : int, number_of_days : int, path_to_store : str, use_fleet : bool = True,
+                         keep_history : bool = True) -> Dict:
+    """
+    Runs one simulation with the example strategies of main.py and returns the time (in seconds) spent in every phase
+    of the simulator, summed over all time steps
+    """
+    sim_length = number_of_days * constants.AMOUNT_OF_TIME_STEPS_IN_DAY
+    timings = dict.fromkeys(PHASES, 0.0)
+    simulator = Simulator(control_order=[StrategyOrder.INDIVIDUAL, StrategyOrder.HOUSEHOLD, StrategyOrder.NEIGHBORHOOD],
+                          battery_strategy=main.batt_strategy,
+                          hp_strategy=main.hp_strategy,
+                          pv_strategy=main.pv_strategy,
+                          ev_strategy=main.ev_strategy,
+                          neighborhood_strategy=main.neighborhood_strategy,
+                          house_strategy=main.house_strategy,
+                          use_fleet=use_fleet,
+                          keep_history=keep_history)
+    for phase in PHASES:
+        setattr(simulator, phase, _timed(timings, phase, getattr(simulator, phase)))
+
+    simulator.initialize(sim_length, number_of_houses, path_to_store, os.path.join(path_to_store, "reference_load.npy"))
+    start = time.perf_counter()
+    simulator.start_simulation(print_progress=False)
+    simulation_time = time.perf_counter() - start
+
+    result = {'number_of_houses': number_of_houses, 'number_of_days': number_of_days, 'use_fleet': use_fleet,
+              'keep_history': keep_history}
+    result.update(timings)
+    result['simulation'] = simulation_time
+    result['house_steps_per_second'] = number_of_houses * sim_length / simulation_time
+    return result
+
+def run_benchmarks(houses : List[int], days : List[int], path_to_store : str, use_fleet : bool = True,
+                   keep_history : bool = True, repeat : int = 1) -> Dict:
+    """
+    Benchmarks every combination of a number of houses and a number of days, and returns the results together with a
+    description of the machine. With repeat > 1 the fastest run of every combination is kept.
+    """
+    ensure_synthetic_store(path_to_store, max(houses), max(days))
+    results = []
+    for number_of_houses in houses:
+        for number_of_days in days:
+            runs = [benchmark_simulation(number_of_houses, number_of_days, path_to_store, use_fleet, keep_history)
+                    for _ in range(repeat)]
+            result = min(runs, key=lambda run: run['simulation'])
+            print(f"{number_of_houses} houses, {number_of_days} days: " +
+                  ", ".join(f"{phase} {result[phase]:.3f} s" for phase in PHASES))
+            results.append(result)
+    return {'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'processor': platform.processor(),
+            'results': results}
+
+def compare_benchmarks(baseline : Dict, benchmark : Dict):
+    """
+    Prints the speedup of every phase of benchmark relative to baseline, for the sizes that are in both
+    """
+    def key(result : Dict):
+        return result['number_of_houses'], result['number_of_days'], result['use_fleet'], result['keep_history']
+
+    baseline_results = {key(result): result for result in baseline['results']}
+    for result in benchmark['results']:
+        if key(result) not in baseline_results:
+            continue
+        old = baseline_results[key(result)]
+        print(f"{result['number_of_houses']} houses, {result['number_of_days']} days: " +
+              ", ".join(f"{phase} x{old[phase] / result[phase]:.2f}" for phase in PHASES + ['simulation']
+                        if result[phase] > 0))
+
+def main_benchmark(arguments : Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Times the phases of the simulator on synthetic scenarios")
+    parser.add_argument('--houses', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--days', type=int, nargs='+', default=[1, 30, 364])
+    parser.add_argument('--store', default="benchmark_data", help="synthetic scenario store, generated if needed")
+    parser.add_argument('--output', default="benchmark.json")
+    parser.add_argument('--compare', help="earlier benchmark output to compare with")
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--object-mode', action='store_true', help="simulate the house objects instead of the fleet")
+    parser.add_argument('--no-history', action='store_true')
+    arguments = parser.parse_args(arguments)
+
+    benchmark = run_benchmarks(arguments.houses, arguments.days, arguments.store, not arguments.object_mode,
+                               not arguments.no_history, arguments.repeat)
+    with open(arguments.output, 'w') as f:
+        json.dump(benchmark, f, indent=2)
+    print(f"Wrote {arguments.output}")
+
+    if arguments.compare is not None:
+        with open(arguments.compare, 'r') as f:
+            compare_benchmarks(json.load(f), benchmark)
+    return 0
+
+if __name__ == '__main__':
+    exit(main_benchmark())
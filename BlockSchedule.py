@@ -0,0 +1,192 @@
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+import constants
+from Fleet import Fleet, read_only
+from Validation import Validator, ValidationLevel
+
+TIME_STEP_SECONDS = constants.TIME_STEP_SECONDS
+# Asset types whose consumption a block strategy can schedule
+SCHEDULABLE_ASSETS = ['batt', 'ev']
+
+class BlockAssetView:
+    """
+    Read-only state of one asset type at the start of a block, as passed to block strategies
+
+    - energy, size, power_max: per house
+    - for the EVs also present, time_to_departure and trip_energy, with shape (horizon, houses)
+    """
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+class BlockView:
+    """
+    Data of the whole fleet for the time steps of a block, as passed to strategies decorated with @block_strategy
+
+    Arrays over time have shape (horizon, houses), with the houses in the same order as Simulator.list_of_houses.
+    """
+    def __init__(self, time_step : int, horizon : int, base_load : np.ndarray, pv_max_power : np.ndarray,
+                 batt : BlockAssetView, ev : BlockAssetView):
+        self.time_step = time_step
+        self.horizon = horizon
+        self.base_load = base_load
+        self.pv_max_power = pv_max_power
+        self.batt = batt
+        self.ev = ev
+
+def block_strategy(strategy=None, horizon : int = constants.AMOUNT_OF_TIME_STEPS_IN_DAY, assets : Tuple[str, ...] = ('batt', 'ev')):
+    """
+    Decorator that marks a strategy as a block strategy. A block strategy is called once per block of horizon time
+    steps, at the time steps that are a multiple of horizon, as
+    strategy(time_step, temperature_data, renewable_share, block : BlockView), and returns a dict with the consumption
+    (in kW) of every asset type in assets for every time step of the block, each with shape (block.horizon, houses).
+    The last block of a simulation can be shorter than horizon.
+    """
+    for asset in assets:
+        if asset not in SCHEDULABLE_ASSETS:
+            raise ValueError(f"A block strategy can only schedule {SCHEDULABLE_ASSETS}, not {asset}")
+
+    def decorate(strategy):
+        strategy.block_horizon = horizon
+        strategy.block_assets = list(assets)
+        return strategy
+
+    return decorate if strategy is None else decorate(strategy)
+
+def is_block_strategy(strategy) -> bool:
+    return getattr(strategy, 'block_horizon', None) is not None
+
+def integrate_energy(energy : np.ndarray, consumption : np.ndarray,
+                     departures : Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Energy (in kWh) of batteries or EVs that consume consumption (in kW, shape (steps, houses)), starting at energy
+
+    departures optionally are the (steps, houses, trip energies) of EV departures within the block, in time order, whose
+    trip energy is deducted at the start of the step like EVFleet.response does.
+
+    Returns the energy at the start of every step and after the last one, shape (steps + 1, houses), and the energy
+    history of every step, which is after the deduction of the trip energy. The cumulative sums add the steps one after
+    the other, which gives the same result as the per-step responses.
+    """
+    increase = consumption * TIME_STEP_SECONDS / 3600
+    start = np.cumsum(np.vstack([energy[None, :], increase]), axis=0)
+    history = start[:-1].copy()
+    if departures is not None:
+        for step, house, trip_energy in zip(*departures):
+            value = start[step, house] - trip_energy
+            value = 0.0 if value <= 0 else value
+            history[step, house] = value
+            start[step + 1:, house] = np.cumsum(np.concatenate([[value], increase[step:, house]]))[1:]
+            history[step + 1:, house] = start[step + 1:-1, house]
+    return start, history
+
+class BlockScheduler:
+    """
+    Runs a block strategy in a Simulator
+
+    At the start of every block the strategy returns the consumption of the scheduled assets for the whole block. Their
+    energy is integrated for the whole block at once and their constraints are checked at once, the first violation is
+    raised as a ConstraintViolation before the block is simulated. The other assets are still simulated step by step.
+    Every time step the scheduled consumption is written to the consumption arrays before the strategies run, and the
+    energy and energy history are written after the response, so the state of the fleet is the same as without a block
+    strategy at every time step.
+    """
+    def __init__(self, strategy, fleet : Fleet, validator : Validator, temperature_data : np.ndarray,
+                 ren_share : np.ndarray, sim_length : int):
+        self.strategy = strategy
+        self.horizon : int = strategy.block_horizon
+        self.assets : List[str] = strategy.block_assets
+        self.fleet = fleet
+        self.validator = validator
+        self.temperature_data = temperature_data
+        self.ren_share = ren_share
+        self.sim_length = sim_length
+        fleet.scheduled_assets = list(self.assets)
+        validator.scheduled_assets = list(self.assets)
+
+        self.block_start = 0
+        self.block_stop = 0
+        self.schedules : Dict[str, np.ndarray] = {}
+        self.energy : Dict[str, np.ndarray] = {}
+        self.energy_history : Dict[str, np.ndarray] = {}
+
+    def block_view(self, start : int, stop : int) -> BlockView:
+        events = self.fleet.ev.events
+        batt = BlockAssetView(energy=read_only(self.fleet.batt.energy.copy()), size=read_only(self.fleet.batt.size),
+                              power_max=read_only(self.fleet.batt.power_max))
+        ev = BlockAssetView(energy=read_only(self.fleet.ev.energy.copy()), size=read_only(self.fleet.ev.size),
+                            power_max=read_only(self.fleet.ev.power_max), present=read_only(events.present(start, stop)),
+                            time_to_departure=read_only(events.time_to_departure(start, stop)),
+                            trip_energy=read_only(events.trip_energy(start, stop)))
+        return BlockView(start, stop - start, read_only(self.fleet.base_data[start:stop]),
+                         read_only(self.fleet.pv.max_power[start:stop]), batt, ev)
+
+    def plan(self, time_step : int):
+        """
+        Calls the block strategy for the block that starts at time_step, and integrates and checks its schedules
+        """
+        stop = min((time_step // self.horizon + 1) * self.horizon, self.sim_length)
+        schedules = self.strategy(time_step, self.temperature_data, self.ren_share, self.block_view(time_step, stop))
+        shape = (stop - time_step, self.fleet.number_of_houses)
+
+        consumption = {}
+        energy = {}
+        for asset in self.assets:
+            if asset not in schedules:
+                raise ValueError(f"The block strategy did not return a schedule for {asset}")
+            asset_fleet = self.fleet.asset_fleets_by_name[asset]
+            schedule = np.asarray(schedules[asset], dtype=np.float64)
+            if schedule.shape != shape:
+                raise ValueError(f"The block strategy returned a {asset} schedule of shape {schedule.shape}, expected {shape}")
+            if np.isnan(schedule).any():
+                raise ValueError(f"The {asset} schedule of the block strategy contains NaN")
+            # stored like the consumption arrays store it, so that the energy matches the per-step response
+            self.schedules[asset] = schedule.astype(asset_fleet.consumption.dtype)
+            consumption[asset] = self.schedules[asset].astype(np.float64)
+
+            departures = None
+            if asset == 'ev':
+                events = asset_fleet.events
+                first, last = events.departure_pointer[time_step], events.departure_pointer[stop]
+                departures = (events.departure_steps[first:last] - time_step, events.departure_houses[first:last],
+                              events.departure_trip_energy[first:last])
+            self.energy[asset], self.energy_history[asset] = integrate_energy(asset_fleet.energy, consumption[asset],
+                                                                              departures)
+            energy[asset] = self.energy[asset][1:]
+
+        if self.validator.level != ValidationLevel.OFF:
+            self.validator.check_block(time_step, consumption, energy)
+        self.block_start = time_step
+        self.block_stop = stop
+
+    def reset(self):
+        """
+        Forgets the current block, after the state has been restored, so that the next time step plans a new one
+        """
+        self.block_start = 0
+        self.block_stop = 0
+
+    def before_step(self, time_step : int):
+        """
+        Plans a new block if needed, and writes the scheduled consumption of the time step
+        """
+        if time_step >= self.block_stop or time_step < self.block_start:
+            self.plan(time_step)
+        step = time_step - self.block_start
+        for asset in self.assets:
+            asset_fleet = self.fleet.asset_fleets_by_name[asset]
+            asset_fleet.consumption[asset_fleet._row(time_step)] = self.schedules[asset][step]
+
+    def after_response(self, time_step : int):
+        """
+        Writes the energy after the time step, instead of the response of the scheduled assets
+        """
+        step = time_step - self.block_start
+        for asset in self.assets:
+            asset_fleet = self.fleet.asset_fleets_by_name[asset]
+            if not np.array_equal(asset_fleet.consumption[asset_fleet._row(time_step)], self.schedules[asset][step]):
+                raise ValueError(f"The {asset} consumption at time step {time_step} was changed by a strategy, but it is "
+                                 f"scheduled by the block strategy")
+            if asset_fleet.energy_history is not None:
+                asset_fleet.energy_history[time_step] = self.energy_history[asset][step]
+            asset_fleet.energy[:] = self.energy[asset][step + 1]
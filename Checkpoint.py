@@ -0,0 +1,73 @@
+from typing import Dict, List
+import numpy as np
+
+from ModelClasses import House
+from Fleet import Fleet, ASSET_FLEET_CLASSES
+
+CHECKPOINT_VERSION = 1
+
+def get_state(list_of_houses : List[House], fleet : Fleet, total_load : np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Copies all mutable simulation state into a flat dict of arrays, named <asset>.<field>
+
+    The arrays have the same layout as in the Fleet (indexed by house, time series time-major), also when the
+    simulator runs without a fleet, so the state of one mode can be restored in the other.
+    """
+    state = {'total_load': total_load.copy(), 'house_ids': np.array([house.id for house in list_of_houses])}
+    for asset_name, asset_fleet_class in ASSET_FLEET_CLASSES.items():
+        for field in asset_fleet_class.state_fields():
+            key = f"{asset_name}.{field}"
+            if field in asset_fleet_class.history_fields and getattr(getattr(list_of_houses[0], asset_name), field) is None:
+                continue  # simulated without history
+            if fleet is not None:
+                state[key] = getattr(fleet.asset_fleets_by_name[asset_name], field).copy()
+            elif field == 'consumption':
+                state[key] = np.stack([getattr(house, asset_name).consumption.values for house in list_of_houses], axis=1)
+            elif field in asset_fleet_class.history_fields:
+                state[key] = np.stack([getattr(getattr(house, asset_name), field) for house in list_of_houses], axis=1)
+            else:
+                state[key] = np.array([getattr(getattr(house, asset_name), field) for house in list_of_houses], dtype=np.float64)
+    return state
+
+def set_state(list_of_houses : List[House], fleet : Fleet, total_load : np.ndarray, state : Dict[str, np.ndarray]):
+    """
+    Restores the state returned by get_state by copying it into the existing arrays and assets
+    """
+    house_ids = np.array([house.id for house in list_of_houses])
+    if not np.array_equal(state['house_ids'], house_ids):
+        raise ValueError(f"State is of houses {state['house_ids']}, but the simulator has houses {house_ids}")
+
+    total_load[:] = state['total_load']
+    for asset_name, asset_fleet_class in ASSET_FLEET_CLASSES.items():
+        for field in asset_fleet_class.state_fields():
+            if f"{asset_name}.{field}" not in state:
+                continue
+            value = state[f"{asset_name}.{field}"]
+            if fleet is not None:
+                getattr(fleet.asset_fleets_by_name[asset_name], field)[...] = value
+                continue
+            for index, house in enumerate(list_of_houses):
+                asset = getattr(house, asset_name)
+                if field == 'consumption':
+                    asset.consumption.values[:] = value[:, index]
+                elif field in asset_fleet_class.history_fields:
+                    getattr(asset, field)[:] = value[:, index]
+                elif field in asset_fleet_class.row_fields:
+                    setattr(asset, field, value[index].copy())
+                else:
+                    setattr(asset, field, value[index].item())
+    if fleet is not None:
+        fleet.hp.temperatures_changed()
+
+def save_checkpoint(path : str, state : Dict[str, np.ndarray], time_step : int):
+    """
+    Writes a state to a compressed .npz checkpoint, time_step is the first time step that still has to be simulated
+    """
+    np.savez_compressed(path, checkpoint_version=CHECKPOINT_VERSION, time_step=time_step, **state)
+
+def load_checkpoint(path : str) -> (Dict[str, np.ndarray], int):
+    with np.load(path) as checkpoint:
+        if int(checkpoint['checkpoint_version']) != CHECKPOINT_VERSION:
+            raise ValueError(f"Checkpoint {path} has version {int(checkpoint['checkpoint_version'])}, expected {CHECKPOINT_VERSION}")
+        state = {key: checkpoint[key] for key in checkpoint.files if key not in ['checkpoint_version', 'time_step']}
+        return state, int(checkpoint['time_step'])
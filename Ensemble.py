@@ -0,0 +1,165 @@
+from typing import Dict, List, Optional, Tuple
+import multiprocessing
+import os.path
+import numpy as np
+
+from Simulator import Simulator
+from Validation import ValidationLevel
+from ScenarioStore import is_scenario_store, cached_store
+from ScenarioExpansion import ScenarioPerturbation
+from Analytics import grid_metrics
+
+class P2Quantile:
+    """
+    Streaming estimate of the p-quantile of every element of a series of arrays with the P-square algorithm of Jain and
+    Chlamtac (1985), which keeps five markers per element instead of all values
+
+    The first five arrays are kept and give the exact quantile, after that the markers are moved with a piecewise
+    parabolic interpolation.
+    """
+    def __init__(self, p : float, shape : Tuple[int, ...]):
+        self.p = p
+        self.count = 0
+        self.heights = np.zeros((5,) + shape)
+        self.positions = np.tile(np.arange(1.0, 6.0).reshape((5,) + (1,) * len(shape)), (1,) + shape)
+        self.desired = np.array([1, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5]).reshape((5,) + (1,) * len(shape)) \
+                       * np.ones((5,) + shape)
+        self.increments = np.array([0, p / 2, p, (1 + p) / 2, 1]).reshape((5,) + (1,) * len(shape))
+
+    def update(self, values : np.ndarray):
+        if self.count < 5:
+            self.heights[self.count] = values
+            self.count += 1
+            if self.count == 5:
+                self.heights.sort(axis=0)
+            return
+        self.count += 1
+        heights, positions = self.heights, self.positions
+
+        # cell of every value, extending the extreme markers when it falls outside them
+        heights[0] = np.minimum(heights[0], values)
+        heights[4] = np.maximum(heights[4], values)
+        cell = np.clip((values[None] >= heights[1:4]).sum(axis=0), 0, 3)
+        positions[1:] += np.arange(1, 5).reshape((4,) + (1,) * values.ndim) > cell[None]
+        self.desired += self.increments
+
+        for i in range(1, 4):
+            difference = self.desired[i] - positions[i]
+            move = ((difference >= 1) & (positions[i + 1] - positions[i] > 1)) | \
+                   ((difference <= -1) & (positions[i - 1] - positions[i] < -1))
+            if not move.any():
+                continue
+            step = np.where(difference >= 0, 1.0, -1.0)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                parabolic = heights[i] + step / (positions[i + 1] - positions[i - 1]) * (
+                    (positions[i] - positions[i - 1] + step) * (heights[i + 1] - heights[i]) / (positions[i + 1] - positions[i])
+                    + (positions[i + 1] - positions[i] - step) * (heights[i] - heights[i - 1]) / (positions[i] - positions[i - 1]))
+                neighbour_height = np.where(step > 0, heights[i + 1], heights[i - 1])
+                neighbour_position = np.where(step > 0, positions[i + 1], positions[i - 1])
+                linear = heights[i] + step * (neighbour_height - heights[i]) / (neighbour_position - positions[i])
+            new_height = np.where((heights[i - 1] < parabolic) & (parabolic < heights[i + 1]), parabolic, linear)
+            heights[i] = np.where(move, new_height, heights[i])
+            positions[i] = np.where(move, positions[i] + step, positions[i])
+
+    def value(self) -> np.ndarray:
+        if self.count == 0:
+            return np.full(self.heights.shape[1:], np.nan)
+        if self.count <= 5:
+            return np.quantile(self.heights[:self.count], self.p, axis=0)
+        return self.heights[2].copy()
+
+class StreamingStatistics:
+    """
+    Mean, standard deviation, minimum, maximum and quantiles of every element of a series of arrays of the same shape,
+    updated one array at a time, so the memory does not depend on the number of arrays
+
+    The mean and variance use the update of Welford, the quantiles P2Quantile.
+    """
+    def __init__(self, shape : Tuple[int, ...], quantiles : Tuple[float, ...] = (0.05, 0.5, 0.95)):
+        self.count = 0
+        self.mean = np.zeros(shape)
+        self.sum_of_squares = np.zeros(shape)
+        self.minimum = np.full(shape, np.inf)
+        self.maximum = np.full(shape, -np.inf)
+        self.quantiles = {p: P2Quantile(p, shape) for p in quantiles}
+
+    def update(self, values : np.ndarray):
+        values = np.asarray(values, dtype=np.float64)
+        self.count += 1
+        delta = values - self.mean
+        self.mean += delta / self.count
+        self.sum_of_squares += delta * (values - self.mean)
+        np.minimum(self.minimum, values, out=self.minimum)
+        np.maximum(self.maximum, values, out=self.maximum)
+        for quantile in self.quantiles.values():
+            quantile.update(values)
+
+    def result(self) -> Dict[str, np.ndarray]:
+        """
+        mean, std (of the members, with ddof=1), min, max and q<p> for every quantile p, for example q0.5
+        """
+        result = {'mean': self.mean.copy(),
+                  'std': np.sqrt(self.sum_of_squares / (self.count - 1)) if self.count > 1 else np.zeros_like(self.mean),
+                  'min': self.minimum.copy(), 'max': self.maximum.copy()}
+        for p, quantile in self.quantiles.items():
+            result[f'q{p:g}'] = quantile.value()
+        return result
+
+def member_seeds(seed : int, number_of_members : int) -> List[np.random.SeedSequence]:
+    """
+    Independent seed sequences of the members, which only depend on seed and the index of the member
+    """
+    return np.random.SeedSequence(seed).spawn(number_of_members)
+
+def _run_member(arguments):
+    simulator_arguments, settings, seed_sequence = arguments
+    scenario_seed, expansion_seed = seed_sequence.spawn(2)
+    simulator = Simulator(use_fleet=settings['use_fleet'], validation=settings['validation'], keep_history=False,
+                          scenario_rng=np.random.default_rng(scenario_seed), perturbation=settings['perturbation'],
+                          expansion_seed=int(expansion_seed.generate_state(1)[0]), **simulator_arguments)
+    simulator.initialize(settings['sim_length'], settings['number_of_houses'], settings['path_to_data'],
+                         settings['path_to_reference_data'])
+    simulator.start_simulation(print_progress=False)
+    metrics = grid_metrics(simulator.total_load, simulator.ren_share, getattr(simulator, 'reference_load', None))
+    return {name: np.asarray(value, dtype=np.float64) for name, value in metrics.items()}, simulator.total_load
+
+def run_ensemble(simulator_arguments : Dict, sim_length : int, number_of_houses : int, path_to_data : str,
+                 path_to_reference_data : str, number_of_members : int, seed : int = 0,
+                 perturbation : Optional[ScenarioPerturbation] = None, quantiles : Tuple[float, ...] = (0.05, 0.5, 0.95),
+                 processes : Optional[int] = None, cache_dir : str = "ensemble_cache", use_fleet : bool = True,
+                 validation : ValidationLevel = ValidationLevel.FULL) -> Dict:
+    """
+    Runs number_of_members simulations with the same strategies (simulator_arguments, as the base of run_sweep) that
+    each assign the houses of the data to the simulated houses at random, and optionally perturb the data, in a pool of
+    worker processes
+
+    Every member gets its own np.random.Generator from member_seeds(seed, number_of_members), so the ensemble is the
+    same for the same seed, whatever the number of processes. The members run without history, and their total loads
+    and metrics (Analytics.grid_metrics) are added to StreamingStatistics in the order in which the members were
+    submitted, because the statistics depend on the order of the updates. The statistics need memory for the length
+    of the simulation and not for the number of members, but the results of members that finish early are held in
+    memory until all earlier members have finished, so a slow member can keep many completed results in memory.
+
+    Returns {'total_load': statistics, 'metrics': {name: statistics}}, with the statistics of StreamingStatistics.result.
+    """
+    if not is_scenario_store(path_to_data):  # shared by the workers through the OS cache, as in run_sweep
+        os.makedirs(cache_dir, exist_ok=True)
+        path_to_store = os.path.join(cache_dir, "store")
+        cached_store(path_to_data, path_to_store)  # converted again when the pickle has changed
+        path_to_data = path_to_store
+
+    settings = {'sim_length': sim_length, 'number_of_houses': number_of_houses, 'path_to_data': path_to_data,
+                'path_to_reference_data': path_to_reference_data, 'use_fleet': use_fleet, 'validation': validation,
+                'perturbation': perturbation}
+    total_load = StreamingStatistics((sim_length,), quantiles)
+    metrics : Dict[str, StreamingStatistics] = {}
+    with multiprocessing.Pool(processes) as pool:
+        members = pool.imap(_run_member, [(simulator_arguments, settings, seed_sequence)
+                                          for seed_sequence in member_seeds(seed, number_of_members)])
+        for member_metrics, member_total_load in members:
+            total_load.update(member_total_load)
+            for name, value in member_metrics.items():
+                if name not in metrics:
+                    metrics[name] = StreamingStatistics(value.shape, quantiles)
+                metrics[name].update(value)
+    return {'total_load': total_load.result(), 'metrics': {name: statistics.result() for name, statistics in metrics.items()}}
@@ -0,0 +1,190 @@
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+
+import constants
+from Fleet import ASSET_FLEET_CLASSES
+from Simulator import Simulator, is_noop_strategy
+
+HOURS_PER_STEP = constants.TIME_STEP_SECONDS / 3600
+# Asset types whose consumption the actions of an environment can set
+CONTROLLABLE_ASSETS = ['pv', 'ev', 'batt', 'hp']
+
+def non_renewable_import_reward(simulator : Simulator, time_step : int) -> float:
+    """
+    Default reward: minus the energy (in kWh) imported from non-renewable sources in the time step
+    """
+    total_load = simulator.total_load[time_step]
+    return - max(total_load, 0.0) * (1 - simulator.ren_share[time_step]) * HOURS_PER_STEP
+
+class SimulatorEnv:
+    """
+    Gym-style environment around an initialized Simulator in fleet mode, for training controllers
+
+    - reset(seed, start_day, n_days) starts an episode of n_days days at start_day, a random day when None, and returns
+      the first observation and an info dict
+    - step(actions) simulates one time step and returns (observation, reward, terminated, truncated, info)
+
+    actions is a dict with the consumption (in kW) of every controlled asset type, one value per house. The actions are
+    clipped to the min and max of the assets, and written before the strategies of the simulator run, so the strategies
+    can react to them. The strategies of the controlled assets have to be decorated with @noop_strategy.
+
+    Every episode starts from the state right after Simulator.initialize, so the simulator may not have simulated yet
+    when the environment is created. That state is copied once, and reset copies it back: the scalars of every asset,
+    and of the time series only the time steps of the previous episode.
+    """
+    def __init__(self, simulator : Simulator, controlled_assets : Tuple[str, ...] = ('ev', 'batt', 'hp'),
+                 reward : Callable[[Simulator, int], float] = non_renewable_import_reward, seed : Optional[int] = None):
+        if simulator.fleet is None:
+            raise ValueError("SimulatorEnv needs a Simulator in fleet mode, create it with use_fleet=True")
+        if simulator.block_scheduler is not None:
+            raise ValueError("SimulatorEnv does not support block strategies")
+        for asset in controlled_assets:
+            if asset not in CONTROLLABLE_ASSETS:
+                raise ValueError(f"Only {CONTROLLABLE_ASSETS} can be controlled, not {asset}")
+            strategy = getattr(simulator, f"{asset}_strategy")
+            if not is_noop_strategy(strategy):
+                raise ValueError(f"The {asset} strategy is controlled by the actions, pass a strategy decorated with @noop_strategy")
+
+        self.simulator = simulator
+        self.fleet = simulator.fleet
+        self.controlled_assets = list(controlled_assets)
+        self.reward = reward
+        self.rng = np.random.default_rng(seed)
+        self.number_of_houses = self.fleet.number_of_houses
+        self.number_of_days = simulator.sim_length // constants.AMOUNT_OF_TIME_STEPS_IN_DAY
+
+        self.pristine_state = simulator.get_state()
+        # The fleet arrays that reset restores, as (array, pristine copy, whether it has one row per time step)
+        self._restore : List[Tuple[np.ndarray, np.ndarray, bool]] = []
+        for asset_name, asset_fleet_class in ASSET_FLEET_CLASSES.items():
+            for field in asset_fleet_class.state_fields():
+                key = f"{asset_name}.{field}"
+                if key in self.pristine_state:
+                    array = getattr(self.fleet.asset_fleets_by_name[asset_name], field)
+                    per_time_step = (field == 'consumption' or field in asset_fleet_class.history_fields) \
+                                    and array.shape[0] == simulator.sim_length
+                    self._restore.append((array, self.pristine_state[key], per_time_step))
+
+        self.start_time_step = 0
+        self.stop_time_step = 0
+        self.time_step = 0
+        self._changed_start = 0
+        self._changed_stop = 0
+
+    def restore(self):
+        """
+        Copies the state of right after initialize back into the simulator
+        """
+        start, stop = self._changed_start, self._changed_stop
+        for array, pristine, per_time_step in self._restore:
+            if not per_time_step:
+                array[...] = pristine
+            elif stop > start:
+                array[start:stop] = pristine[start:stop]
+        self.simulator.total_load[start:stop] = self.pristine_state['total_load'][start:stop]
+        self.fleet.hp.temperatures_changed()
+        self._changed_start = self._changed_stop = 0
+
+    def reset(self, seed : Optional[int] = None, start_day : Optional[int] = None,
+              n_days : int = 1) -> Tuple[Dict[str, np.ndarray], Dict]:
+        if seed is not None:
+            self.rng = np.random.default_rng(seed)
+        if n_days < 1 or n_days > self.number_of_days:
+            raise ValueError(f"n_days should be between 1 and {self.number_of_days}, not {n_days}")
+        if start_day is None:
+            start_day = int(self.rng.integers(0, self.number_of_days - n_days + 1))
+        if start_day < 0 or start_day + n_days > self.number_of_days:
+            raise ValueError(f"An episode of {n_days} days cannot start at day {start_day}, the simulation has "
+                             f"{self.number_of_days} days")
+
+        self.restore()
+        self.start_time_step = start_day * constants.AMOUNT_OF_TIME_STEPS_IN_DAY
+        self.stop_time_step = self.start_time_step + n_days * constants.AMOUNT_OF_TIME_STEPS_IN_DAY
+        self.time_step = self.start_time_step
+        self._changed_start, self._changed_stop = self.start_time_step, self.stop_time_step
+        self.simulator.set_min_max_ders(self.time_step)
+        return self.observation(), {'time_step': self.time_step}
+
+    def step(self, actions : Dict[str, np.ndarray]) -> Tuple[Dict[str, np.ndarray], float, bool, bool, Dict]:
+        if self.time_step >= self.stop_time_step:
+            raise ValueError("The episode has ended, call reset first")
+        simulator = self.simulator
+        time_step = self.time_step
+        if simulator.consumption_clock is not None:
+            simulator.consumption_clock.advance(time_step)
+
+        for asset in self.controlled_assets:
+            if asset not in actions:
+                raise ValueError(f"No action for {asset}")
+            asset_fleet = self.fleet.asset_fleets_by_name[asset]
+            asset_fleet.consumption[asset_fleet._row(time_step)] = np.clip(actions[asset], asset_fleet.min, asset_fleet.max)
+
+        simulator.control_strategy(time_step)
+        simulator.total_load[time_step] = simulator.response(time_step)
+        reward = self.reward(simulator, time_step)
+
+        self.time_step += 1
+        truncated = self.time_step == self.stop_time_step
+        if not truncated:
+            simulator.set_min_max_ders(self.time_step)
+        return self.observation(), reward, False, truncated, {'time_step': time_step,
+                                                              'total_load': simulator.total_load[time_step]}
+
+    def observation(self) -> Dict[str, np.ndarray]:
+        """
+        State at the start of the current time step, one value per house unless noted otherwise. The min and max are the
+        limits of the consumption of the current time step.
+
+        - time_step, renewable_share, temperature: scalars
+        - base_load, pv_max_power
+        - <asset>_min, <asset>_max for every asset type
+        - batt_soc, ev_soc, ev_present, ev_time_to_departure
+        - hp_tank_T, hp_house_temperature
+        """
+        fleet = self.fleet
+        time_step = min(self.time_step, self.stop_time_step - 1)
+        observation = {'time_step': np.array(self.time_step),
+                       'renewable_share': np.array(self.simulator.ren_share[time_step], dtype=np.float64),
+                       'temperature': np.array(self.simulator.temperature_data[time_step], dtype=np.float64),
+                       'base_load': fleet.base_data[time_step].astype(np.float64),
+                       'pv_max_power': fleet.pv.max_power[time_step].astype(np.float64)}
+        for asset, asset_fleet in fleet.asset_fleets_by_name.items():
+            observation[f'{asset}_min'] = asset_fleet.min.copy()
+            observation[f'{asset}_max'] = asset_fleet.max.copy()
+        observation['batt_soc'] = fleet.batt.energy / fleet.batt.size
+        observation['ev_soc'] = fleet.ev.energy / fleet.ev.size
+        observation['ev_present'] = fleet.ev.events.present_at(time_step).astype(np.float64)
+        observation['ev_time_to_departure'] = fleet.ev.events.time_to_departure_at(time_step).astype(np.float64)
+        observation['hp_tank_T'] = fleet.hp.tank_T.copy()
+        observation['hp_house_temperature'] = fleet.hp.temperatures[:, 1].copy()
+        return observation
+
+class VectorSimulatorEnv:
+    """
+    Several SimulatorEnvs stepped together in one process, with observations, rewards and actions stacked along a first
+    axis of length number_of_envs
+
+    make_env is called number_of_envs times and returns a new SimulatorEnv every time, each with its own Simulator. All
+    environments run episodes of the same length, so they end at the same time step.
+    """
+    def __init__(self, make_env : Callable[[], SimulatorEnv], number_of_envs : int):
+        self.envs = [make_env() for _ in range(number_of_envs)]
+        self.number_of_envs = number_of_envs
+
+    def reset(self, seed : Optional[int] = None, start_day : Optional[int] = None,
+              n_days : int = 1) -> Tuple[Dict[str, np.ndarray], Dict]:
+        # independent random streams per environment, that are reproducible from one seed
+        seeds = [None] * self.number_of_envs if seed is None else np.random.SeedSequence(seed).spawn(self.number_of_envs)
+        results = [env.reset(None if env_seed is None else env_seed.generate_state(1)[0], start_day, n_days)
+                   for env, env_seed in zip(self.envs, seeds)]
+        return _stack([observation for observation, _ in results]), {'time_step': np.array([info['time_step'] for _, info in results])}
+
+    def step(self, actions : Dict[str, np.ndarray]) -> Tuple[Dict[str, np.ndarray], np.ndarray, np.ndarray, np.ndarray, Dict]:
+        results = [env.step({asset: action[index] for asset, action in actions.items()})
+                   for index, env in enumerate(self.envs)]
+        observations, rewards, terminated, truncated, infos = zip(*results)
+        return _stack(list(observations)), np.array(rewards), np.array(terminated), np.array(truncated), \
+            {name: np.array([info[name] for info in infos]) for name in infos[0].keys()}
+
+def _stack(observations : List[Dict[str, np.ndarray]]) -> Dict[str, np.ndarray]:
+    return {name: np.stack([observation[name] for observation in observations]) for name in observations[0].keys()}
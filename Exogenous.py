@@ -0,0 +1,218 @@
+from typing import List, Optional, Tuple
+import numpy as np
+
+from ModelClasses import House
+
+class ExogenousTable:
+    """
+    Per time step quantities that do not depend on the control decisions, computed once for the whole horizon
+
+    Arrays over houses are time-major, with shape (sim_length, number_of_houses), in the order of the houses.
+    - cop_series: COP at every distinct tank_T_set (the set_points) and the ambient temperature, shape (sim_length,
+      set points), computed when it is first used. cop_at and cop_schedule give the COP of every heat pump at its
+      tank_T_set, as used by set_min_max and response. tank_T_set holds the set points of the heat pumps, one whose
+      set point has been changed calculates its COP itself.
+    - base_load_total, pv_max_power_total: sums over all houses
+    - ev_events: arrivals, departures and sessions of the EVs, see EVEventIndex
+    """
+    def __init__(self, houses : List[House], sim_length : int, temperature_data : np.ndarray):
+        self.sim_length = sim_length
+        self.T_ambient = np.asarray(temperature_data[:sim_length], dtype=np.float64)
+        self.tank_T_set = np.array([house.hp.tank_T_set for house in houses], dtype=np.float64)
+        # Most houses share the same set point, so the COP is kept once per distinct set point
+        self.set_points, self.set_point_index = np.unique(self.tank_T_set, return_inverse=True)
+        self._cop_series : Optional[np.ndarray] = None
+
+        self.base_load_total = np.zeros(sim_length)
+        self.pv_max_power_total = np.zeros(sim_length)
+        for house in houses:
+            self.base_load_total += house.base_data[:sim_length]
+            self.pv_max_power_total += house.pv.max_power[:sim_length]
+        self.ev_events = EVEventIndex(houses, sim_length)
+
+    @staticmethod
+    def cop(T_tank : float, T_out : float) -> float:
+        # Same formula as Heatpump.cop
+        return 8.736555867367798 - 0.18997851 * (T_tank - T_out) + 0.00125921 * (T_tank - T_out) ** 2
+
+    @property
+    def cop_series(self) -> np.ndarray:
+        if self._cop_series is None:
+            # Evaluated per time step on scalars, like Heatpump.cop, because the scalar ** 2 can differ in the last bit
+            # from the vectorized one
+            self._cop_series = np.array([[self.cop(float(tank_T_set), T_out) for tank_T_set in self.set_points]
+                                         for T_out in self.T_ambient]).reshape(self.sim_length, len(self.set_points))
+        return self._cop_series
+
+    def cop_at(self, time_step : int) -> np.ndarray:
+        """
+        COP of every heat pump at its tank_T_set in the time step, shape (houses)
+        """
+        return self.cop_series[time_step, self.set_point_index]
+
+    def cop_schedule(self, time_step : int, steps : int) -> np.ndarray:
+        """
+        cop_at for steps time steps from time_step on, shape (steps, houses)
+        """
+        return self.cop_series[time_step:time_step + steps][:, self.set_point_index]
+
+    def attach(self, houses : List[House]):
+        """
+        Gives every heat pump the COP table and the index of its set point in it, and every EV the event index
+        """
+        for index, house in enumerate(houses):
+            house.ev.events = self.ev_events
+            house.ev.events_index = index
+            house.hp.cop_table = self
+            house.hp.cop_table_index = int(self.set_point_index[index])
+            house.hp.cop_table_tank_T_set = self.tank_T_set[index]
+
+class EVEventIndex:
+    """
+    Arrivals, departures and sessions of all EVs, built once from their sessions
+
+    A stay of an EV at home with one session number is kept as a run, sorted by house and time step: run_house,
+    run_start, run_stop (the first time step after the run), run_leave (T_leave of the session) and run_trip_energy.
+    The runs of house h are [house_pointer[h]:house_pointer[h + 1]]. Everything else is computed from the runs when it
+    is asked for, so the memory grows with the number of sessions and not with sim_length * houses.
+
+    - departures_at(time_step), arrivals_at(time_step): indices of the EVs that leave or arrive at the time step, in
+      increasing order. A departure also has the energy of its trip, which response deducts.
+    - present_at(time_step): mask of the EVs that are at home
+    - time_to_departure_at(time_step): number of time steps until the EV leaves, 0 when it is not at home
+    - trip_energy_at(time_step): energy (in kWh) of the trip at the end of the current session, 0 when the EV is not
+      at home
+    - present(start, stop), time_to_departure(start, stop), trip_energy(start, stop): the same for the time steps
+      [start, stop), shape (stop - start, houses)
+    """
+    def __init__(self, houses : List[House], sim_length : int):
+        self.sim_length = sim_length
+        self.number_of_houses = len(houses)
+        runs = {name: [] for name in ['house', 'start', 'stop', 'leave', 'trip_energy', 'departure', 'arrival']}
+        for index, house in enumerate(houses):
+            session = np.asarray(house.ev.session[:sim_length]).astype(int)
+            number_of_sessions = max(1, len(house.ev.session_trip_energy), len(house.ev.session_leave))
+            session_trip_energy = np.zeros(number_of_sessions)
+            session_trip_energy[:len(house.ev.session_trip_energy)] = house.ev.session_trip_energy
+            session_leave = np.zeros(number_of_sessions, dtype=int)
+            session_leave[:len(house.ev.session_leave)] = house.ev.session_leave
+
+            change = np.flatnonzero(session[1:] != session[:-1]) + 1
+            start = np.concatenate([[0], change])
+            stop = np.concatenate([change, [sim_length]])
+            at_home = session[start] != -1
+            start, stop = start[at_home], stop[at_home]
+            current_session = session[start]
+            runs['house'].append(np.full(start.size, index))
+            runs['start'].append(start)
+            runs['stop'].append(stop)
+            runs['leave'].append(session_leave[current_session])
+            runs['trip_energy'].append(session_trip_energy[current_session])
+            # a run ends in a departure if the EV is away afterwards, and starts with an arrival if it was away before
+            runs['departure'].append((stop < sim_length) & (session[np.minimum(stop, sim_length - 1)] == -1))
+            runs['arrival'].append((start > 0) & (session[np.maximum(start - 1, 0)] == -1))
+        runs = {name: np.concatenate(value) if len(value) > 0 else np.zeros(0, dtype=int) for name, value in runs.items()}
+        self.run_house = runs['house'].astype(int)
+        self.run_start = runs['start'].astype(int)
+        self.run_stop = runs['stop'].astype(int)
+        self.run_leave = runs['leave'].astype(int)
+        self.run_trip_energy = runs['trip_energy'].astype(np.float64)
+        self.house_pointer = np.searchsorted(self.run_house, np.arange(self.number_of_houses + 1))
+        # runs are found per time step by their key house * (sim_length + 1) + start, which increases over the runs. The
+        # stop keys start with -1 for the time steps before the first run, and the values end with 0 for run -1.
+        self.run_key = self.run_house * (sim_length + 1) + self.run_start
+        self.house_key = np.arange(self.number_of_houses) * (sim_length + 1)
+        self._stop_key = np.concatenate([[-1], self.run_house * (sim_length + 1) + self.run_stop])
+        self._leave = np.append(self.run_leave, 0)
+        self._trip_energy = np.append(self.run_trip_energy, 0.0)
+        self.current_time_step = None
+        self.current_runs = None
+
+        # Compressed per time step: the events of time_step t are [pointer[t]:pointer[t + 1]]
+        departure = np.flatnonzero(runs['departure'].astype(bool))
+        order = np.lexsort((self.run_house[departure], self.run_stop[departure]))
+        self.departure_steps = self.run_stop[departure][order]
+        self.departure_houses = self.run_house[departure][order]
+        self.departure_pointer = np.searchsorted(self.departure_steps, np.arange(sim_length + 1))
+        self.departure_trip_energy = self.run_trip_energy[departure][order]
+        arrival = np.flatnonzero(runs['arrival'].astype(bool))
+        order = np.lexsort((self.run_house[arrival], self.run_start[arrival]))
+        arrival_steps = self.run_start[arrival][order]
+        self.arrival_houses = self.run_house[arrival][order]
+        self.arrival_pointer = np.searchsorted(arrival_steps, np.arange(sim_length + 1))
+
+    def runs_at(self, time_step : int) -> np.ndarray:
+        """
+        Index of the run of every house at time_step, -1 when its EV is not at home. The last time step is cached, as
+        the fleet asks for it several times per time step.
+        """
+        if self.current_time_step != time_step:
+            key = self.house_key + time_step
+            # the last run that starts at or before the time step is at home if it stops after it, and then also
+            # belongs to the house, as the runs of earlier houses stop at smaller keys
+            candidate = np.searchsorted(self.run_key, key, side='right')
+            self.current_runs = np.where(key < self._stop_key[candidate], candidate - 1, -1)
+            self.current_time_step = time_step
+        return self.current_runs
+
+    def present_at(self, time_step : int) -> np.ndarray:
+        return self.runs_at(time_step) != -1
+
+    def time_to_departure_at(self, time_step : int) -> np.ndarray:
+        runs = self.runs_at(time_step)
+        return np.where(runs != -1, self._leave[runs] - time_step, 0)
+
+    def trip_energy_at(self, time_step : int) -> np.ndarray:
+        return self._trip_energy[self.runs_at(time_step)]
+
+    def run_of(self, house : int, time_step : int) -> int:
+        """
+        Index of the run of one house at time_step, -1 when its EV is not at home
+        """
+        first, last = self.house_pointer[house], self.house_pointer[house + 1]
+        run = first + int(np.searchsorted(self.run_start[first:last], time_step, side='right')) - 1
+        return run if run >= first and self.run_stop[run] > time_step else -1
+
+    def time_to_departure_of(self, house : int, time_step : int) -> int:
+        run = self.run_of(house, time_step)
+        return 0 if run == -1 else int(self.run_leave[run]) - time_step
+
+    def trip_energy_of(self, house : int, time_step : int) -> float:
+        run = self.run_of(house, time_step)
+        return 0.0 if run == -1 else float(self.run_trip_energy[run])
+
+    def _cells(self, start : int, stop : int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # run, row (time step - start) and house of every cell of [start, stop) in which an EV is at home
+        runs = np.flatnonzero((self.run_stop > start) & (self.run_start < stop))
+        first = np.maximum(self.run_start[runs], start) - start
+        lengths = np.minimum(self.run_stop[runs], stop) - start - first
+        cell_runs = np.repeat(runs, lengths)
+        rows = np.repeat(first - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        return cell_runs, rows, self.run_house[cell_runs]
+
+    def present(self, start : int, stop : int) -> np.ndarray:
+        present = np.zeros((stop - start, self.number_of_houses), dtype=bool)
+        _, rows, houses = self._cells(start, stop)
+        present[rows, houses] = True
+        return present
+
+    def time_to_departure(self, start : int, stop : int) -> np.ndarray:
+        time_to_departure = np.zeros((stop - start, self.number_of_houses), dtype=int)
+        runs, rows, houses = self._cells(start, stop)
+        time_to_departure[rows, houses] = self.run_leave[runs] - start - rows
+        return time_to_departure
+
+    def trip_energy(self, start : int, stop : int) -> np.ndarray:
+        trip_energy = np.zeros((stop - start, self.number_of_houses))
+        runs, rows, houses = self._cells(start, stop)
+        trip_energy[rows, houses] = self.run_trip_energy[runs]
+        return trip_energy
+
+    def departures_at(self, time_step : int) -> np.ndarray:
+        return self.departure_houses[self.departure_pointer[time_step]:self.departure_pointer[time_step + 1]]
+
+    def departure_trip_energies_at(self, time_step : int) -> np.ndarray:
+        return self.departure_trip_energy[self.departure_pointer[time_step]:self.departure_pointer[time_step + 1]]
+
+    def arrivals_at(self, time_step : int) -> np.ndarray:
+        return self.arrival_houses[self.arrival_pointer[time_step]:self.arrival_pointer[time_step + 1]]
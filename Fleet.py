@@ -0,0 +1,569 @@
+from typing import List, Dict, Optional, Union
+import functools
+import numpy as np
+
+import constants
+from ModelClasses import House, PVInstallation, EVInstallation, Battery, Heatpump, ConsumptionBuffer, UnsetConsumptionError, \
+    ConstraintViolation
+from ThermalModel import BatchedThermalModel
+from Exogenous import ExogenousTable, EVEventIndex
+from Profiler import no_measurement
+from ScenarioExpansion import ScenarioExpansion
+
+TIME_STEP_SECONDS = constants.TIME_STEP_SECONDS
+
+class FleetAttribute:
+    """
+    Scalar attribute of an asset view that lives in one slot of a fleet-wide array
+    """
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        return getattr(obj._fleet, self.name).item(obj._fleet_index)
+
+    def __set__(self, obj, value):
+        getattr(obj._fleet, self.name)[obj._fleet_index] = value
+
+class FleetRow(FleetAttribute):
+    """
+    Vector attribute of an asset view that lives in one row of a fleet-wide 2-D array
+    """
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        return getattr(obj._fleet, self.name)[obj._fleet_index]
+
+def read_only(array : np.ndarray) -> np.ndarray:
+    view = array.view()
+    view.flags.writeable = False
+    return view
+
+class AssetStepView:
+    """
+    Fleet-wide arrays of one asset type at one time step, as passed to fleet strategies
+
+    - min, max: the flexibility of every asset, as set by set_min_max
+    - consumption: writable consumption of every asset at this time step, assign to it with consumption[...] = ...
+    - other attributes depend on the asset type and are read only
+    """
+    def __init__(self, min : np.ndarray, max : np.ndarray, consumption : np.ndarray, **kwargs):
+        self.min = min
+        self.max = max
+        self.consumption = consumption
+        self.__dict__.update(kwargs)
+
+class FleetStepView:
+    """
+    State of the whole fleet at one time step, as passed to strategies decorated with @fleet_strategy
+
+    All arrays are indexed by house, in the same order as Simulator.list_of_houses. fleet is the whole Fleet, for
+    strategies that plan ahead with the scenario data of the coming time steps.
+    """
+    def __init__(self, time_step : int, base_load : np.ndarray, pv : AssetStepView, ev : AssetStepView,
+                 batt : AssetStepView, hp : AssetStepView, fleet : Optional['Fleet'] = None):
+        self.time_step = time_step
+        self.fleet = fleet
+        self.base_load = base_load
+        self.pv = pv
+        self.ev = ev
+        self.batt = batt
+        self.hp = hp
+
+def fleet_strategy(strategy=None, aggregates : Optional[Dict] = None):
+    """
+    Decorator that marks a neighborhood strategy as a fleet strategy. A fleet strategy is called as
+    strategy(time_step, temperature_data, renewable_share, fleet : FleetStepView) instead of receiving lists of assets.
+
+    A fleet strategy that only needs neighborhood-wide sums can declare them, for example
+    @fleet_strategy(aggregates={'base_load': lambda fleet: fleet.base_load.sum()}). It is then called with an extra
+    argument aggregates, a dict with the sum of every declared function over all houses. Such a strategy can run in a
+    ShardedSimulator, where every worker only sees its own houses in fleet.
+    """
+    def decorate(strategy):
+        strategy.fleet_strategy = True
+        strategy.fleet_aggregates = aggregates
+        return strategy
+
+    return decorate if strategy is None else decorate(strategy)
+
+def is_fleet_strategy(strategy) -> bool:
+    return getattr(strategy, 'fleet_strategy', False)
+
+def strategy_aggregates(strategy) -> Optional[Dict]:
+    return getattr(strategy, 'fleet_aggregates', None)
+
+class AssetFleet:
+    """
+    Base class for the fleet-wide state of one asset type
+
+    Every quantity is stored in a contiguous array indexed by house. Time series are stored time-major, with shape
+    (sim_length, number_of_houses), so that the values of one time step are contiguous.
+    """
+    view_class = None
+    scalar_fields : List[str] = ['min', 'max']
+    row_fields : List[str] = []
+    series_fields : List[str] = []
+    history_fields : List[str] = []  # series fields that the simulation writes to, the others are scenario data
+    # Whether response checks the constraints, a Simulator turns this off and validates the fleet itself
+    check_constraints = True
+
+    def __init__(self, assets : List, sim_length : int):
+        self.assets = assets
+        self.sim_length = sim_length
+        self.number_of_assets = len(assets)
+        self.consumption = np.stack([asset.consumption.values for asset in assets], axis=1)
+        # Without history the consumption is a ring of the last clock.window time steps
+        self.consumption_clock = assets[0].consumption.clock if len(assets) > 0 else None
+
+        for name in self.scalar_fields:
+            setattr(self, name, np.array([getattr(asset, name) for asset in assets], dtype=np.float64))
+        for name in self.row_fields:
+            setattr(self, name, np.array([getattr(asset, name) for asset in assets], dtype=np.float64))
+        for name in self.series_fields:
+            series = [getattr(asset, name) for asset in assets]
+            setattr(self, name, None if series[0] is None else np.stack(series, axis=1))
+
+    def bind(self):
+        """
+        Turns every asset into a thin view on the fleet arrays, so that strategies written for single assets keep working
+        """
+        for index, asset in enumerate(self.assets):
+            for name in self.scalar_fields + self.row_fields:
+                asset.__dict__.pop(name, None)
+            asset.__class__ = self.view_class
+            asset._fleet = self
+            asset._fleet_index = index
+            for name in self.series_fields:
+                series = getattr(self, name)
+                asset.__dict__[name] = None if series is None else series[:, index]
+            asset.__dict__['consumption'] = ConsumptionBuffer(self.consumption[:, index], self.consumption_clock)
+
+    @classmethod
+    def state_fields(cls) -> List[str]:
+        """
+        Names of everything that changes during a simulation, which is what a checkpoint stores
+        """
+        return cls.scalar_fields + cls.row_fields + ['consumption'] + cls.history_fields
+
+    def set_min_max(self, time_step : int):
+        pass
+
+    def response(self, time_step : int):
+        pass
+
+    def check_response(self, time_step : int):
+        pass
+
+    def step_view(self, time_step : int) -> AssetStepView:
+        return AssetStepView(read_only(self.min), read_only(self.max), self.consumption[self._row(time_step)],
+                             **self._step_fields(time_step))
+
+    def _step_fields(self, time_step : int) -> Dict[str, np.ndarray]:
+        return {}
+
+    def _row(self, time_step : int) -> int:
+        # row of the consumption array that holds time_step, only differs from time_step without history
+        return time_step % self.consumption.shape[0]
+
+    def _consumption(self, time_step : int) -> np.ndarray:
+        consumption = self.consumption[self._row(time_step)]
+        if np.isnan(consumption).any():
+            asset = self.assets[int(np.argmax(np.isnan(consumption)))]
+            raise UnsetConsumptionError(f"consumption of {self.view_class.__base__.__name__} {asset.id} at time step {time_step} has not been set")
+        return consumption.astype(np.float64)
+
+    def _raise_first(self, violations : np.ndarray, message : str, time_step : int):
+        # Same error as the per-asset check_response, raised for the first asset that violates the constraint
+        if violations.any():
+            asset_id = self.assets[int(np.argmax(violations))].id
+            raise ConstraintViolation(message.format(asset_id), asset_id, time_step)
+
+class FleetTemperatures(FleetRow):
+    """
+    Temperatures of a heat pump view, assigning them invalidates the cached free temperatures of the fleet
+    """
+    def __set__(self, obj, value):
+        super().__set__(obj, value)
+        obj._fleet.temperatures_changed()
+
+class PVView(PVInstallation):
+    min = FleetAttribute()
+    max = FleetAttribute()
+
+class PVFleet(AssetFleet):
+    view_class = PVView
+    series_fields = ['max_power']
+
+    def set_min_max(self, time_step : int):
+        self.min[:] = 0.0
+        self.max[:] = self.max_power[time_step]
+
+    def response(self, time_step : int):
+        if self.check_constraints:
+            self.check_response(time_step)
+
+    def check_response(self, time_step : int):
+        consumption = self._consumption(time_step)
+        self._raise_first(np.round(consumption, 4) > 0.0, "PV generation should be < 0", time_step)
+        self._raise_first(np.round(consumption - self.max_power[time_step], 4) < 0.0,
+                          "PV generation should be lower than max power", time_step)
+
+    def _step_fields(self, time_step : int) -> Dict[str, np.ndarray]:
+        return {'max_power': read_only(self.max_power[time_step])}
+
+class EVView(EVInstallation):
+    min = FleetAttribute()
+    max = FleetAttribute()
+    energy = FleetAttribute()
+    power_max = FleetAttribute()
+    size = FleetAttribute()
+    min_charge = FleetAttribute()
+
+class EVFleet(AssetFleet):
+    view_class = EVView
+    scalar_fields = ['min', 'max', 'energy', 'power_max', 'size', 'min_charge']
+    series_fields = ['energy_history', 'session']
+    history_fields = ['energy_history']
+
+    def __init__(self, assets : List[EVInstallation], sim_length : int, events : EVEventIndex):
+        super().__init__(assets, sim_length)
+        self.events = events
+
+    def set_min_max(self, time_step : int):
+        self.min[:] = 0.0
+        energy_to_charge = np.maximum(0, self.size - self.energy)  # in kWh
+        power_to_charge = energy_to_charge / (TIME_STEP_SECONDS / 3600)  # power required to charge all energy this step in kW
+        self.max[:] = np.where(self.events.present_at(time_step), np.minimum(self.power_max, power_to_charge), 0.0)
+
+    def _step_fields(self, time_step : int) -> Dict[str, np.ndarray]:
+        return {'energy': read_only(self.energy), 'size': read_only(self.size), 'power_max': read_only(self.power_max),
+                'present': read_only(self.events.present_at(time_step)),
+                'time_to_departure': read_only(self.events.time_to_departure_at(time_step)),
+                'trip_energy': read_only(self.events.trip_energy_at(time_step))}
+
+    def response(self, time_step : int):
+        consumption = self._consumption(time_step)
+        # substract the energy lost during driving from the EVs that left the house this timestep
+        left = self.events.departures_at(time_step)
+        if left.size > 0:
+            self.energy[left] -= self.events.departure_trip_energies_at(time_step)
+            self.energy[left] = np.where(self.energy[left] <= 0, 0, self.energy[left])
+
+        if self.energy_history is not None:
+            self.energy_history[time_step] = self.energy
+        self.energy += consumption * TIME_STEP_SECONDS / 3600
+
+        if self.check_constraints:
+            self.check_response(time_step)
+
+    def check_response(self, time_step : int):
+        consumption = np.round(self._consumption(time_step), 4)
+        energy = np.round(self.energy, 4)
+        self._raise_first(consumption < 0.0, "Consumption of EV should be above 0.0", time_step)
+        self._raise_first(consumption > self.power_max, "Consumption of EV should be below power_max", time_step)
+        self._raise_first(energy < 0.0, "Energy in EV {} is below 0", time_step)
+        self._raise_first(energy > self.size, "Energy in EV {} is above size", time_step)
+
+class BatteryView(Battery):
+    min = FleetAttribute()
+    max = FleetAttribute()
+    energy = FleetAttribute()
+    power_max = FleetAttribute()
+    size = FleetAttribute()
+
+class BatteryFleet(AssetFleet):
+    view_class = BatteryView
+    scalar_fields = ['min', 'max', 'energy', 'power_max', 'size']
+    series_fields = ['energy_history']
+    history_fields = ['energy_history']
+
+    def set_min_max(self, time_step : int):
+        # Min Strategy (discharge, negative)
+        power_to_charge = - self.energy / (TIME_STEP_SECONDS / 3600)  # power needed to empty the battery this time step
+        self.min[:] = np.maximum(power_to_charge, - self.power_max)
+
+        # Max Strategy (charge, positive)
+        power_to_charge = (self.size - self.energy) / (TIME_STEP_SECONDS / 3600)  # power needed to fill the battery this time step
+        self.max[:] = np.minimum(power_to_charge, self.power_max)
+
+    def _step_fields(self, time_step : int) -> Dict[str, np.ndarray]:
+        return {'energy': read_only(self.energy), 'size': read_only(self.size), 'power_max': read_only(self.power_max)}
+
+    def response(self, time_step : int):
+        if self.energy_history is not None:
+            self.energy_history[time_step] = self.energy
+        self.energy += self._consumption(time_step) * TIME_STEP_SECONDS / 3600
+
+        if self.check_constraints:
+            self.check_response(time_step)
+
+    def check_response(self, time_step : int):
+        consumption = np.round(self._consumption(time_step), 4)
+        energy = np.round(self.energy, 4)
+        self._raise_first(consumption < - self.power_max, "Discharging power should be greater than -power_max", time_step)
+        self._raise_first(consumption > self.power_max, "Charging power should be smaller than power_max", time_step)
+        self._raise_first(energy < 0.0, "Energy in battery {} is below 0", time_step)
+        self._raise_first(energy > self.size, "Energy in battery {} is above size", time_step)
+
+class HeatpumpView(Heatpump):
+    min = FleetAttribute()
+    max = FleetAttribute()
+    tank_T = FleetAttribute()
+    T_set = FleetAttribute()
+    T_min = FleetAttribute()
+    T_max = FleetAttribute()
+    nominal_power = FleetAttribute()
+    tank_mass = FleetAttribute()
+    heat_capacity_water = FleetAttribute()
+    tank_T_min_limit = FleetAttribute()
+    tank_T_max_limit = FleetAttribute()
+    tank_T_set = FleetAttribute()
+    temperatures = FleetTemperatures()
+
+    def free_temperatures(self, time_step : int) -> np.ndarray:
+        # Row of the fleet-wide cache, which gives the same numbers as the per-house calculation
+        return self._fleet.free_temperatures(time_step)[self._fleet_index]
+
+class HeatpumpFleet(AssetFleet):
+    view_class = HeatpumpView
+    scalar_fields = ['min', 'max', 'tank_T', 'T_set', 'T_min', 'T_max', 'nominal_power', 'tank_mass',
+                     'heat_capacity_water', 'tank_T_min_limit', 'tank_T_max_limit', 'tank_T_set']
+    row_fields = ['temperatures']
+
+    def __init__(self, assets : List[Heatpump], sim_length : int, T_ambient : np.ndarray, hp_data : Dict,
+                 exogenous : ExogenousTable):
+        super().__init__(assets, sim_length)
+        self.T_ambient = T_ambient
+        self.thermal_model = BatchedThermalModel(hp_data, [hp.parameter_index for hp in assets])
+        self.cop_table = exogenous
+        self.cop_table_tank_T_set = exogenous.tank_T_set
+        # Increased whenever the temperatures change, which invalidates the cached free temperatures
+        self.temperatures_version = 0
+        self._free_temperatures : Optional[np.ndarray] = None
+        self._free_temperatures_key = None
+
+    def cop(self, T_tank : np.ndarray, T_out : float) -> np.ndarray:
+        return 8.736555867367798 - 0.18997851 * (T_tank - T_out) + 0.00125921 * (T_tank - T_out) ** 2
+
+    def cop_at_tank_T_set(self, time_step : int) -> np.ndarray:
+        """
+        cop(self.tank_T_set, T_ambient) of every heat pump at the time step, from the precomputed table unless a
+        tank_T_set has been changed
+        """
+        if np.array_equal(self.tank_T_set, self.cop_table_tank_T_set):
+            return self.cop_table.cop_at(time_step)
+        return self.cop(self.tank_T_set, self.T_ambient[time_step])
+
+    def cop_schedule(self, time_step : int, steps : int) -> np.ndarray:
+        """
+        cop_at_tank_T_set for the steps time steps from time_step on, shape (steps, houses)
+        """
+        if np.array_equal(self.tank_T_set, self.cop_table_tank_T_set):
+            return self.cop_table.cop_schedule(time_step, steps)
+        return self.cop(self.tank_T_set[None, :], self.T_ambient[time_step:time_step + steps, None])
+
+    def simulate_schedule(self, time_step : int, consumption : np.ndarray):
+        """
+        House temperatures (steps, houses, nodes), tank temperatures and heat (in J) given to the houses (steps, houses)
+        if the heat pumps consume consumption (in kW, shape (steps, houses)) from time_step on, without changing any
+        state. consumption can also have shape (steps, houses, candidates), see BatchedThermalModel.simulate_schedule.
+        """
+        consumption = np.asarray(consumption, dtype=np.float64)
+        cop = self.cop_schedule(time_step, consumption.shape[0])
+        heat_to_tank = (consumption * TIME_STEP_SECONDS) * (cop if consumption.ndim == 2 else cop[:, :, None]) * 1000
+        return self.thermal_model.simulate_schedule(time_step, self.temperatures, self.tank_T, heat_to_tank, self.T_set,
+                                                    self.tank_mass * self.heat_capacity_water, self.tank_T_min_limit)
+
+    def free_temperatures(self, time_step : int) -> np.ndarray:
+        """
+        Temperatures of all houses at the end of the time step if they are not heated, shape (houses, nodes). Calculated
+        once per time step and cached until the temperatures change. The returned array is read only.
+        """
+        key = (time_step, self.temperatures_version)
+        if self._free_temperatures_key != key:
+            self._free_temperatures = read_only(self.thermal_model.free_temperatures(time_step, self.temperatures))
+            self._free_temperatures_key = key
+        return self._free_temperatures
+
+    def temperatures_changed(self):
+        self.temperatures_version += 1
+
+    def calculate_heat_demand_house(self, time_step : int, house_temperature : np.ndarray) -> np.ndarray:
+        """
+        Heat (in J) required by every house to reach house_temperature (in K)
+        """
+        return self.thermal_model.heat_demand_from_free_temperatures(self.free_temperatures(time_step), house_temperature)
+
+    def update_house_temperatures(self, time_step : int, heat_power_to_house : np.ndarray):
+        self.thermal_model.update_temperatures(time_step, self.temperatures, heat_power_to_house)
+        self.temperatures_changed()
+
+    def set_min_max(self, time_step : int):
+        # Calculate the amount of heat needed to keep the house temperature constant
+        heat_demand_house = self.calculate_heat_demand_house(time_step, self.T_set)
+
+        # Calculate the tank temperature as a result of heating the house
+        tank_T_difference_no_hp = heat_demand_house / (self.tank_mass * self.heat_capacity_water)
+        tank_T_no_hp = self.tank_T - tank_T_difference_no_hp
+
+        # Min strategy: try to heat the tank back to the min limit if necessary
+        min_heat_to_tank = self.tank_mass * self.heat_capacity_water * (self.tank_T_min_limit - tank_T_no_hp)
+        min_heat_to_tank = np.maximum(0.0, min_heat_to_tank)
+        min_heat_power_to_tank = np.minimum(self.nominal_power, min_heat_to_tank / TIME_STEP_SECONDS)
+
+        # Max strategy: try to heat the tank as much as possible in this time step
+        max_heat_to_tank = self.tank_mass * self.heat_capacity_water * (self.tank_T_max_limit - tank_T_no_hp)
+        max_heat_power_to_tank = np.minimum(self.nominal_power, max_heat_to_tank / TIME_STEP_SECONDS)
+
+        # Convert the heating power to electrical power using the Coefficient of Performance
+        cop = self.cop_at_tank_T_set(time_step)
+        min_power = min_heat_power_to_tank / cop
+        max_power = max_heat_power_to_tank / cop
+
+        self.min[:] = min_power / 1000.0  # convert to kW
+        self.max[:] = max_power / 1000.0  # convert to kW
+
+    def _step_fields(self, time_step : int) -> Dict[str, np.ndarray]:
+        return {'tank_T': read_only(self.tank_T), 'tank_T_min_limit': read_only(self.tank_T_min_limit),
+                'tank_T_max_limit': read_only(self.tank_T_max_limit), 'tank_T_set': read_only(self.tank_T_set),
+                'house_temperature': read_only(self.temperatures[:, 1]), 'T_set': read_only(self.T_set),
+                'cop_at_tank_T_set': read_only(self.cop_at_tank_T_set(time_step)),
+                'free_temperatures': self.free_temperatures(time_step),
+                'heat_demand_house': functools.partial(self.calculate_heat_demand_house, time_step),
+                'simulate_schedule': functools.partial(self.simulate_schedule, time_step)}
+
+    def response(self, time_step : int):
+        heat_to_tank = (self._consumption(time_step) * TIME_STEP_SECONDS) * self.cop_at_tank_T_set(time_step)
+        heat_to_tank = heat_to_tank * 1000 # in W
+
+        # Calculate the heat required by the houses
+        heat_demand_house = self.calculate_heat_demand_house(time_step, self.T_set)
+
+        # Calculate the temperature in the tanks after supplying the required heat to the houses
+        dT_tank = (heat_to_tank - heat_demand_house) / (self.tank_mass * self.heat_capacity_water)
+        tank_T = self.tank_T + dT_tank
+        heat_to_house = np.where(tank_T < self.tank_T_min_limit, 0.0, heat_demand_house)
+
+        # Update the tank temperatures
+        dT_tank = (heat_to_tank - heat_to_house) / (self.tank_mass * self.heat_capacity_water)
+        self.tank_T += dT_tank
+
+        # Update the house temperatures
+        heat_power_to_house = heat_to_house / TIME_STEP_SECONDS
+        self.update_house_temperatures(time_step, heat_power_to_house)
+
+        if self.check_constraints:
+            self.check_response(time_step)
+
+    def check_response(self, time_step : int):
+        house_temperature = np.round(self.temperatures[:, 1], 4)
+        tank_T = np.round(self.tank_T, 4)
+        self._raise_first(house_temperature < self.T_min, "House temperature is smaller than T_min", time_step)
+        self._raise_first(tank_T < self.tank_T_min_limit, "Tank temperature is smaller than tank_T_min_limit", time_step)
+        self._raise_first(tank_T > self.tank_T_max_limit, "Tank temperature is greater than tank_T_max_limit", time_step)
+
+class BaseLoadTable:
+    """
+    Base loads of all houses, indexed like a (sim_length, houses) array: table[time_step] or table[start:stop]
+
+    Every distinct series is kept once, in the columns of series, and house i reads series[shift[i] + time_step,
+    column[i]]. The extra houses of a ScenarioExpansion read the doubled series of their source house, so they do not
+    need a copy each. Without extra houses, series holds the houses in order and is sliced directly.
+    """
+    def __init__(self, list_of_houses : List[House], sim_length : int, expansion : Optional[ScenarioExpansion] = None):
+        self.sim_length = sim_length
+        columns : Dict[int, int] = {}
+        sources : List[np.ndarray] = []
+        stops : List[int] = []
+        self.column = np.zeros(len(list_of_houses), dtype=int)
+        self.shift = np.zeros(len(list_of_houses), dtype=int)
+        for index, house in enumerate(list_of_houses):
+            if expansion is not None and expansion.is_synthetic(house.id):
+                source, shift = expansion.baseload_series(house.id)
+            else:
+                source, shift = np.asarray(house.base_data), 0
+            if id(source) not in columns:
+                columns[id(source)] = len(sources)
+                sources.append(source)
+                stops.append(0)
+            self.column[index], self.shift[index] = columns[id(source)], shift
+            stops[columns[id(source)]] = max(stops[columns[id(source)]], shift + sim_length)
+
+        self.series = np.zeros((max(stops, default=sim_length), len(sources)),
+                               dtype=np.result_type(*sources) if len(sources) > 0 else np.float64)
+        for column, (source, stop) in enumerate(zip(sources, stops)):
+            self.series[:stop, column] = source[:stop]
+        self.in_order = not self.shift.any() and np.array_equal(self.column, np.arange(len(list_of_houses)))
+
+    def __getitem__(self, index : Union[int, slice]) -> np.ndarray:
+        if self.in_order:
+            return self.series[:self.sim_length][index]
+        if isinstance(index, slice):
+            return self.series[self.shift + np.arange(self.sim_length)[index, None], self.column]
+        return self.series[self.shift + index, self.column]
+
+# Asset fleet class per asset attribute of a House
+ASSET_FLEET_CLASSES = {'pv': PVFleet, 'ev': EVFleet, 'batt': BatteryFleet, 'hp': HeatpumpFleet}
+
+class Fleet:
+    """
+    Struct-of-arrays state of all assets in the neighborhood
+
+    Keeps every PV, EV, Battery and Heatpump quantity in NumPy arrays indexed by house, so that min/max and response
+    are a single vectorized call per asset type per time step. The House and asset objects remain available as thin
+    views on these arrays, so strategies written for the object interface still work.
+
+    base_data gives the base loads as a (sim_length, houses) array, see BaseLoadTable. expansion is the
+    ScenarioExpansion that built the extra houses, if any.
+    """
+    def __init__(self, list_of_houses : List[House], sim_length : int, temperature_data : np.ndarray, hp_data : Dict,
+                 exogenous : Optional[ExogenousTable] = None, expansion : Optional[ScenarioExpansion] = None):
+        self.sim_length = sim_length
+        self.number_of_houses = len(list_of_houses)
+        self.base_data = BaseLoadTable(list_of_houses, sim_length, expansion)
+
+        if exogenous is None:
+            exogenous = ExogenousTable(list_of_houses, sim_length, temperature_data)
+        self.exogenous = exogenous
+
+        self.pv = PVFleet([house.pv for house in list_of_houses], sim_length)
+        self.ev = EVFleet([house.ev for house in list_of_houses], sim_length, exogenous.ev_events)
+        self.batt = BatteryFleet([house.batt for house in list_of_houses], sim_length)
+        self.hp = HeatpumpFleet([house.hp for house in list_of_houses], sim_length, temperature_data, hp_data, exogenous)
+        self.asset_fleets : List[AssetFleet] = [self.pv, self.ev, self.batt, self.hp]
+        self.asset_fleets_by_name : Dict[str, AssetFleet] = {'pv': self.pv, 'ev': self.ev, 'batt': self.batt, 'hp': self.hp}
+        if self.pv.consumption_clock is not None:  # the clock now has to clear the rows of the fleet arrays
+            self.pv.consumption_clock.arrays = [asset_fleet.consumption for asset_fleet in self.asset_fleets]
+
+        for asset_fleet in self.asset_fleets:
+            asset_fleet.bind()
+        # Asset types whose consumption and energy a block strategy sets, see BlockSchedule.py
+        self.scheduled_assets : List[str] = []
+
+    def set_min_max(self, time_step : int, measure=no_measurement):
+        for name, asset_fleet in self.asset_fleets_by_name.items():
+            if name not in self.scheduled_assets:
+                with measure(('set_min_max_ders', '', name), time_step):
+                    asset_fleet.set_min_max(time_step)
+
+    def step_view(self, time_step : int) -> FleetStepView:
+        return FleetStepView(time_step, read_only(self.base_data[time_step]), self.pv.step_view(time_step),
+                             self.ev.step_view(time_step), self.batt.step_view(time_step), self.hp.step_view(time_step),
+                             self)
+
+    def response(self, time_step : int, measure=no_measurement) -> float:
+        """
+        Responses of the assets and the total load of the time step. measure is the timing hook of the Simulator, see
+        Profiler.
+        """
+        for name in ['ev', 'hp', 'batt']:
+            if name not in self.scheduled_assets:
+                with measure(('response', '', name), time_step):
+                    self.asset_fleets_by_name[name].response(time_step)
+        house_load = (self.base_data[time_step] + self.pv._consumption(time_step) + self.ev._consumption(time_step)
+                      + self.batt._consumption(time_step) + self.hp._consumption(time_step))
+        # cumsum adds the houses one after the other, which gives the same result as the per-house loop
+        return np.cumsum(house_load)[-1] if self.number_of_houses > 0 else 0.0
@@ -1,6 +1,7 @@
-from typing import List, Dict
+from typing import List, Dict, Optional
 import numpy as np
 import constants
+from ThermalModel import BatchedThermalModel
 
 TIME_STEP_SECONDS = constants.TIME_STEP_SECONDS
 
@@ -17,17 +18,140 @@ class SimulationEntity:
     def simulate_individual_entity(self, time_step : int, temperature_data : np.ndarray, renewable_share : np.ndarray):
         pass
 
+class UnsetConsumptionError(TypeError):
+    """
+    Raised when a consumption value is read before any strategy has set it
+    """
+    pass
+
+class ConstraintViolation(ValueError):
+    """
+    Raised when an asset violates one of its constraints, with the id of the house and the time step
+    """
+    def __init__(self, message : str, house : int, time_step : int):
+        super().__init__(f"{message} (house {house}, time step {time_step})")
+        self.message = message
+        self.house = house
+        self.time_step = time_step
+
+    def __reduce__(self):
+        # keeps the arguments when it is pickled, so a worker process of a sweep or ensemble can raise it
+        return self.__class__, (self.message, self.house, self.time_step)
+
+def rounded_below(value : float, bound : float) -> bool:
+    """
+    np.round(value, 4) < bound, skipping the slow np.round for values that are clearly above the bound
+    """
+    return value < bound + 1e-3 and np.round(value, 4) < bound
+
+def rounded_above(value : float, bound : float) -> bool:
+    """
+    np.round(value, 4) > bound, skipping the slow np.round for values that are clearly below the bound
+    """
+    return value > bound - 1e-3 and np.round(value, 4) > bound
+
+class ConsumptionClock:
+    """
+    Current time step of a simulation without history, shared by the consumption buffers of all assets
+
+    The buffers only keep the last window time steps, in rings of that length. Advancing the clock clears the slot of
+    the new time step in every registered ring, so that it reads as not set.
+    """
+    def __init__(self, window : int):
+        self.window = window
+        self.time_step = 0
+        self.arrays : List[np.ndarray] = []
+
+    def register(self, array : np.ndarray) -> np.ndarray:
+        self.arrays.append(array)
+        return array
+
+    def advance(self, time_step : int):
+        self.time_step = time_step
+        for array in self.arrays:
+            array[time_step % self.window] = np.nan
+
+class ConsumptionBuffer:
+    """
+    Consumption of an asset per time step in kW
+
+    The values are stored in a typed float array in which NaN marks a time step that has not been set yet. Reading such
+    a time step raises an UnsetConsumptionError (a TypeError), like the None values that were used before.
+
+    With a clock the buffer only keeps the last clock.window time steps, in a ring of that length, and it only supports
+    reading and writing single time steps. Reading a time step that has dropped out of the window raises an IndexError.
+    """
+    def __init__(self, values : np.ndarray, clock : Optional[ConsumptionClock] = None):
+        self.values = values
+        self.clock = clock
+
+    @classmethod
+    def unset(cls, sim_length : int, dtype=np.float64):
+        return cls(np.full(sim_length, np.nan, dtype=dtype))
+
+    def _slot(self, time_step) -> int:
+        if type(time_step) is not int and not isinstance(time_step, np.integer):
+            raise IndexError(f"Without history only single time steps of the consumption can be used, not {time_step}")
+        if time_step > self.clock.time_step:
+            raise UnsetConsumptionError(f"consumption at time step {time_step} has not been set")
+        if time_step <= self.clock.time_step - self.clock.window:
+            raise IndexError(f"Consumption at time step {time_step} is not kept, without history only the last "
+                             f"{self.clock.window} time steps are kept")
+        return time_step % self.clock.window
+
+    def __getitem__(self, key):
+        if self.clock is not None:
+            key = self._slot(key)
+
+        if type(key) is int:  # fast path for reading a single time step
+            value = self.values.item(key)
+            if value != value:
+                raise UnsetConsumptionError(f"consumption at time step {key} has not been set")
+            return value
+
+        values = self.values[key]
+        if np.isnan(values).any():
+            raise UnsetConsumptionError(f"consumption at time step(s) {key} has not been set")
+        return values
+
+    def __setitem__(self, key, value):
+        if self.clock is not None:
+            if key != self.clock.time_step:
+                raise IndexError(f"Without history only the consumption of the current time step can be set, not {key}")
+            key = self._slot(key)
+        self.values[key] = value
+
+    def __len__(self):
+        return len(self.values)
+
+    def __array__(self, dtype=None):
+        return self.values if dtype is None else self.values.astype(dtype)
+
+    def __repr__(self):
+        return f"ConsumptionBuffer({self.values!r})"
+
+    def is_set(self, time_step : int) -> bool:
+        return not np.isnan(self.values[time_step])
+
 class Asset(SimulationEntity):
     """
     Base class for all simulated assets
 
     Do not change!
     """
-    def __init__(self, id : int, sim_length: int, strategy):
+    # Whether response checks the constraints, a Simulator turns this off and validates the assets itself
+    check_constraints = True
+
+    def __init__(self, id : int, sim_length: int, strategy, consumption_dtype=np.float64,
+                 consumption_clock : Optional[ConsumptionClock] = None):
         super().__init__(id, strategy)
         self.min = 0
         self.max = 0
-        self.consumption = np.full(sim_length, None, dtype=object) # np.zeros(sim_length)
+        if consumption_clock is None:
+            self.consumption = ConsumptionBuffer.unset(sim_length, consumption_dtype)
+        else:
+            values = np.full(consumption_clock.window, np.nan, dtype=consumption_dtype)
+            self.consumption = ConsumptionBuffer(consumption_clock.register(values), consumption_clock)
 
     def response(self, time_step : int):
         pass
@@ -41,22 +165,27 @@ class Asset(SimulationEntity):
 class House(SimulationEntity):
     """
     Stores the assets in the house and can execute the house strategy
+
+    With a consumption_clock the assets keep no history: only the last time steps of the consumption, and no energy
+    history.
     
     Do not change!
     """
     def __init__(self, id : int, sim_length: int, baseload : np.ndarray, pv_data : np.ndarray, ev_data : Dict,
                  hp_data : Dict, temperature_data : np.array, house_strategy, pv_strategy, ev_strategy, batt_strategy,
-                 hp_strategy):
+                 hp_strategy, consumption_dtype=np.float64, consumption_clock : Optional[ConsumptionClock] = None,
+                 hp_parameter_index : Optional[int] = None):
 
         super().__init__(id, house_strategy)
         #General House Parameters
         self.base_data = baseload # load base load data into house
 
         # Assets
-        self.pv = PVInstallation(id, pv_data, sim_length, pv_strategy)
-        self.ev = EVInstallation(id, ev_data, sim_length, ev_strategy)
-        self.batt = Battery(id, sim_length, batt_strategy)
-        self.hp = Heatpump(id, sim_length, hp_data, temperature_data, hp_strategy)
+        self.pv = PVInstallation(id, pv_data, sim_length, pv_strategy, consumption_dtype, consumption_clock)
+        self.ev = EVInstallation(id, ev_data, sim_length, ev_strategy, consumption_dtype, consumption_clock)
+        self.batt = Battery(id, sim_length, batt_strategy, consumption_dtype, consumption_clock)
+        self.hp = Heatpump(id, sim_length, hp_data, temperature_data, hp_strategy, consumption_dtype, consumption_clock,
+                           hp_parameter_index)
 
     def simulate_individual_entity(self, time_step : int, temperature_data : np.ndarray, renewable_share : np.ndarray):
         return self.strategy(time_step, temperature_data, renewable_share, self.base_data, self.pv, self.ev, self.batt, self.hp)
@@ -67,8 +196,9 @@ class PVInstallation(Asset):
     function for inspiration for your own strategy
     """
 
-    def __init__(self, id : int, pv_data : np.ndarray, sim_length : int, pv_strategy):
-        super().__init__(id, sim_length, pv_strategy)
+    def __init__(self, id : int, pv_data : np.ndarray, sim_length : int, pv_strategy, consumption_dtype=np.float64,
+                 consumption_clock : Optional[ConsumptionClock] = None):
+        super().__init__(id, sim_length, pv_strategy, consumption_dtype, consumption_clock)
         self.max_power = pv_data
 
     def simulate_individual_entity(self, time_step : int, temperature_data : np.ndarray, renewable_share : np.ndarray):
@@ -76,14 +206,15 @@ class PVInstallation(Asset):
 
     def response(self, time_step : int):
         # The PVInstallation does not need to update anything
-        self.check_response()
+        if self.check_constraints:
+            self.check_response(time_step)
 
     def check_response(self, time_step : int):
-        if np.round(self.consumption[time_step], 4) > 0.0:
-            raise ValueError(f"PV generation should be < 0")
+        if rounded_above(self.consumption[time_step], 0.0):
+            raise ConstraintViolation(f"PV generation should be < 0", self.id, time_step)
 
-        if np.round(self.consumption[time_step], 4) < self.max_power[time_step]:
-            raise ValueError(f"PV generation should be lower than max power")
+        if rounded_below(self.consumption[time_step] - self.max_power[time_step], 0.0):
+            raise ConstraintViolation(f"PV generation should be lower than max power", self.id, time_step)
 
     
     def set_min_max(self, time_step : int):
@@ -101,17 +232,20 @@ class EVInstallation(Asset):
     use the limit function for inspiration for your own strategy
     """
 
-    def __init__(self, id : int, ev_data : Dict, sim_length : int, ev_strategy):
-        super().__init__(id, sim_length, ev_strategy)
+    def __init__(self, id : int, ev_data : Dict, sim_length : int, ev_strategy, consumption_dtype=np.float64,
+                 consumption_clock : Optional[ConsumptionClock] = None):
+        super().__init__(id, sim_length, ev_strategy, consumption_dtype, consumption_clock)
         self.power_max = ev_data['charge_cap'] #kW
         self.size = ev_data['max_SoC']#kWh
         self.min_charge = ev_data['min_charge']
         self.energy = ev_data['start_SoC'] #energy in kWh in de battery, changes each timstep
-        self.energy_history = np.zeros(sim_length) #array to store previous battery state of charge for analyzing later
+        self.energy_history = np.zeros(sim_length) if consumption_clock is None else None #array to store previous battery state of charge for analyzing later
         self.session = ev_data['EV_status'] #details of the location of the EV (-1 is not at home, other number indicates the session number)
         self.session_trip_energy = ev_data['Trip_Energy'] #energy required during session
         self.session_arrive = ev_data['T_arrival'] #arrival times of session
         self.session_leave = ev_data['T_leave'] #leave times of session
+        self.events = None # EVEventIndex of the neighborhood, with this EV in column events_index, see ExogenousTable
+        self.events_index = 0
 
     def simulate_individual_entity(self, time_step : int, temperature_data : np.ndarray, renewable_share : np.ndarray):
         return self.strategy(time_step, temperature_data, renewable_share, self)
@@ -124,23 +258,43 @@ class EVInstallation(Asset):
                 if self.energy <= 0:
                     self.energy = 0
 
-        self.energy_history[time_step] = self.energy # save EV SoC for later analysis
+        if self.energy_history is not None:
+            self.energy_history[time_step] = self.energy # save EV SoC for later analysis
         self.energy += self.consumption[time_step] * TIME_STEP_SECONDS / 3600  # update the battery
 
-        self.check_response(time_step)
+        if self.check_constraints:
+            self.check_response(time_step)
 
     def check_response(self, time_step : int):
-        if np.round(self.consumption[time_step], 4) < 0.0:
-            raise ValueError(f"Consumption of EV should be above 0.0")
+        if rounded_below(self.consumption[time_step], 0.0):
+            raise ConstraintViolation(f"Consumption of EV should be above 0.0", self.id, time_step)
 
-        if np.round(self.consumption[time_step], 4) > self.power_max:
-            raise ValueError(f"Consumption of EV should be below power_max")
+        if rounded_above(self.consumption[time_step], self.power_max):
+            raise ConstraintViolation(f"Consumption of EV should be below power_max", self.id, time_step)
 
-        if np.round(self.energy, 4) < 0.0:
-            raise ValueError(f"Energy in EV {self.id} is below 0")
+        if rounded_below(self.energy, 0.0):
+            raise ConstraintViolation(f"Energy in EV {self.id} is below 0", self.id, time_step)
 
-        if np.round(self.energy, 4) > self.size:
-            raise ValueError(f"Energy in EV {self.id} is above size")
+        if rounded_above(self.energy, self.size):
+            raise ConstraintViolation(f"Energy in EV {self.id} is above size", self.id, time_step)
+
+    def time_to_departure(self, time_step : int) -> int:
+        """
+        Number of time steps until the EV leaves, 0 if it is not at home
+        """
+        if self.events is not None:
+            return self.events.time_to_departure_of(self.events_index, time_step)
+        session = int(self.session[time_step])
+        return 0 if session == -1 else int(self.session_leave[session]) - time_step
+
+    def trip_energy(self, time_step : int) -> float:
+        """
+        Energy (in kWh) of the trip at the end of the current session, 0 if the EV is not at home
+        """
+        if self.events is not None:
+            return self.events.trip_energy_of(self.events_index, time_step)
+        session = int(self.session[time_step])
+        return 0.0 if session == -1 else float(self.session_trip_energy[session])
 
     def set_min_max(self, time_step : int):
         """
@@ -165,34 +319,39 @@ class Battery(Asset):
     use the limit function for inspiration for your own strategy
     """
     
-    def __init__(self, id : int, sim_length : int, batt_strategy):
+    def __init__(self, id : int, sim_length : int, batt_strategy, consumption_dtype=np.float64,
+                 consumption_clock : Optional[ConsumptionClock] = None):
         # Based on Tesla Powerwall
         # https://www.tesla.com/sites/default/files/pdfs/powerwall/Powerwall_2_AC_Datasheet_EN_NA.pdf
-        super().__init__(id, sim_length, batt_strategy)
+        super().__init__(id, sim_length, batt_strategy, consumption_dtype, consumption_clock)
         self.power_max = 5 #kW
         self.size = 13.5 #kWh
         self.energy = 6.25 #energy in kWh in de battery at every moment in time
-        self.energy_history = np.zeros(sim_length)
+        self.energy_history = np.zeros(sim_length) if consumption_clock is None else None
 
     def simulate_individual_entity(self, time_step : int, temperature_data : np.ndarray, renewable_share : np.ndarray):
         return self.strategy(time_step, temperature_data, renewable_share, self)
     
     def response(self, time_step : int):
-        self.energy_history[time_step] = self.energy #save batt SoC for later analysis
+        if self.energy_history is not None:
+            self.energy_history[time_step] = self.energy #save batt SoC for later analysis
         self.energy += self.consumption[time_step] * TIME_STEP_SECONDS / 3600 # update battery
 
+        if self.check_constraints:
+            self.check_response(time_step)
+
     def check_response(self, time_step : int):
-        if np.round(self.consumption[time_step], 4) < - self.power_max:
-            raise ValueError(f"Discharging power should be greater than -power_max")
+        if rounded_below(self.consumption[time_step], - self.power_max):
+            raise ConstraintViolation(f"Discharging power should be greater than -power_max", self.id, time_step)
 
-        if np.round(self.consumption[time_step], 4) > self.power_max:
-            raise ValueError(f"Charging power should be smaller than power_max")
+        if rounded_above(self.consumption[time_step], self.power_max):
+            raise ConstraintViolation(f"Charging power should be smaller than power_max", self.id, time_step)
 
-        if np.round(self.energy, 4) < 0.0:
-            raise ValueError(f"Energy in EV {self.id} is below 0")
+        if rounded_below(self.energy, 0.0):
+            raise ConstraintViolation(f"Energy in battery {self.id} is below 0", self.id, time_step)
 
-        if np.round(self.energy, 4) > self.size:
-            raise ValueError(f"Energy in EV {self.id} is above size")
+        if rounded_above(self.energy, self.size):
+            raise ConstraintViolation(f"Energy in battery {self.id} is above size", self.id, time_step)
 
 
     def set_min_max(self, time_step : int):
@@ -215,20 +374,23 @@ class Heatpump(Asset):
     use the limit function for inspiration for your own strategy
     """
 
-    def __init__(self, id: int, sim_length : int, hp_data : Dict, T_ambient : np.ndarray, hp_strategy):
-        super().__init__(id, sim_length, hp_strategy)
+    def __init__(self, id: int, sim_length : int, hp_data : Dict, T_ambient : np.ndarray, hp_strategy, consumption_dtype=np.float64,
+                 consumption_clock : Optional[ConsumptionClock] = None, parameter_index : Optional[int] = None):
+        super().__init__(id, sim_length, hp_strategy, consumption_dtype, consumption_clock)
 
         # Thermal Properties House, DO NOT TOUCH OR USE
+        # The building model is hp_data of house parameter_index, which is the id except for houses of a ScenarioExpansion
+        self.parameter_index = id if parameter_index is None else parameter_index
         self.T_ambient = T_ambient
         self.temperatures = hp_data['temperatures']
-        self.super_matrix = hp_data['super_matrix'][id]
-        self.a = hp_data['alpha'][id]
-        self.v_part = hp_data['v_part'][id]
-        self.b_part = hp_data['b_part'][id]
-        self.M = hp_data['M'][id]
+        self.super_matrix = hp_data['super_matrix'][self.parameter_index]
+        self.a = hp_data['alpha'][self.parameter_index]
+        self.v_part = hp_data['v_part'][self.parameter_index]
+        self.b_part = hp_data['b_part'][self.parameter_index]
+        self.M = hp_data['M'][self.parameter_index]
         self.f_inter = hp_data['f_inter']
-        self.K_inv = hp_data["K_inv"][id]
-        self.heat_demand_house = np.zeros(sim_length)
+        self.K_inv = hp_data["K_inv"][self.parameter_index]
+        self.heat_demand_house = np.zeros(sim_length) if consumption_clock is None else None
         self.heat_capacity_water = 4182  # [J/kg.K]
 
         # Building properties, You can change and use this
@@ -243,6 +405,20 @@ class Heatpump(Asset):
         self.tank_T_init = 40.0 + 273  # [K]   Initial temperature in buffer tank
         self.tank_T = self.tank_T_init # Parameter initialized with initial temperature but changes over time
 
+        # Heat (in W) that raises the house temperature by one Kelvin in one time step
+        self.heat_to_house_temperature = self.M[1, 1] * self.f_inter[1] + self.M[1, 2] * self.f_inter[2]
+        # Cached result of free_temperatures and the (time_step, temperatures) it was calculated for
+        self._free_temperatures : Optional[np.ndarray] = None
+        self._free_temperatures_key = None
+
+        # ExogenousTable with cop(tank_T_set, T_ambient) per time step in column cop_table_index of its cop_series, and
+        # the tank_T_set it holds
+        self.cop_table = None
+        self.cop_table_index = 0
+        self.cop_table_tank_T_set : Optional[float] = None
+        # Building model of this house for simulate_schedule, created when it is first used
+        self._thermal_model : Optional[BatchedThermalModel] = None
+
     def cop(self, T_tank: float, T_out: float) -> float:
         """
         Calculates the Coefficient of Performance (ratio between supplied heat and the electrical power)
@@ -250,6 +426,14 @@ class Heatpump(Asset):
         """
         return 8.736555867367798 - 0.18997851 * (T_tank - T_out) + 0.00125921 * (T_tank - T_out) ** 2
     
+    def cop_at_tank_T_set(self, time_step : int) -> float:
+        """
+        cop(self.tank_T_set, T_ambient) at the time step, from the precomputed table unless tank_T_set has been changed
+        """
+        if self.cop_table is not None and self.tank_T_set == self.cop_table_tank_T_set:
+            return self.cop_table.cop_series[time_step, self.cop_table_index]
+        return self.cop(self.tank_T_set, self.T_ambient[time_step])
+
     def simulate_individual_entity(self, time_step : int, temperature_data : np.ndarray, renewable_share : np.ndarray):
         return self.strategy(time_step, temperature_data, renewable_share, self)
     
@@ -262,8 +446,7 @@ class Heatpump(Asset):
 
         Do not change this function!
         """
-        T_ambient = self.T_ambient[time_step]
-        heat_to_tank = (self.consumption[time_step] * TIME_STEP_SECONDS) * self.cop(self.tank_T_set, T_ambient)
+        heat_to_tank = (self.consumption[time_step] * TIME_STEP_SECONDS) * self.cop_at_tank_T_set(time_step)
         heat_to_tank = heat_to_tank * 1000 # in W
 
         # Calculate the heat required by the house
@@ -285,20 +468,20 @@ class Heatpump(Asset):
         heat_power_to_house = heat_to_house/ TIME_STEP_SECONDS
         self._update_house_temperatures(time_step, heat_power_to_house)
 
-        self.check_response(time_step)
+        if self.check_constraints:
+            self.check_response(time_step)
 
 
     def check_response(self, time_step : int):
         house_temperature = self.temperatures[1]
-        if np.round(house_temperature, 4) < self.T_min:
-            raise ValueError(f"House temperature is smaller than T_min")
+        if rounded_below(house_temperature, self.T_min):
+            raise ConstraintViolation(f"House temperature is smaller than T_min", self.id, time_step)
 
-        if np.round(self.tank_T, 4) < self.tank_T_min_limit:
-            raise ValueError(f"Tank temperature is smaller than tank_T_min_limit")
+        if rounded_below(self.tank_T, self.tank_T_min_limit):
+            raise ConstraintViolation(f"Tank temperature is smaller than tank_T_min_limit", self.id, time_step)
 
-        if np.round(self.tank_T, 4) > self.tank_T_max_limit:
-            print(np.round(self.tank_T, 4), self.tank_T_max_limit)
-            raise ValueError(f"Tank temperature is greater than tank_T_max_limit")
+        if rounded_above(self.tank_T, self.tank_T_max_limit):
+            raise ConstraintViolation(f"Tank temperature is greater than tank_T_max_limit", self.id, time_step)
     
     def set_min_max(self, time_step: int):
         """
@@ -309,8 +492,6 @@ class Heatpump(Asset):
 
         Calculations are in SI units
         """
-        T_ambient = self.T_ambient[time_step]
-
         # Calculate the amount of heat needed to keep the house temperature constant
         heat_demand_house = self.calculate_heat_demand_house(time_step, self.T_set)
 
@@ -328,8 +509,9 @@ class Heatpump(Asset):
         max_heat_power_to_tank = min(self.nominal_power, max_heat_to_tank / TIME_STEP_SECONDS)
 
         # Convert the heating power to electrical power using the Coefficient of Performance
-        min_power = min_heat_power_to_tank / self.cop(self.tank_T_set, T_ambient)
-        max_power = max_heat_power_to_tank / self.cop(self.tank_T_set, T_ambient)
+        cop = self.cop_at_tank_T_set(time_step)
+        min_power = min_heat_power_to_tank / cop
+        max_power = max_heat_power_to_tank / cop
 
         self.min = min_power / 1000.0  # convert to kW
         self.max = max_power / 1000.0  # convert to kW
@@ -340,10 +522,44 @@ class Heatpump(Asset):
         Calculates the heat (in J) required to heat the house to house_temperature (in K)
         Do not change
         """
-        v = np.matmul(self.super_matrix, self.temperatures) + self.v_part[time_step]
-        heat_demand_house = max(0, ((house_temperature - v[1])/(self.M[1, 1] * self.f_inter[1] + self.M[1, 2] * self.f_inter[2])) * 900)
+        v = self.free_temperatures(time_step)
+        heat_demand_house = max(0, ((house_temperature - v[1])/self.heat_to_house_temperature) * 900)
         return heat_demand_house
 
+    def free_temperatures(self, time_step : int) -> np.ndarray:
+        """
+        Temperatures (in K) of the house at the end of the time step if it is not heated, the v vector of the building
+        model. It is calculated once per time step and cached until the temperatures change, so calculating the heat
+        demand for several house temperatures costs almost nothing. The returned array is read only.
+        """
+        key = self._free_temperatures_key
+        if key is None or key[0] != time_step or key[1] is not self.temperatures:
+            v = np.matmul(self.super_matrix, self.temperatures) + self.v_part[time_step]
+            v.flags.writeable = False
+            self._free_temperatures = v
+            self._free_temperatures_key = (time_step, self.temperatures)
+        return self._free_temperatures
+
+    def simulate_schedule(self, time_step : int, consumption : np.ndarray):
+        """
+        House temperatures (steps, nodes), tank temperatures and heat (in J) given to the house (steps) if the heat pump
+        consumes consumption (in kW, shape (steps)) from time_step on, without changing any state. consumption can also
+        have shape (steps, candidates), to evaluate many candidate schedules at once, the results then have a candidates
+        axis after the steps. See BatchedThermalModel.simulate_schedule.
+        """
+        if self._thermal_model is None:
+            self._thermal_model = BatchedThermalModel({'super_matrix': self.super_matrix[None], 'K_inv': self.K_inv[None],
+                                                       'M': self.M[None], 'v_part': self.v_part[None],
+                                                       'b_part': self.b_part[None], 'alpha': self.a[None],
+                                                       'f_inter': self.f_inter}, [0])
+        consumption = np.asarray(consumption, dtype=np.float64)
+        cop = np.array([self.cop_at_tank_T_set(step) for step in range(time_step, time_step + consumption.shape[0])])
+        heat_to_tank = (consumption * TIME_STEP_SECONDS) * cop.reshape((-1,) + (1,) * (consumption.ndim - 1)) * 1000
+        temperatures, tank_T, heat_to_house = self._thermal_model.simulate_schedule(
+            time_step, np.asarray(self.temperatures, dtype=np.float64)[None], np.array([self.tank_T]), heat_to_tank[:, None],
+            np.array([self.T_set]), np.array([self.tank_mass * self.heat_capacity_water]), np.array([self.tank_T_min_limit]))
+        return temperatures[:, 0], tank_T[:, 0], heat_to_house[:, 0]
+
     def _update_house_temperatures(self, time_step: int, heat_power_to_house: float):
         """
         Helper function
@@ -351,4 +567,5 @@ class Heatpump(Asset):
         """
         q_inter = heat_power_to_house * self.f_inter
         b = np.matmul(self.K_inv, q_inter) + self.b_part[time_step]
-        self.temperatures = np.matmul(self.super_matrix, self.temperatures - b) + self.a[time_step] * 900 + b
\ No newline at end of file
+        self.temperatures = np.matmul(self.super_matrix, self.temperatures - b) + self.a[time_step] * 900 + b
+        self._free_temperatures_key = None
\ No newline at end of file
@@ -0,0 +1,117 @@
+from collections import defaultdict
+from contextlib import nullcontext
+from typing import Dict, List, Optional, Tuple
+import csv
+import json
+import time
+import numpy as np
+
+import constants
+
+_NO_MEASUREMENT = nullcontext()
+
+def no_measurement(key : Tuple[str, str, str], time_step : int, calls : int = 1):
+    """
+    The measure hook of a Simulator without profiler, which measures nothing
+    """
+    return _NO_MEASUREMENT
+
+class Measurement:
+    """
+    Context manager that adds the wall time of its block to a key of a Profiler, unless the block raises
+    """
+    def __init__(self, profiler : 'Profiler', key : Tuple[str, str, str], time_step : int, calls : int):
+        self.profiler = profiler
+        self.key = key
+        self.time_step = time_step
+        self.calls = calls
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exception_type, exception, traceback):
+        if exception_type is None:
+            self.profiler.add(self.key, time.perf_counter() - self.start, self.time_step, self.calls)
+        return False
+
+class Profiler:
+    """
+    Cumulative wall time and call counts of the simulation, per phase, per StrategyOrder tier and per asset class
+
+    Every measurement has a key (phase, tier, asset), where tier and asset are '' for the total of a phase or tier.
+    For example ('control_strategy', 'individual', 'hp') is the time spent in hp_strategy, and ('response', '', 'hp')
+    the time spent in the heat pump responses. The time of every key is also kept per day, as a timeline.
+
+    Create a Simulator with profile=True to use it. The Simulator then passes measure instead of no_measurement to the
+    phases of its time step, and does not measure anything otherwise.
+    """
+    def __init__(self):
+        self.seconds : Dict[Tuple[str, str, str], float] = defaultdict(float)
+        self.calls : Dict[Tuple[str, str, str], int] = defaultdict(int)
+        self.daily_seconds : Dict[Tuple[str, str, str], List[float]] = defaultdict(list)
+
+    def add(self, key : Tuple[str, str, str], seconds : float, time_step : int, calls : int = 1):
+        self.seconds[key] += seconds
+        self.calls[key] += calls
+        day = time_step // constants.AMOUNT_OF_TIME_STEPS_IN_DAY
+        daily_seconds = self.daily_seconds[key]
+        if len(daily_seconds) <= day:
+            daily_seconds.extend([0.0] * (day + 1 - len(daily_seconds)))
+        daily_seconds[day] += seconds
+
+    def measure(self, key : Tuple[str, str, str], time_step : int, calls : int = 1) -> Measurement:
+        """
+        with profiler.measure(key, time_step): ... adds the time of the block to key, counted as calls calls
+        """
+        return Measurement(self, key, time_step, calls)
+
+    def report(self) -> List[Dict]:
+        """
+        One row per key, sorted by phase, tier and asset
+        """
+        return [{'phase': phase, 'tier': tier, 'asset': asset, 'seconds': self.seconds[(phase, tier, asset)],
+                 'calls': self.calls[(phase, tier, asset)],
+                 'seconds_per_call': self.seconds[(phase, tier, asset)] / self.calls[(phase, tier, asset)]}
+                for phase, tier, asset in sorted(self.seconds.keys())]
+
+    def timeline(self, total_load : Optional[np.ndarray] = None) -> List[Dict]:
+        """
+        One row per day with the seconds of every key, named phase/tier/asset, and the energy and peak of total_load
+        """
+        number_of_days = max([len(daily_seconds) for daily_seconds in self.daily_seconds.values()], default=0)
+        rows = []
+        for day in range(number_of_days):
+            row = {'day': day}
+            if total_load is not None:
+                load = total_load[day * constants.AMOUNT_OF_TIME_STEPS_IN_DAY:(day + 1) * constants.AMOUNT_OF_TIME_STEPS_IN_DAY]
+                row['energy'] = float(np.sum(load) * constants.TIME_STEP_SECONDS / 3600)
+                row['peak_load'] = float(np.max(load))
+            for key in sorted(self.daily_seconds.keys()):
+                daily_seconds = self.daily_seconds[key]
+                row["/".join(part for part in key if part != '')] = daily_seconds[day] if day < len(daily_seconds) else 0.0
+            rows.append(row)
+        return rows
+
+    def write_json(self, path : str, total_load : Optional[np.ndarray] = None):
+        with open(path, 'w') as f:
+            json.dump({'report': self.report(), 'timeline': self.timeline(total_load)}, f, indent=2)
+
+    def write_csv(self, path : str):
+        _write_rows(path, self.report())
+
+    def write_timeline_csv(self, path : str, total_load : Optional[np.ndarray] = None):
+        _write_rows(path, self.timeline(total_load))
+
+    def print_report(self):
+        print("PROFILE:")
+        print("---------------------------------------")
+        for row in self.report():
+            name = "/".join(part for part in [row['phase'], row['tier'], row['asset']] if part != '')
+            print(f"{name:<40} {row['seconds']:10.3f} s {row['calls']:10d} calls")
+
+def _write_rows(path : str, rows : List[Dict]):
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()) if len(rows) > 0 else [])
+        writer.writeheader()
+        writer.writerows(rows)
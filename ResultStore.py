@@ -0,0 +1,200 @@
+from typing import Dict, List, Optional, Union
+import json
+import os.path
+import numpy as np
+
+import constants
+
+INDEX_FILE = "index.json"
+# Columns of a result store, named <asset>.<field> like the keys of a checkpoint. The energy and temperatures are the
+# values after the time step.
+COLUMNS = ['pv.consumption', 'ev.consumption', 'ev.energy', 'batt.consumption', 'batt.energy', 'hp.consumption',
+           'hp.tank_T', 'hp.house_temperature']
+
+def _step_values(simulator, time_step : int) -> Dict[str, np.ndarray]:
+    """
+    Value of every column at time_step, one per house, after the response of the time step
+    """
+    fleet = simulator.fleet
+    if fleet is not None:
+        values = {f'{asset}.consumption': asset_fleet.consumption[asset_fleet._row(time_step)]
+                  for asset, asset_fleet in fleet.asset_fleets_by_name.items()}
+        values.update({'ev.energy': fleet.ev.energy, 'batt.energy': fleet.batt.energy, 'hp.tank_T': fleet.hp.tank_T,
+                       'hp.house_temperature': fleet.hp.temperatures[:, 1]})
+        return values
+
+    houses = simulator.list_of_houses
+    values = {f'{asset}.consumption': np.array([getattr(house, asset).consumption[time_step] for house in houses])
+              for asset in ['pv', 'ev', 'batt', 'hp']}
+    values.update({'ev.energy': np.array([house.ev.energy for house in houses]),
+                   'batt.energy': np.array([house.batt.energy for house in houses]),
+                   'hp.tank_T': np.array([house.hp.tank_T for house in houses]),
+                   'hp.house_temperature': np.array([house.hp.temperatures[1] for house in houses])})
+    return values
+
+class ResultWriter:
+    """
+    Streams the per-house time series of a simulation to a directory of .npy files, one per column, with shape
+    (houses, sim_length) like the arrays of a scenario store
+
+    The values of chunk_length time steps (a day by default) are collected in memory and then written to the
+    memory-mapped files at once, so the memory does not grow with the length of the simulation, also without history.
+    The total load is written as well. index.json records the time steps start up to written that hold results, so the
+    results of an interrupted simulation can still be read.
+
+    An existing store of the same houses, length and columns is opened without clearing it, so a simulation that is
+    resumed from a checkpoint continues the store it wrote before. begin(time_step) then keeps the time steps before
+    the checkpoint, and starts the store at the checkpoint if they were not all written.
+    """
+    def __init__(self, path : str, house_ids : List[int], sim_length : int, columns : List[str] = COLUMNS,
+                 dtype=np.float64, chunk_length : int = constants.AMOUNT_OF_TIME_STEPS_IN_DAY):
+        for column in columns:
+            if column not in COLUMNS:
+                raise ValueError(f"Unknown column {column}, choose from {COLUMNS}")
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.columns = list(columns)
+        self.chunk_length = chunk_length
+        self.index = {'house_ids': [int(house_id) for house_id in house_ids], 'length': sim_length,
+                      'columns': self.columns, 'dtype': np.dtype(dtype).name, 'start': 0, 'written': 0}
+        # time steps start up to written of the store that was in path already, None for a new store
+        self.previous : Optional[tuple] = self._existing_time_steps()
+        mode = 'w+' if self.previous is None else 'r+'
+        number_of_houses = len(house_ids)
+        self.arrays = {column: np.lib.format.open_memmap(os.path.join(path, column + ".npy"), mode=mode, dtype=dtype,
+                                                         shape=(number_of_houses, sim_length))
+                       for column in self.columns}
+        self.arrays['total_load'] = np.lib.format.open_memmap(os.path.join(path, "total_load.npy"), mode=mode,
+                                                              dtype=np.float64, shape=(sim_length,))
+        self.buffers = {column: np.empty((chunk_length, number_of_houses), dtype=dtype) for column in self.columns}
+        self.buffers['total_load'] = np.empty(chunk_length)
+        self.chunk_start = 0
+        self.chunk_stop = 0
+        if self.previous is None:  # the index of an existing store is kept until begin
+            self._write_index()
+
+    def _existing_time_steps(self) -> Optional[tuple]:
+        """
+        (start, written) of a store in path with the same houses, length, columns and dtype, None if there is none
+        """
+        try:
+            with open(os.path.join(self.path, INDEX_FILE), 'r') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if any(index.get(key) != self.index[key] for key in ['house_ids', 'length', 'columns', 'dtype']):
+            return None
+        if not all(os.path.isfile(os.path.join(self.path, column + ".npy")) for column in self.columns + ['total_load']):
+            return None
+        return index.get('start', 0), index['written']
+
+    def begin(self, time_step : int):
+        """
+        Called before the first time step that is simulated, time_step > 0 when the simulation resumes from a
+        checkpoint. The time steps before time_step are kept if the previous store holds all of them, otherwise the
+        store starts at time_step. Everything after time_step is written again.
+        """
+        if self.previous is not None and self.previous[0] <= time_step <= self.previous[1]:
+            self.index['start'] = self.previous[0]
+        else:
+            self.index['start'] = time_step
+        self.index['written'] = time_step
+        self.chunk_start = self.chunk_stop = time_step
+        self._write_index()
+
+    def record(self, simulator, time_step : int):
+        """
+        Adds the values of time_step, called after the response of every time step
+        """
+        if time_step != self.chunk_stop or time_step - self.chunk_start == self.chunk_length:
+            self.flush()
+            self.chunk_start = self.chunk_stop = time_step
+        row = time_step - self.chunk_start
+        for column, value in _step_values(simulator, time_step).items():
+            if column in self.buffers:
+                self.buffers[column][row] = value
+        self.buffers['total_load'][row] = simulator.total_load[time_step]
+        self.chunk_stop = time_step + 1
+        if (time_step + 1) % self.chunk_length == 0:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes the collected time steps to the files
+        """
+        start, stop = self.chunk_start, self.chunk_stop
+        if stop > start:
+            for column, array in self.arrays.items():
+                if column == 'total_load':
+                    array[start:stop] = self.buffers[column][:stop - start]
+                else:
+                    array[:, start:stop] = self.buffers[column][:stop - start].T
+                array.flush()
+            if start == self.index['written']:  # only a contiguous range of time steps counts as written
+                self.index['written'] = stop
+                self._write_index()
+        self.chunk_start = self.chunk_stop = stop
+
+    def close(self):
+        self.flush()
+        self.arrays = {}
+
+    def _write_index(self):
+        with open(os.path.join(self.path, INDEX_FILE), 'w') as f:
+            json.dump(self.index, f, indent=2)
+
+class ResultStore:
+    """
+    Reads a result store written by a ResultWriter, memory-mapped so that only the requested values are read from disk
+
+    read(column, houses, start, stop) returns the values of the houses (a list of positions in house_ids, or a slice)
+    in the time steps start up to stop, with shape (time steps, houses) like the arrays of a Fleet. Only the time
+    steps first_time_step up to length hold results, first_time_step is 0 unless the simulation that wrote the store
+    was resumed from a checkpoint into a new store.
+    """
+    def __init__(self, path : str):
+        with open(os.path.join(path, INDEX_FILE), 'r') as f:
+            self.index = json.load(f)
+        self.path = path
+        self.columns : List[str] = self.index['columns']
+        self.house_ids = np.array(self.index['house_ids'])
+        self.first_time_step : int = self.index.get('start', 0)
+        self.length : int = self.index['written']  # end of the time steps that have been written
+
+    def _load(self, name : str) -> np.ndarray:
+        return np.load(os.path.join(self.path, name + ".npy"), mmap_mode='r')
+
+    def read(self, column : str, houses : Union[slice, List[int], np.ndarray] = slice(None), start : Optional[int] = None,
+             stop : Optional[int] = None) -> np.ndarray:
+        if column not in self.columns:
+            raise ValueError(f"Column {column} is not in the store, it has {self.columns}")
+        start = self.first_time_step if start is None else start
+        stop = self.length if stop is None else stop
+        self._check_time_steps(start, stop)
+        return self._load(column)[houses, start:stop].view(np.ndarray).T  # plain ndarray, indexing a np.memmap is slow
+
+    def read_asset(self, asset : str, houses : Union[slice, List[int], np.ndarray] = slice(None),
+                   start : Optional[int] = None, stop : Optional[int] = None) -> Dict[str, np.ndarray]:
+        """
+        All columns of one asset type, by field name
+        """
+        return {column.split('.')[1]: self.read(column, houses, start, stop) for column in self.columns
+                if column.split('.')[0] == asset}
+
+    def total_load(self, start : Optional[int] = None, stop : Optional[int] = None) -> np.ndarray:
+        start = self.first_time_step if start is None else start
+        stop = self.length if stop is None else stop
+        self._check_time_steps(start, stop)
+        return self._load('total_load')[start:stop].view(np.ndarray)
+
+    def _check_time_steps(self, start : int, stop : int):
+        if start < self.first_time_step or stop > self.length:
+            raise ValueError(f"Time steps {start} to {stop} are not in the store, it has time steps "
+                             f"{self.first_time_step} to {self.length}")
+
+    def house_positions(self, house_ids : List[int]) -> np.ndarray:
+        """
+        Positions of the houses with these ids, to pass as houses to read
+        """
+        positions = {house_id: position for position, house_id in enumerate(self.house_ids.tolist())}
+        return np.array([positions[house_id] for house_id in house_ids], dtype=int)
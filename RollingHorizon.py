@@ -0,0 +1,264 @@
+from typing import Callable, Dict, Optional, Tuple
+import numpy as np
+
+import constants
+from Fleet import Fleet, FleetStepView
+
+TIME_STEP_SECONDS = constants.TIME_STEP_SECONDS
+# Asset types that the rolling-horizon scheduler plans
+PLANNED_ASSETS = ['batt', 'ev', 'hp']
+
+def peak_objective(load : np.ndarray, renewable_share : np.ndarray) -> Tuple[float, np.ndarray]:
+    """
+    Sum of the squared load, which flattens the load and so lowers its peak
+    """
+    return float(np.sum(load ** 2)), 2 * load
+
+def import_objective(load : np.ndarray, renewable_share : np.ndarray) -> Tuple[float, np.ndarray]:
+    """
+    Sum of the squared import from the grid
+    """
+    imported = np.maximum(load, 0.0)
+    return float(np.sum(imported ** 2)), 2 * imported
+
+def renewable_import_objective(load : np.ndarray, renewable_share : np.ndarray) -> Tuple[float, np.ndarray]:
+    """
+    Sum of the squared import from the grid, weighted with the non-renewable share of the grid
+    """
+    weight = 1.0 - renewable_share
+    imported = np.maximum(load, 0.0)
+    return float(np.sum(weight * imported ** 2)), 2 * weight * imported
+
+OBJECTIVES = {'peak': peak_objective, 'import': import_objective, 'renewable_import': renewable_import_objective}
+
+class StateConstraint:
+    """
+    State of one asset type that follows from its consumption x, shape (steps, houses): the state after step k is
+    initial + sum over j <= k of (gain[j] * x[j] - drift[j]), and has to stay within lower and upper
+    """
+    def __init__(self, initial : np.ndarray, gain : np.ndarray, drift : np.ndarray, lower : np.ndarray,
+                 upper : np.ndarray):
+        self.initial = initial
+        self.gain = gain
+        self.drift = drift
+        self.lower = lower
+        self.upper = upper
+
+    def apply(self, x : np.ndarray) -> np.ndarray:
+        """
+        gain * cumulative sum, the linear part of the state
+        """
+        return np.cumsum(self.gain * x, axis=0)
+
+    def apply_transpose(self, y : np.ndarray) -> np.ndarray:
+        return self.gain * np.cumsum(y[::-1], axis=0)[::-1]
+
+    def bounds(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Bounds of apply(x)
+        """
+        offset = self.initial - np.cumsum(self.drift, axis=0)
+        return self.lower - offset, self.upper - offset
+
+class SchedulingProblem:
+    """
+    Consumption (in kW) of all batteries, EVs and heat pumps over a horizon that minimizes an objective of the load
+
+    The variables are one (steps, houses) array per asset type, within lower and upper. The energy of the batteries and
+    EVs and the tank temperature of the heat pumps are cumulative sums of the variables, see StateConstraint, so these
+    constraints are applied as cumulative sums instead of being stored as (sparse) matrices.
+
+    The objective is a function objective(load, renewable_share) -> (value, gradient), of the load per house: the fixed
+    load plus the sum of the variables, divided by the number of houses.
+    """
+    def __init__(self, fixed_load : np.ndarray, renewable_share : np.ndarray, lower : Dict[str, np.ndarray],
+                 upper : Dict[str, np.ndarray], states : Dict[str, StateConstraint], objective : Callable):
+        self.fixed_load = fixed_load
+        self.renewable_share = renewable_share
+        self.lower = lower
+        self.upper = upper
+        self.states = states
+        self.objective = objective
+        self.number_of_houses = max(1, next(iter(lower.values())).shape[1])
+
+    def load(self, x : Dict[str, np.ndarray]) -> np.ndarray:
+        """
+        Total load (in kW) of every step
+        """
+        return self.fixed_load + sum(x[asset].sum(axis=1) for asset in x)
+
+    def cost(self, x : Dict[str, np.ndarray]) -> Tuple[float, Dict[str, np.ndarray]]:
+        """
+        Objective and its gradient with respect to every variable
+        """
+        value, gradient = self.objective(self.load(x) / self.number_of_houses, self.renewable_share)
+        gradient = gradient / self.number_of_houses
+        return value, {asset: np.broadcast_to(gradient[:, None], x[asset].shape) for asset in x}
+
+    def project(self, x : Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        return {asset: np.clip(x[asset], self.lower[asset], self.upper[asset]) for asset in x}
+
+    def state_violation(self, x : Dict[str, np.ndarray]) -> float:
+        """
+        Largest violation of a state constraint
+        """
+        violation = 0.0
+        for asset, state in self.states.items():
+            lower, upper = state.bounds()
+            value = state.apply(x[asset])
+            violation = max(violation, float(np.max(np.maximum(lower - value, value - upper), initial=0.0)))
+        return violation
+
+class PrimalDualSolver:
+    """
+    Default solver backend: the primal-dual algorithm of Condat and Vu, with diagonal preconditioning
+
+    Every iteration is a projected gradient step on the variables and a step on the multipliers of the state
+    constraints, and only needs cumulative sums and clipping, so it runs on NumPy alone.
+
+    Any object with a method solve(problem, primal, dual) -> (primal, dual) can be used as a backend instead. primal is
+    the start point of the variables, dual that of the multipliers as returned by the previous solve, or None.
+    """
+    def __init__(self, iterations : int = 100, curvature : float = 2.0):
+        self.iterations = iterations
+        self.curvature = curvature  # bound on the second derivative of the objective with respect to the load
+
+    def solve(self, problem : SchedulingProblem, primal : Dict[str, np.ndarray],
+              dual : Optional[Dict[str, np.ndarray]] = None) -> Tuple[Dict[str, np.ndarray], Dict[str, np.ndarray]]:
+        steps = problem.fixed_load.shape[0]
+        variables_per_step = sum(primal[asset].shape[1] for asset in primal)
+        lipschitz = self.curvature * variables_per_step / problem.number_of_houses ** 2
+        # Row and column sums of the cumulative sum operators give steps for which the iteration converges
+        tau = {}
+        sigma = {}
+        bounds = {}
+        for asset, state in problem.states.items():
+            gain = np.abs(state.gain)
+            tau[asset] = 1.0 / (np.cumsum(gain[::-1], axis=0)[::-1] + lipschitz + 1e-12)
+            sigma[asset] = 1.0 / (np.cumsum(gain, axis=0) + 1e-12)
+            bounds[asset] = state.bounds()
+
+        x = problem.project(primal)
+        y = {asset: np.zeros_like(x[asset]) if dual is None or asset not in dual or dual[asset].shape != x[asset].shape
+             else dual[asset] for asset in problem.states}
+        for _ in range(self.iterations):
+            _, gradient = problem.cost(x)
+            new_x = {}
+            for asset in x:
+                step = gradient[asset]
+                if asset in problem.states:
+                    step = step + problem.states[asset].apply_transpose(y[asset])
+                    new_x[asset] = np.clip(x[asset] - tau[asset] * step, problem.lower[asset], problem.upper[asset])
+                else:
+                    new_x[asset] = np.clip(x[asset] - step / lipschitz, problem.lower[asset], problem.upper[asset])
+            for asset, state in problem.states.items():
+                lower, upper = bounds[asset]
+                v = y[asset] + sigma[asset] * state.apply(2 * new_x[asset] - x[asset])
+                y[asset] = v - sigma[asset] * np.clip(v / sigma[asset], lower, upper)
+            x = new_x
+        return x, y
+
+class RollingHorizonStrategy:
+    """
+    Neighborhood fleet strategy that plans the consumption of all batteries, EVs and heat pumps over the coming
+    horizon time steps, and solves the plan again every resolve_interval time steps
+
+    The plan uses the power limits and sizes of the assets, the EV sessions and trips, and the tank limits of the heat
+    pumps, with the heat demand of the houses if they are kept at T_set. The tanks are planned between tank_T_set and
+    tank_T_max_limit, which leaves a buffer for demand that the plan did not foresee. Every solve starts from the previous plan. At
+    every time step the planned consumption is clipped to the min and max of the assets, so the constraints hold even
+    where the plan is not exact. PV is assumed to generate max_power.
+
+    objective is 'peak', 'import', 'renewable_import' or a function objective(load, renewable_share) ->
+    (value, gradient), see SchedulingProblem. solver is the solver backend, a PrimalDualSolver by default.
+    """
+    fleet_strategy = True
+    fleet_aggregates = None
+
+    def __init__(self, horizon : int = constants.AMOUNT_OF_TIME_STEPS_IN_DAY, resolve_interval : int = 4,
+                 objective='peak', solver=None):
+        if objective in OBJECTIVES:
+            objective = OBJECTIVES[objective]
+        elif not callable(objective):
+            raise ValueError(f"objective should be one of {list(OBJECTIVES)} or a function, not {objective}")
+        self.horizon = horizon
+        self.resolve_interval = resolve_interval
+        self.objective = objective
+        self.solver = solver if solver is not None else PrimalDualSolver()
+        self.plan : Optional[Dict[str, np.ndarray]] = None
+        self.dual : Optional[Dict[str, np.ndarray]] = None
+        self.plan_time_step = 0
+
+    def __repr__(self) -> str:
+        return f"RollingHorizonStrategy(horizon={self.horizon}, resolve_interval={self.resolve_interval}, " \
+               f"objective={getattr(self.objective, '__name__', self.objective)}, solver={type(self.solver).__name__})"
+
+    def build_problem(self, time_step : int, fleet : Fleet, renewable_share : np.ndarray) -> SchedulingProblem:
+        steps = min(self.horizon, fleet.sim_length - time_step)
+        stop = time_step + steps
+        hours_per_step = TIME_STEP_SECONDS / 3600
+        houses = fleet.number_of_houses
+        lower = {}
+        upper = {}
+        states = {}
+
+        batt = fleet.batt
+        lower['batt'] = np.broadcast_to(- batt.power_max, (steps, houses))
+        upper['batt'] = np.broadcast_to(batt.power_max, (steps, houses))
+        states['batt'] = StateConstraint(batt.energy.copy(), np.full((steps, houses), hours_per_step),
+                                         np.zeros((steps, houses)), 0.0, batt.size)
+
+        ev = fleet.ev
+        events = ev.events
+        trips = np.zeros((steps, houses))
+        first, last = events.departure_pointer[time_step], events.departure_pointer[stop]
+        trips[events.departure_steps[first:last] - time_step, events.departure_houses[first:last]] = \
+            events.departure_trip_energy[first:last]
+        lower['ev'] = np.zeros((steps, houses))
+        upper['ev'] = np.where(events.present(time_step, stop), ev.power_max, 0.0)
+        states['ev'] = StateConstraint(ev.energy.copy(), np.full((steps, houses), hours_per_step), trips, 0.0, ev.size)
+
+        hp = fleet.hp
+        cop = hp.cop_schedule(time_step, steps)
+        tank_heat_capacity = hp.tank_mass * hp.heat_capacity_water
+        _, heat_demand = hp.thermal_model.heated_trajectory(time_step, hp.temperatures, hp.T_set, steps)
+        lower['hp'] = np.zeros((steps, houses))
+        upper['hp'] = hp.nominal_power / cop / 1000.0
+        states['hp'] = StateConstraint(hp.tank_T.copy(), TIME_STEP_SECONDS * 1000 * cop / tank_heat_capacity,
+                                       heat_demand / tank_heat_capacity, hp.tank_T_set, hp.tank_T_max_limit)
+
+        fixed_load = fleet.base_data[time_step:stop].sum(axis=1) + fleet.pv.max_power[time_step:stop].sum(axis=1)
+        return SchedulingProblem(fixed_load, np.asarray(renewable_share[time_step:stop], dtype=np.float64), lower, upper,
+                                 states, self.objective)
+
+    def warm_start(self, problem : SchedulingProblem, time_step : int) -> Dict[str, np.ndarray]:
+        """
+        The previous plan shifted to time_step, with its last step repeated to fill the horizon
+        """
+        steps = problem.fixed_load.shape[0]
+        shift = time_step - self.plan_time_step
+        if self.plan is None or shift < 0:
+            self.dual = None
+            return {asset: np.zeros_like(problem.lower[asset]) for asset in PLANNED_ASSETS}
+
+        def shifted(array : np.ndarray) -> np.ndarray:
+            array = array[shift:shift + steps]
+            if array.shape[0] == 0:
+                return np.zeros((steps,) + array.shape[1:])
+            return np.concatenate([array, np.repeat(array[-1:], steps - array.shape[0], axis=0)])
+
+        self.dual = {asset: shifted(dual) for asset, dual in self.dual.items()} if self.dual is not None else None
+        return {asset: shifted(self.plan[asset]) for asset in PLANNED_ASSETS}
+
+    def __call__(self, time_step : int, temperature_data : np.ndarray, renewable_share : np.ndarray, fleet : FleetStepView):
+        if self.plan is None or time_step - self.plan_time_step >= self.resolve_interval \
+                or time_step < self.plan_time_step:
+            problem = self.build_problem(time_step, fleet.fleet, renewable_share)
+            start = self.warm_start(problem, time_step)
+            self.plan, self.dual = self.solver.solve(problem, start, self.dual)
+            self.plan_time_step = time_step
+
+        step = time_step - self.plan_time_step
+        for asset in PLANNED_ASSETS:
+            asset_view = getattr(fleet, asset)
+            asset_view.consumption[:] = np.clip(self.plan[asset][step], asset_view.min, asset_view.max)
@@ -0,0 +1,129 @@
+from typing import Dict, List, Tuple
+import numpy as np
+
+import constants
+
+class ScenarioExpansion:
+    """
+    Houses beyond the ones in the scenario data, built by recombining and time-shifting the data of existing houses
+
+    Every extra house takes its base load, PV, EV and heat pump parameters from independently drawn houses of the
+    scenario. The base load and the EV sessions are also shifted by a random number of whole days, wrapping around at
+    the end of the data, so the time of day stays the same. The Simulator loads a scenario store at its full length
+    for this, so the wrap-around and the houses are the same for the store and the pickle it was made from. The PV and heat pump are not shifted, because they belong
+    with the weather that all houses share (the renewable share and the ambient temperature).
+
+    The shifted series are views into one doubled copy of every source series that is used, so the memory grows with
+    the number of source houses and not with the number of houses. The houses only depend on seed and on the size of
+    the scenario, so a subset of the houses (as in a ShardedSimulator) gets the same data as in a full simulation.
+    """
+    def __init__(self, scenario_data : Dict, number_of_houses : int, seed : int = 0):
+        self.baseloads = scenario_data['baseloaddata']
+        self.pv_data = scenario_data['irrdata']
+        self.ev_data : List[Dict] = scenario_data['ev_data']
+        self.number_of_source_houses = len(self.baseloads)
+        self.number_of_hp_parameter_sets = len(scenario_data['hp_data']['super_matrix'])
+        self.length = np.asarray(self.baseloads[0]).size
+        number_of_days = self.length // constants.AMOUNT_OF_TIME_STEPS_IN_DAY
+
+        extra = max(0, number_of_houses - self.number_of_source_houses)
+        rng = np.random.default_rng(seed)
+        self.baseload_source = rng.integers(0, self.number_of_source_houses, extra)
+        self.baseload_shift = rng.integers(0, number_of_days, extra) * constants.AMOUNT_OF_TIME_STEPS_IN_DAY
+        self.pv_source = rng.integers(0, self.number_of_source_houses, extra)
+        self.ev_source = rng.integers(0, self.number_of_source_houses, extra)
+        self.ev_shift = rng.integers(0, number_of_days, extra) * constants.AMOUNT_OF_TIME_STEPS_IN_DAY
+        self.hp_source = rng.integers(0, self.number_of_hp_parameter_sets, extra)
+
+        self._doubled_baseloads : Dict[int, np.ndarray] = {}
+        self._doubled_ev_data : Dict[int, Dict] = {}
+
+    def is_synthetic(self, house : int) -> bool:
+        return house >= self.number_of_source_houses
+
+    def house_data(self, house : int) -> Dict:
+        """
+        baseload, pv_data, ev_data and hp_parameter_index of an extra house, house >= number_of_source_houses
+        """
+        index = house - self.number_of_source_houses
+        return {'baseload': self.shifted_baseload(int(self.baseload_source[index]), int(self.baseload_shift[index])),
+                'pv_data': self.pv_data[int(self.pv_source[index])],
+                'ev_data': self.shifted_ev_data(int(self.ev_source[index]), int(self.ev_shift[index])),
+                'hp_parameter_index': int(self.hp_source[index])}
+
+    def baseload_series(self, house : int) -> Tuple[np.ndarray, int]:
+        """
+        Doubled base load of the source of an extra house and the shift of the house, its base load is
+        series[shift:shift + length]
+        """
+        index = house - self.number_of_source_houses
+        source = int(self.baseload_source[index])
+        self.shifted_baseload(source, 0)
+        return self._doubled_baseloads[source], int(self.baseload_shift[index])
+
+    def shifted_baseload(self, source : int, shift : int) -> np.ndarray:
+        if source not in self._doubled_baseloads:
+            baseload = np.asarray(self.baseloads[source])
+            self._doubled_baseloads[source] = np.concatenate([baseload, baseload])
+        return self._doubled_baseloads[source][shift:shift + self.length]
+
+    def shifted_ev_data(self, source : int, shift : int) -> Dict:
+        """
+        EV data of house source of the scenario, shifted by shift time steps. The sessions of the second copy of the
+        doubled status get new numbers, so a session that is cut by the wrap-around is two sessions, each with its own
+        departure time.
+        """
+        if source not in self._doubled_ev_data:
+            ev = self.ev_data[source]
+            status = np.asarray(ev['EV_status'])
+            number_of_sessions = max(len(ev['Trip_Energy']), len(ev['T_leave']), len(ev['T_arrival']))
+            trip_energy = np.concatenate([ev['Trip_Energy'], np.zeros(number_of_sessions - len(ev['Trip_Energy']))])
+            self._doubled_ev_data[source] = {
+                'EV_status': np.concatenate([status, np.where(status == -1, status, status + number_of_sessions)]),
+                'Trip_Energy': np.concatenate([trip_energy, trip_energy])}
+        ev = self.ev_data[source]
+        doubled = self._doubled_ev_data[source]
+        shifted = dict(ev)
+        shifted['EV_status'] = doubled['EV_status'][shift:shift + self.length]
+        shifted['Trip_Energy'] = doubled['Trip_Energy']
+        for key in ['T_arrival', 'T_leave']:
+            times = np.asarray(ev[key])
+            padding = np.zeros(len(doubled['Trip_Energy']) // 2 - len(times), dtype=times.dtype)
+            shifted[key] = np.concatenate([times - shift, padding, times + self.length - shift])
+        return shifted
+
+class ScenarioPerturbation:
+    """
+    Random changes to the scenario data of one simulation, as used for the members of an ensemble (see Ensemble.py)
+
+    - ev_shift: shift the EV sessions of every house by a random number of whole days, as in a ScenarioExpansion
+    - weather_noise: multiply the PV irradiance and the renewable share by a random factor per day, the same for all
+      houses, lognormal with mean 1 and this standard deviation of its log. The renewable share stays between 0 and 1.
+
+    The ambient temperature is not changed, because the building model of the heat pumps is precomputed for it.
+    """
+    def __init__(self, ev_shift : bool = False, weather_noise : float = 0.0):
+        self.ev_shift = ev_shift
+        self.weather_noise = weather_noise
+
+    def apply(self, scenario_data : Dict, rng : np.random.Generator) -> Dict:
+        """
+        Perturbed copy of scenario_data, the arrays that are not changed are shared with it
+        """
+        scenario_data = dict(scenario_data)
+        number_of_houses = len(scenario_data['baseloaddata'])
+        length = np.asarray(scenario_data['baseloaddata'][0]).size
+        number_of_days = length // constants.AMOUNT_OF_TIME_STEPS_IN_DAY
+        if self.ev_shift:
+            expansion = ScenarioExpansion(scenario_data, number_of_houses)
+            shifts = rng.integers(0, number_of_days, number_of_houses) * constants.AMOUNT_OF_TIME_STEPS_IN_DAY
+            scenario_data['ev_data'] = [expansion.shifted_ev_data(house, int(shift)) for house, shift in enumerate(shifts)]
+        if self.weather_noise > 0:
+            ren_share = np.asarray(scenario_data['ren_share'], dtype=np.float64)
+            steps = max(length, ren_share.size)
+            daily_factor = np.exp(rng.normal(- self.weather_noise ** 2 / 2, self.weather_noise,
+                                             -(-steps // constants.AMOUNT_OF_TIME_STEPS_IN_DAY)))
+            factor = np.repeat(daily_factor, constants.AMOUNT_OF_TIME_STEPS_IN_DAY)
+            scenario_data['irrdata'] = np.asarray(scenario_data['irrdata'], dtype=np.float64) * factor[:length]
+            scenario_data['ren_share'] = np.clip(ren_share * factor[:ren_share.size], 0.0, 1.0)
+        return scenario_data
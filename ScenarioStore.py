@@ -0,0 +1,161 @@
+from typing import Dict, List, Optional
+import json
+import os.path
+import pickle
+import sys
+import numpy as np
+
+INDEX_FILE = "index.json"
+
+# Keys of hp_data that hold one entry per house, and the axis of those arrays that runs over time (None if constant)
+HP_HOUSE_KEYS = {'super_matrix': None, 'K_inv': None, 'M': None, 'alpha': 1, 'v_part': 1, 'b_part': 1}
+# Keys of hp_data that only run over time
+HP_TIME_KEYS = {'ambient_temp': 0}
+
+def convert_pickle_to_store(path_to_pkl_data : str, path_to_store : str):
+    """
+    One-time conversion of the scenario pickle (data.pkl) to a directory of .npy files that can be memory-mapped
+
+    Every array gets its own file, described in index.json together with its house and time axes. The ragged per
+    session EV arrays are padded with zeros, their lengths are stored next to them.
+    """
+    with open(path_to_pkl_data, 'rb') as f:
+        scenario_data = pickle.load(f)
+    write_store(scenario_data, path_to_store, source_stamp(path_to_pkl_data))
+
+def source_stamp(path : str) -> Dict:
+    """
+    Size and modification time of a file, which change when it is replaced or edited
+    """
+    status = os.stat(path)
+    return {'size': status.st_size, 'mtime_ns': status.st_mtime_ns}
+
+def cached_store(path_to_pkl_data : str, path_to_store : str) -> Dict:
+    """
+    Converts the pickle to a store in path_to_store, unless the store there was converted from the pickle as it is now
+    (the same source_stamp). Returns the source_stamp, to key results on the data they were simulated with.
+    """
+    stamp = source_stamp(path_to_pkl_data)
+    if not is_scenario_store(path_to_store) or read_store_index(path_to_store).get('source') != stamp:
+        convert_pickle_to_store(path_to_pkl_data, path_to_store)
+    return stamp
+
+def write_store(scenario_data : Dict, path_to_store : str, source : Optional[Dict] = None):
+    """
+    Writes scenario data with the schema of data.pkl to a scenario store directory. source is the source_stamp of the
+    pickle it was converted from, if any.
+    """
+    os.makedirs(path_to_store, exist_ok=True)
+    index = {'arrays': {}, 'ev_keys': [], 'hp_keys': [], 'other_keys': []}
+    if source is not None:
+        index['source'] = source
+
+    def save(name : str, array : np.ndarray, house_axis, time_axis):
+        np.save(os.path.join(path_to_store, name + ".npy"), np.ascontiguousarray(array))
+        index['arrays'][name] = {'house_axis': house_axis, 'time_axis': time_axis}
+
+    baseloads = np.asarray(scenario_data['baseloaddata'], dtype=np.float64)
+    index['number_of_houses'] = baseloads.shape[0]
+    index['length'] = baseloads.shape[1]
+    save('baseloaddata', baseloads, 0, 1)
+    save('irrdata', np.asarray(scenario_data['irrdata'], dtype=np.float64), 0, 1)
+    save('ren_share', np.asarray(scenario_data['ren_share'], dtype=np.float64), None, 0)
+
+    ev_data : List[Dict] = scenario_data['ev_data']
+    for key in ev_data[0].keys():
+        values = [np.asarray(ev[key]) for ev in ev_data]
+        if all(value.ndim == 0 for value in values):
+            save('ev_' + key, np.array(values), 0, None)
+        elif all(value.shape == (index['length'],) for value in values):
+            save('ev_' + key, np.stack(values), 0, 1)
+        else:  # ragged per session arrays
+            lengths = np.array([value.size for value in values])
+            padded = np.zeros((len(values), max(1, lengths.max())), dtype=np.result_type(*values))
+            for house, value in enumerate(values):
+                padded[house, :value.size] = value
+            save('ev_' + key, padded, 0, None)
+            save('ev_' + key + '_lengths', lengths, 0, None)
+        index['ev_keys'].append(key)
+
+    for key, value in scenario_data['hp_data'].items():
+        if key in HP_HOUSE_KEYS:
+            time_axis = HP_HOUSE_KEYS[key]
+            save('hp_' + key, np.asarray(value), 0, time_axis)
+        else:
+            save('hp_' + key, np.asarray(value), None, HP_TIME_KEYS.get(key))
+        index['hp_keys'].append(key)
+
+    for key, value in scenario_data.items():
+        if key not in ['baseloaddata', 'irrdata', 'ren_share', 'ev_data', 'hp_data']:
+            save(key, np.asarray(value), None, None)
+            index['other_keys'].append(key)
+
+    with open(os.path.join(path_to_store, INDEX_FILE), 'w') as f:
+        json.dump(index, f, indent=2)
+
+def is_scenario_store(path : str) -> bool:
+    return os.path.isfile(os.path.join(path, INDEX_FILE))
+
+def read_store_index(path_to_store : str) -> Dict:
+    with open(os.path.join(path_to_store, INDEX_FILE), 'r') as f:
+        return json.load(f)
+
+def load_store(path_to_store : str, number_of_houses : int, sim_length : int, mmap_mode : str = 'r') -> Dict:
+    """
+    Memory-maps a scenario store and returns it with the same schema as data.pkl
+
+    Only the first number_of_houses houses and the first sim_length time steps are sliced out of the memory-mapped
+    arrays, so nothing is read from disk before it is used. Processes that load the same store share its pages through
+    the OS cache.
+    """
+    index = read_store_index(path_to_store)
+    if number_of_houses > index['number_of_houses'] or sim_length > index['length']:
+        raise ValueError(f"number_of_houses <= {index['number_of_houses']} and sim_length <= {index['length']}")
+
+    def load(name : str) -> np.ndarray:
+        array = np.load(os.path.join(path_to_store, name + ".npy"), mmap_mode=mmap_mode)
+        axes = index['arrays'][name]
+        slices = [slice(None)] * array.ndim
+        if axes['house_axis'] is not None:
+            slices[axes['house_axis']] = slice(0, number_of_houses)
+        if axes['time_axis'] is not None:
+            slices[axes['time_axis']] = slice(0, sim_length)
+        return array[tuple(slices)].view(np.ndarray)  # plain ndarray view, indexing a np.memmap is slow
+
+    ev_columns = {key: load('ev_' + key) for key in index['ev_keys']}
+    ev_lengths = {key: load('ev_' + key + '_lengths') for key in index['ev_keys']
+                  if 'ev_' + key + '_lengths' in index['arrays']}
+    ev_data = []
+    for house in range(number_of_houses):
+        ev = {}
+        for key, column in ev_columns.items():
+            if key in ev_lengths:
+                ev[key] = column[house, :ev_lengths[key][house]]
+            elif column.ndim == 1:
+                ev[key] = column[house].item()
+            else:
+                ev[key] = column[house]
+        ev_data.append(ev)
+
+    scenario_data = {'baseloaddata': load('baseloaddata'),
+                     'irrdata': load('irrdata'),
+                     'ren_share': load('ren_share'),
+                     'ev_data': ev_data,
+                     'hp_data': {key: load('hp_' + key) for key in index['hp_keys']}}
+    for key in index['other_keys']:
+        scenario_data[key] = load(key)
+    return scenario_data
+
+def main():
+    """
+    Converts a scenario pickle to a scenario store: python ScenarioStore.py data/data.pkl data/store
+    """
+    if len(sys.argv) != 3:
+        print("Usage: python ScenarioStore.py <path_to_pkl_data> <path_to_store>")
+        return 1
+    convert_pickle_to_store(sys.argv[1], sys.argv[2])
+    print(f"Converted {sys.argv[1]} to {sys.argv[2]}")
+    return 0
+
+if __name__ == '__main__':
+    exit(main())
@@ -0,0 +1,112 @@
+from typing import Dict, List, Optional
+import multiprocessing
+import os
+import traceback
+import numpy as np
+
+from Simulator import Simulator, StrategyOrder, is_noop_strategy
+from Fleet import strategy_aggregates
+from Validation import ValidationLevel
+
+class ShardWorkerSimulator(Simulator):
+    """
+    Simulator of one shard of the houses, running in a worker process of a ShardedSimulator
+
+    The aggregates of the neighborhood strategy are sent to the coordinator, which answers with the sum over all shards.
+    """
+    def __init__(self, connection, **simulator_arguments):
+        super().__init__(**simulator_arguments)
+        self.connection = connection
+
+    def reduce_aggregates(self, partial_aggregates : Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        self.connection.send(('aggregate', partial_aggregates))
+        return self.connection.recv()
+
+def _run_shard(connection, simulator_arguments : Dict, initialize_arguments : Dict, houses : List[int]):
+    try:
+        simulator = ShardWorkerSimulator(connection, **simulator_arguments)
+        simulator.initialize(houses=houses, **initialize_arguments)
+        simulator.start_simulation(print_progress=False)
+        connection.send(('done', simulator.total_load, simulator.ren_share, getattr(simulator, 'reference_load', None)))
+    except Exception:
+        connection.send(('error', traceback.format_exc()))
+    finally:
+        connection.close()
+
+class ShardedSimulator:
+    """
+    Runs one simulation with the houses partitioned over several worker processes
+
+    Every worker builds and simulates only its own houses, with the same data as in a Simulator with all houses. The
+    workers only exchange what cannot be computed per shard:
+    - the total load, which every worker sums over its houses and which is added up at the end
+    - the aggregates declared by a neighborhood strategy with @fleet_strategy(aggregates=...), which are summed over
+      the shards every time the strategy is called, keeping the workers in lockstep
+
+    A neighborhood strategy that needs the assets of all houses cannot be sharded. Use a scenario store as data, so the
+    workers share the scenario data instead of each loading the pickle.
+    """
+    def __init__(self, control_order, battery_strategy, hp_strategy, pv_strategy, ev_strategy, neighborhood_strategy, house_strategy,
+                 number_of_workers : Optional[int] = None, use_fleet : bool = True, consumption_dtype=np.float64,
+                 validation : ValidationLevel = ValidationLevel.FULL):
+        if StrategyOrder.NEIGHBORHOOD in control_order and not is_noop_strategy(neighborhood_strategy) \
+                and strategy_aggregates(neighborhood_strategy) is None:
+            raise ValueError("The neighborhood strategy needs the assets of all houses, so the houses cannot be sharded. "
+                             "Use a fleet strategy that declares the aggregates it needs, see fleet_strategy.")
+
+        self.simulator_arguments = {'control_order': control_order, 'battery_strategy': battery_strategy,
+                                    'hp_strategy': hp_strategy, 'pv_strategy': pv_strategy, 'ev_strategy': ev_strategy,
+                                    'neighborhood_strategy': neighborhood_strategy, 'house_strategy': house_strategy,
+                                    'use_fleet': use_fleet, 'consumption_dtype': consumption_dtype, 'validation': validation}
+        self.number_of_workers = number_of_workers if number_of_workers is not None else os.cpu_count()
+        self.total_load : np.ndarray = np.array([])
+        self.ren_share : np.ndarray = np.array([])
+
+    def initialize(self, sim_length : int, number_of_houses : int, path_to_pkl_data : str, path_to_reference_data : str):
+        self.sim_length = sim_length
+        self.number_of_houses = number_of_houses
+        self.initialize_arguments = {'sim_length': sim_length, 'number_of_houses': number_of_houses,
+                                     'path_to_pkl_data': path_to_pkl_data, 'path_to_reference_data': path_to_reference_data}
+        self.shards = [shard.tolist() for shard in np.array_split(np.arange(number_of_houses),
+                                                                 max(1, min(self.number_of_workers, number_of_houses)))]
+        self.total_load = np.zeros(sim_length)
+
+    def start_simulation(self):
+        connections = []
+        processes = []
+        for houses in self.shards:
+            connection, worker_connection = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=_run_shard, args=(worker_connection, self.simulator_arguments,
+                                                                       self.initialize_arguments, houses))
+            process.start()
+            worker_connection.close()
+            connections.append(connection)
+            processes.append(process)
+
+        try:
+            results = self._coordinate(connections)
+        finally:
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
+                process.join()
+
+        self.total_load = np.sum([result[1] for result in results], axis=0)
+        self.ren_share = results[0][2]
+        if results[0][3] is not None:
+            self.reference_load = results[0][3]
+
+    def _coordinate(self, connections : List) -> List:
+        while True:
+            messages = [connection.recv() for connection in connections]
+            kinds = [message[0] for message in messages]
+            if 'error' in kinds:
+                raise RuntimeError(f"Error in shard {kinds.index('error')}:\n{messages[kinds.index('error')][1]}")
+            if all(kind == 'done' for kind in kinds):
+                return messages
+            if not all(kind == 'aggregate' for kind in kinds):
+                raise RuntimeError("Shards are out of lockstep")
+
+            aggregates = {name: np.sum([message[1][name] for message in messages], axis=0) for name in messages[0][1]}
+            for connection in connections:
+                connection.send(aggregates)
@@ -1,17 +1,65 @@
 from enum import Enum
+from itertools import groupby
+import operator
 import os.path
 import pickle
-from typing import List
+from typing import Callable, List, Optional, Dict
 import numpy as np
 
 import constants
-from ModelClasses import House
+from ModelClasses import House, UnsetConsumptionError, ConsumptionClock
+from Fleet import Fleet, is_fleet_strategy, strategy_aggregates
+from ScenarioStore import is_scenario_store, load_store, read_store_index
+from ScenarioExpansion import ScenarioExpansion, ScenarioPerturbation
+import Checkpoint
+from StreamingMetrics import StreamingMetrics
+from Profiler import Profiler, no_measurement
+from Validation import ValidationLevel, Validator
+from Exogenous import ExogenousTable
+from BlockSchedule import BlockScheduler, is_block_strategy
+from ResultStore import ResultWriter
 
 class StrategyOrder(Enum):
     INDIVIDUAL = 1
     HOUSEHOLD = 2
     NEIGHBORHOOD = 3
 
+def noop_strategy(strategy):
+    """
+    Decorator that declares that a strategy does nothing, so the simulator can skip it
+    """
+    strategy.noop_strategy = True
+    return strategy
+
+def is_noop_strategy(strategy) -> bool:
+    """
+    True for strategies declared with @noop_strategy. Other strategies are always called, also when they do nothing.
+    """
+    return getattr(strategy, 'noop_strategy', False)
+
+# Asset attributes of a House, in the order in which the individual tier calls their strategies
+INDIVIDUAL_ASSETS = ['pv', 'ev', 'hp', 'batt']
+# Strategy attributes of a Simulator that initialize passes to the houses and their assets
+ENTITY_STRATEGIES = {'house': 'house_strategy', 'pv': 'pv_strategy', 'ev': 'ev_strategy', 'hp': 'hp_strategy',
+                     'batt': 'batt_strategy'}
+STRATEGY = operator.attrgetter('strategy')
+
+class DispatchGroup:
+    """
+    Calls of the compiled dispatch plan that run one after the other: all calls of a StrategyOrder tier, and for the
+    individual tier the calls of one asset type. Every call is a bound simulate_individual_entity, or the neighborhood
+    strategy, and is called as call(time_step, temperature_data, renewable_share).
+
+    stage is the index of the tier in control_order, asset is '' for the household and neighborhood tiers. key is the
+    key of the group in a Profiler.
+    """
+    def __init__(self, stage : int, tier : StrategyOrder, asset : str, calls : List[Callable]):
+        self.stage = stage
+        self.tier = tier
+        self.asset = asset
+        self.calls = calls
+        self.key = ('control_strategy', tier.name.lower(), asset)
+
 class Simulator:
     """
     This class does several things:
@@ -23,7 +71,13 @@ class Simulator:
     Please don't touch the parts related to the first two functionalities!
     """
     
-    def __init__(self, control_order, battery_strategy, hp_strategy, pv_strategy, ev_strategy, neighborhood_strategy, house_strategy):
+    def __init__(self, control_order, battery_strategy, hp_strategy, pv_strategy, ev_strategy, neighborhood_strategy, house_strategy,
+                 use_fleet : bool = False, consumption_dtype=np.float64, keep_history : bool = True,
+                 streaming_metrics : bool = False, profile : bool = False,
+                 validation : ValidationLevel = ValidationLevel.FULL, validation_sample_rate : float = 0.1,
+                 block_strategy=None, results_path : Optional[str] = None, expand_scenario : bool = False,
+                 expansion_seed : int = 0, scenario_rng : Optional[np.random.Generator] = None,
+                 perturbation : Optional[ScenarioPerturbation] = None):
         self.list_of_houses : List[House] = []
         self.ren_share : np.ndarray = np.array([])
         self.temperature_data : np.ndarray = np.array([])
@@ -35,28 +89,106 @@ class Simulator:
         self.neighborhood_strategy = neighborhood_strategy
         self.total_load : np.ndarray = np.array([])
         self.control_order : List[StrategyOrder] = control_order
+        # control_order compiled by initialize into the calls of every time step, see compile_dispatch_plan. It is
+        # compiled again when a strategy or the control order changes, see plan_key
+        self.dispatch_plan : List[DispatchGroup] = []
+        self._dispatch_plan_key : tuple = ()
+        self._dispatch_plan_strategies : Dict[str, Callable] = {}
+        # keep the asset state in fleet-wide arrays and vectorize set_min_max and response, fleet strategies need this
+        self.use_fleet = use_fleet or is_fleet_strategy(neighborhood_strategy)
+        self.fleet : Optional[Fleet] = None
+        self.consumption_dtype = consumption_dtype # np.float32 halves the memory of the consumption buffers
+        self.start_time_step = 0 # first time step of start_simulation, changed by load_checkpoint
+        # Without history the assets only keep the consumption of the last day, and no energy history
+        self.keep_history = keep_history
+        self.consumption_clock : Optional[ConsumptionClock] = None
+        # Update a StreamingMetrics every time step, available as .metrics
+        self.streaming_metrics = streaming_metrics
+        self.metrics : Optional[StreamingMetrics] = None
+        # Write the time series of every house to a result store in this directory, see ResultStore.py
+        self.results_path = results_path
+        self.results : Optional[ResultWriter] = None
+        # Build the houses beyond the ones in the scenario data from recombined and shifted data, see ScenarioExpansion.py
+        self.expand_scenario = expand_scenario
+        self.expansion_seed = expansion_seed
+        self.expansion : Optional[ScenarioExpansion] = None
+        # Random assignment of the houses of the data to the simulated houses instead of the fixed one, drawn from all houses
+        # of the data, and optional random changes to the data, as in an ensemble (see Ensemble.py)
+        self.scenario_rng = scenario_rng
+        self.perturbation = perturbation
+        if perturbation is not None and scenario_rng is None:
+            raise ValueError("A perturbation needs a scenario_rng")
+        # Measure the time of every phase, tier and asset class, see Profiler. The phases of a time step measure their
+        # parts with measure, which does nothing without profiler.
+        self.profiler : Optional[Profiler] = Profiler() if profile else None
+        self.measure = self.profiler.measure if profile else no_measurement
+        # How the constraints of the assets are checked, see ValidationLevel
+        self.validation = validation
+        self.validation_sample_rate = validation_sample_rate
+        self.validator : Optional[Validator] = None
+        # Strategy decorated with @block_strategy that schedules the batteries and/or EVs per block, see BlockSchedule.py
+        self.block_strategy = block_strategy
+        self.block_scheduler : Optional[BlockScheduler] = None
+        if block_strategy is not None:
+            if not is_block_strategy(block_strategy):
+                raise ValueError("block_strategy has to be decorated with @block_strategy")
+            self.use_fleet = True
+            for asset, strategy in [('batt', battery_strategy), ('ev', ev_strategy)]:
+                if asset in block_strategy.block_assets and not is_noop_strategy(strategy):
+                    raise ValueError(f"The {asset} strategy is not called for assets scheduled by the block strategy, "
+                                     f"pass a strategy decorated with @noop_strategy")
 
     def set_min_max_ders(self, time_step : int):
-        for house in self.list_of_houses:
-            house.pv.set_min_max(time_step)
-            house.ev.set_min_max(time_step)
-            house.batt.set_min_max(time_step)
-            house.hp.set_min_max(time_step)
+        if self.fleet is not None:
+            self.fleet.set_min_max(time_step, self.measure)
+            return
+
+        # asset type by asset type, which gives the same result as house by house because the limits of an asset only
+        # depend on the asset itself
+        for name, assets in [('pv', self.pvs), ('ev', self.evs), ('batt', self.batteries), ('hp', self.hps)]:
+            with self.measure(('set_min_max_ders', '', name), time_step, len(assets)):
+                for asset in assets:
+                    asset.set_min_max(time_step)
+
+    def initialize(self, sim_length : int, number_of_houses : int, path_to_pkl_data : str, path_to_reference_data : str,
+                   houses : Optional[List[int]] = None):
+        """
+        path_to_pkl_data can be the data.pkl file, or a scenario store directory created with ScenarioStore.py. A store
+        is memory-mapped, so only the data of the simulated houses and time steps is read.
 
-    def initialize(self, sim_length : int, number_of_houses : int, path_to_pkl_data : str, path_to_reference_data : str):
+        houses optionally selects a subset of the number_of_houses houses to build, as used by the ShardedSimulator.
+        Every house gets the same data as in a simulation of all houses.
+        """
         #Scenario Parameters
         np.random.seed(42) 
         self.total_load = np.zeros(sim_length)
+        if not self.keep_history:
+            self.consumption_clock = ConsumptionClock(constants.AMOUNT_OF_TIME_STEPS_IN_DAY)
     
         #Load pre-configured data
-        if os.path.isfile(path_to_pkl_data): 
+        if os.path.isfile(path_to_pkl_data) or is_scenario_store(path_to_pkl_data):
             self.sim_length = sim_length
-            f = open(path_to_pkl_data, 'rb')
-            scenario_data = pickle.load(f)
+            if is_scenario_store(path_to_pkl_data):
+                index = read_store_index(path_to_pkl_data)
+                number_of_stored_houses = number_of_houses
+                if self.scenario_rng is not None:
+                    number_of_stored_houses = index['number_of_houses']
+                elif self.expand_scenario:
+                    number_of_stored_houses = min(number_of_houses, index['number_of_houses'])
+                # the shifts of an expansion or perturbation wrap around at the end of the data, so they need all of it,
+                # as in the pickle, to give the same houses for both
+                stored_length = index['length'] if self.expand_scenario or self.perturbation is not None else sim_length
+                scenario_data = load_store(path_to_pkl_data, number_of_stored_houses, stored_length)
+            else:
+                with open(path_to_pkl_data, 'rb') as f:
+                    scenario_data = pickle.load(f)
+            if self.perturbation is not None:
+                scenario_data = self.perturbation.apply(scenario_data, self.scenario_rng)
             baseloads = scenario_data['baseloaddata']
 
-            if number_of_houses > len(baseloads) or sim_length > baseloads[0].size:
-                raise ValueError(f"number_of_houses <= {len(baseloads)} and sim_length <= {baseloads[0].size}")
+            if (number_of_houses > len(baseloads) and not self.expand_scenario) or sim_length > baseloads[0].size:
+                raise ValueError(f"number_of_houses <= {len(baseloads)} and sim_length <= {baseloads[0].size}, or use "
+                                 f"expand_scenario=True for more houses")
 
             pv_data = scenario_data['irrdata']
             ev_data = scenario_data["ev_data"]
@@ -64,34 +196,62 @@ class Simulator:
             temperature_data = hp_data["ambient_temp"][:, 0]
             ren_share = scenario_data['ren_share']
             #determine distribution of data
-            distribution = np.arange(number_of_houses)
-            np.random.shuffle(distribution)
-        
+            if self.scenario_rng is not None:
+                distribution = self.scenario_rng.permutation(len(baseloads))[:number_of_houses]
+            else:
+                distribution = np.arange(min(number_of_houses, len(baseloads)))
+                np.random.shuffle(distribution)
+            if self.expand_scenario:
+                self.expansion = ScenarioExpansion(scenario_data, number_of_houses, self.expansion_seed)
+
             #create a list containing all the household data and parameters
             list_of_houses = []
-            for nmb in range(number_of_houses):
+            for nmb in (range(number_of_houses) if houses is None else houses):
+                if nmb < len(distribution):
+                    house_data = {'baseload': baseloads[distribution[nmb]], 'pv_data': pv_data[distribution[nmb]],
+                                  'ev_data': ev_data[distribution[nmb]], 'hp_parameter_index': nmb}
+                else:
+                    house_data = self.expansion.house_data(nmb)
                 list_of_houses.append(House(sim_length=sim_length,
                                             id=nmb, 
-                                            baseload=baseloads[distribution[nmb]], 
-                                            pv_data=pv_data[distribution[nmb]], 
-                                            ev_data=ev_data[distribution[nmb]], 
+                                            baseload=house_data['baseload'], 
+                                            pv_data=house_data['pv_data'], 
+                                            ev_data=house_data['ev_data'], 
                                             hp_data=hp_data, 
                                             temperature_data=temperature_data,
                                             house_strategy=self.house_strategy,
                                             pv_strategy=self.pv_strategy,
                                             ev_strategy=self.ev_strategy,
                                             batt_strategy=self.batt_strategy,
-                                            hp_strategy=self.hp_strategy))
+                                            hp_strategy=self.hp_strategy,
+                                            consumption_dtype=self.consumption_dtype,
+                                            consumption_clock=self.consumption_clock,
+                                            hp_parameter_index=house_data['hp_parameter_index']))
 
             self.list_of_houses : List[House] = list_of_houses
-            self.ren_share = ren_share
-            self.temperature_data = temperature_data
             self.hps = [house.hp for house in self.list_of_houses]
             self.evs = [house.ev for house in self.list_of_houses]
             self.pvs = [house.pv for house in self.list_of_houses]
             self.batteries = [house.batt for house in self.list_of_houses]
+            self.ren_share = ren_share
+            self.temperature_data = temperature_data
+            self.exogenous = ExogenousTable(self.list_of_houses, sim_length, temperature_data)
+            self.exogenous.attach(self.list_of_houses)
+            if self.use_fleet:
+                self.fleet = Fleet(self.list_of_houses, sim_length, temperature_data, hp_data, self.exogenous,
+                                   self.expansion)
+            self.validator = Validator(self.validation, self.list_of_houses, self.fleet, self.validation_sample_rate)
+            if self.block_strategy is not None:
+                self.block_scheduler = BlockScheduler(self.block_strategy, self.fleet, self.validator, temperature_data,
+                                                      ren_share, sim_length)
+            if self.streaming_metrics:
+                self.metrics = StreamingMetrics(ren_share, len(self.list_of_houses))
+            if self.results_path is not None:
+                self.results = ResultWriter(self.results_path, [house.id for house in self.list_of_houses], sim_length,
+                                            dtype=self.consumption_dtype)
             self.ev_data = ev_data
             self.base_loads = [house.base_data for house in self.list_of_houses]
+            self._compile()
         else:
             print(f"Path to pickle data is invalid {path_to_pkl_data}")
 
@@ -100,56 +260,249 @@ class Simulator:
         else:
             print(f"Path to reference data is invalid {path_to_reference_data}")
 
+    def compile_dispatch_plan(self) -> List[DispatchGroup]:
+        """
+        Compiles control_order into the groups of calls that control_strategy makes every time step. Strategies declared
+        to do nothing (see is_noop_strategy) are left out, and so are the assets scheduled by the block strategy. The
+        individual tier calls the strategies of all pvs, then of all evs, and so on, instead of house by house, which
+        gives the same result because an individual strategy only gets its own asset.
+        """
+        noop = {}
+        def calls(entities) -> List[Callable]:
+            for entity in entities:
+                if entity.strategy not in noop:
+                    noop[entity.strategy] = is_noop_strategy(entity.strategy)
+            return [entity.simulate_individual_entity for entity in entities if not noop[entity.strategy]]
+
+        scheduled = self.block_scheduler.assets if self.block_scheduler is not None else []
+        plan = []
+        for stage, control_strategy_order in enumerate(self.control_order):
+            if control_strategy_order == StrategyOrder.HOUSEHOLD:
+                plan.append(DispatchGroup(stage, control_strategy_order, '', calls(self.list_of_houses)))
+            if control_strategy_order == StrategyOrder.INDIVIDUAL:
+                for asset in INDIVIDUAL_ASSETS:
+                    if asset not in scheduled:
+                        plan.append(DispatchGroup(stage, control_strategy_order, asset,
+                                                  calls([getattr(house, asset) for house in self.list_of_houses])))
+            if control_strategy_order == StrategyOrder.NEIGHBORHOOD and not is_noop_strategy(self.neighborhood_strategy):
+                plan.append(DispatchGroup(stage, control_strategy_order, '', [self._neighborhood_call]))
+        return [group for group in plan if len(group.calls) > 0]
+
+    def plan_key(self) -> tuple:
+        """
+        The control order and the strategies of the simulator, which the dispatch plan depends on together with the
+        strategies of the houses and assets (see entity_strategies_changed)
+        """
+        return (tuple(self.control_order), self.neighborhood_strategy) + \
+            tuple(getattr(self, name) for name in ENTITY_STRATEGIES.values())
+
+    def entity_strategies_changed(self) -> bool:
+        """
+        True when the strategy of one of the houses or assets of this simulator is not the one it had when the dispatch
+        plan was compiled
+        """
+        return any(map(operator.is_not, map(STRATEGY, self._strategy_entities), self._entity_strategies))
+
+    def update_dispatch_plan(self):
+        """
+        Compiles the dispatch plan again when a strategy has changed since it was compiled, so a strategy that is
+        replaced after initialize is called, or skipped when it does nothing, like one passed to the constructor. A
+        replaced strategy of the simulator, such as simulator.ev_strategy, is first set on all houses or assets.
+        """
+        if self.plan_key() == self._dispatch_plan_key and not self.entity_strategies_changed():
+            return
+        if is_fleet_strategy(self.neighborhood_strategy) and self.fleet is None:
+            raise ValueError("A fleet strategy needs a Simulator in fleet mode, create it with use_fleet=True")
+        for entity, name in ENTITY_STRATEGIES.items():
+            strategy = getattr(self, name)
+            if strategy is self._dispatch_plan_strategies.get(name, strategy):
+                continue
+            if self.block_scheduler is not None and entity in self.block_scheduler.assets and not is_noop_strategy(strategy):
+                raise ValueError(f"The {entity} strategy is not called for assets scheduled by the block strategy, "
+                                 f"pass a strategy decorated with @noop_strategy")
+            for house in self.list_of_houses:
+                (house if entity == 'house' else getattr(house, entity)).strategy = strategy
+        self._compile()
+
+    def _compile(self):
+        self.dispatch_plan = self.compile_dispatch_plan()
+        self._dispatch_plan_key = self.plan_key()
+        self._dispatch_plan_strategies = {name: getattr(self, name) for name in ENTITY_STRATEGIES.values()}
+        self._strategy_entities = [entity for house in self.list_of_houses
+                                   for entity in [house] + [getattr(house, asset) for asset in INDIVIDUAL_ASSETS]]
+        self._entity_strategies = [entity.strategy for entity in self._strategy_entities]
+
+    def _run_groups(self, time_step : int, groups : List[DispatchGroup]):
+        temperature_data = self.temperature_data
+        ren_share = self.ren_share
+        measure = self.measure
+        for stage, stage_groups in groupby(groups, key=lambda group: group.stage):
+            stage_groups = list(stage_groups)
+            with measure(('control_strategy', stage_groups[0].tier.name.lower(), ''), time_step):
+                for group in stage_groups:
+                    # the time of a household or neighborhood group is the time of its stage
+                    with (measure if group.asset != '' else no_measurement)(group.key, time_step, len(group.calls)):
+                        for call in group.calls:
+                            call(time_step, temperature_data, ren_share)
+
     def individual_strategy(self, time_step : int):
-        for house in self.list_of_houses:
-            house.pv.simulate_individual_entity(time_step, self.temperature_data, self.ren_share)
-            house.ev.simulate_individual_entity(time_step, self.temperature_data, self.ren_share)
-            house.hp.simulate_individual_entity(time_step, self.temperature_data, self.ren_share)
-            house.batt.simulate_individual_entity(time_step, self.temperature_data, self.ren_share)
+        self.update_dispatch_plan()
+        self._run_groups(time_step, [group for group in self.dispatch_plan if group.tier == StrategyOrder.INDIVIDUAL])
 
     def household_strategy(self, time_step : int):
-        for house in self.list_of_houses:
-            house.simulate_individual_entity(time_step, self.temperature_data, self.ren_share)
+        self.update_dispatch_plan()
+        self._run_groups(time_step, [group for group in self.dispatch_plan if group.tier == StrategyOrder.HOUSEHOLD])
+
+    def _neighborhood_call(self, time_step : int, temperature_data : np.ndarray, renewable_share : np.ndarray):
+        self.group_strategy(time_step)
 
     def group_strategy(self, time_step : int):
+        if is_fleet_strategy(self.neighborhood_strategy):
+            fleet = self.fleet.step_view(time_step)
+            aggregates = strategy_aggregates(self.neighborhood_strategy)
+            if aggregates is None:
+                self.neighborhood_strategy(time_step, self.temperature_data, self.ren_share, fleet)
+            else:
+                partial_aggregates = {name: np.asarray(aggregate(fleet)) for name, aggregate in aggregates.items()}
+                self.neighborhood_strategy(time_step, self.temperature_data, self.ren_share, fleet,
+                                           self.reduce_aggregates(partial_aggregates))
+            return
+
         self.neighborhood_strategy(time_step, self.temperature_data, self.ren_share, self.base_loads, self.pvs, self.evs, self.hps, self.batteries)
 
+    def reduce_aggregates(self, partial_aggregates : Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """
+        Sums the aggregates of a fleet strategy over all houses. Here all houses are in this simulator, a
+        ShardedSimulator worker adds the aggregates of the other workers.
+        """
+        return partial_aggregates
+
     def control_strategy(self, time_step : int):
+        self.update_dispatch_plan()
         try:  # catch errors caused by operations, probably caused by wrong strategy order
-            for control_strategy_order in self.control_order:
-                if control_strategy_order == StrategyOrder.HOUSEHOLD:
-                    self.household_strategy(time_step)
-                if control_strategy_order == StrategyOrder.INDIVIDUAL:
-                    self.individual_strategy(time_step)
-                if control_strategy_order == StrategyOrder.NEIGHBORHOOD:
-                    self.group_strategy(time_step)
+            self._run_groups(time_step, self.dispatch_plan)
         except TypeError as e:
-            message = f"Type error encountered: {e}. If this error is caused by applying an operation on None, " \
-                      f"this likely means that you did not apply the correct strategy order, and you tried to use " \
-                      f"consumption values not defined earlier."
-            raise TypeError(message)
-
+            raise self._strategy_order_error(e)
 
+    def _strategy_order_error(self, e : TypeError) -> TypeError:
+        message = f"Type error encountered: {e}. If this error is caused by reading a consumption value that has not " \
+                  f"been set, this likely means that you did not apply the correct strategy order, and you tried to " \
+                  f"use consumption values not defined earlier."
+        return TypeError(message)
 
     def response(self, time_step : int) -> float:
+        try:  # an unset consumption value here also means that the strategy order is wrong
+            with self.measure(('response', '', ''), time_step):
+                if self.fleet is not None:
+                    total_load = self.fleet.response(time_step, self.measure)
+                    if self.block_scheduler is not None:
+                        self.block_scheduler.after_response(time_step)
+                else:
+                    total_load = self.response_houses(time_step)
+            with self.measure(('validation', '', ''), time_step):
+                self.validator.validate(time_step, time_step == self.sim_length - 1)
+        except UnsetConsumptionError as e:
+            raise self._strategy_order_error(e)
+        return total_load
+
+    def response_houses(self, time_step : int) -> float:
+        # asset type by asset type, as in set_min_max_ders
+        for name, assets in [('ev', self.evs), ('hp', self.hps), ('batt', self.batteries)]:
+            with self.measure(('response', '', name), time_step, len(assets)):
+                for asset in assets:
+                    asset.response(time_step)
         total_load = 0
         for house in self.list_of_houses:
-            house.ev.response(time_step)
-            house.hp.response(time_step)
-            house.batt.response(time_step)
             house_load = (house.base_data[time_step] + house.pv.consumption[time_step] + house.ev.consumption[time_step] + house.batt.consumption[time_step] + house.hp.consumption[time_step])
             total_load += house_load
         return total_load
 
+    def state_of_charge(self) -> Dict[str, np.ndarray]:
+        """
+        Energy / size of every battery and EV
+        """
+        if self.fleet is not None:
+            return {'batt': self.fleet.batt.energy / self.fleet.batt.size, 'ev': self.fleet.ev.energy / self.fleet.ev.size}
+        return {'batt': np.array([house.batt.energy / house.batt.size for house in self.list_of_houses]),
+                'ev': np.array([house.ev.energy / house.ev.size for house in self.list_of_houses])}
+
     def do_time_step(self, time_step : int):
-        self.set_min_max_ders(time_step)
-        self.control_strategy(time_step)
+        measure = self.measure
+        if self.consumption_clock is not None:
+            self.consumption_clock.advance(time_step)
+        if self.block_scheduler is not None:
+            with measure(('block_strategy', '', ''), time_step):
+                self.block_scheduler.before_step(time_step)
+        with measure(('set_min_max_ders', '', ''), time_step):
+            self.set_min_max_ders(time_step)
+        with measure(('control_strategy', '', ''), time_step):
+            self.control_strategy(time_step)
         self.total_load[time_step] = self.response(time_step)
+        if self.metrics is not None:
+            self.metrics.update(time_step, self.total_load[time_step], self.state_of_charge())
+        if self.results is not None:
+            self.results.record(self, time_step)
+
+    def get_state(self) -> Dict[str, np.ndarray]:
+        """
+        Copy of all state that changes during the simulation, including the streaming metrics and the random state of
+        the validator
+        """
+        state = Checkpoint.get_state(self.list_of_houses, self.fleet, self.total_load)
+        if self.metrics is not None:
+            state.update(self.metrics.get_state())
+        if self.validator is not None:
+            state.update(self.validator.get_state())
+        return state
+
+    def set_state(self, state : Dict[str, np.ndarray]):
+        Checkpoint.set_state(self.list_of_houses, self.fleet, self.total_load, state)
+        if self.metrics is not None:
+            self.metrics.set_state(state)
+        if self.validator is not None:
+            self.validator.set_state(state)
+        if self.block_scheduler is not None:
+            self.block_scheduler.reset()
 
-    def start_simulation(self):
-        for time_step in range(0, self.sim_length):
+    def save_checkpoint(self, path : str, time_step : int):
+        """
+        Saves the state of the simulator, time_step is the first time step that has not been simulated yet
+        """
+        Checkpoint.save_checkpoint(path, self.get_state(), time_step)
+
+    def load_checkpoint(self, path : str) -> int:
+        """
+        Restores a checkpoint into an initialized simulator, start_simulation then continues from its time step. The
+        strategies do not need to be the ones that created the checkpoint, so several variants can be forked from one
+        shared warm-up.
+        """
+        state, time_step = Checkpoint.load_checkpoint(path)
+        self.set_state(state)
+        self.start_time_step = time_step
+        return time_step
+
+    def start_simulation(self, print_progress : bool = True, checkpoint_interval_days : Optional[int] = None,
+                         checkpoint_dir : str = "checkpoints"):
+        """
+        Simulates from start_time_step to the end. With checkpoint_interval_days, a checkpoint is written to
+        checkpoint_dir every that many days, named after the number of days simulated.
+        """
+        if checkpoint_interval_days is not None:
+            os.makedirs(checkpoint_dir, exist_ok=True)
+            checkpoint_interval = checkpoint_interval_days * constants.AMOUNT_OF_TIME_STEPS_IN_DAY
+
+        if self.results is not None:
+            self.results.begin(self.start_time_step)
+        for time_step in range(self.start_time_step, self.sim_length):
             self.do_time_step(time_step)
 
+            if checkpoint_interval_days is not None and (time_step + 1) % checkpoint_interval == 0:
+                day = (time_step + 1) // constants.AMOUNT_OF_TIME_STEPS_IN_DAY
+                self.save_checkpoint(os.path.join(checkpoint_dir, f"day_{day:03d}.npz"), time_step + 1)
+
             # print progress
-            if time_step % int(self.sim_length // 100) == 0:
+            if print_progress and time_step % max(1, int(self.sim_length // 100)) == 0:
                 print(f"Progress: {time_step / self.sim_length:.1%}")
+
+        if self.results is not None:
+            self.results.flush()
@@ -0,0 +1,105 @@
+from typing import Dict
+import numpy as np
+
+import constants
+
+# Running sums of a StreamingMetrics that are single numbers
+SCALARS = ['number_of_steps', 'energy_import', 'energy_export', 'renewable_import', 'peak_load', 'minimum_load',
+           'load_sum']
+
+class StreamingMetrics:
+    """
+    Metrics of a simulation that are updated every time step, so no history is needed to calculate them
+
+    Keeps running sums for the metrics of Vizualizer.print_metrics_renewable_share_total_load (in the same order, so
+    they give the same numbers), the peak load, the average daily profile, and SoC statistics per battery and EV.
+    The memory does not grow with the length of the simulation.
+    """
+    def __init__(self, renewable_share : np.ndarray, number_of_houses : int):
+        self.renewable_share = renewable_share
+        self.number_of_steps = 0
+        self.energy_import = 0.0
+        self.energy_export = 0.0
+        self.renewable_import = 0.0  # sum of load * renewable share, in kW
+        self.peak_load = -np.inf
+        self.minimum_load = np.inf
+        self.load_sum = 0.0
+        self.daily_profile_sum = np.zeros(constants.AMOUNT_OF_TIME_STEPS_IN_DAY)
+        self.daily_profile_count = np.zeros(constants.AMOUNT_OF_TIME_STEPS_IN_DAY, dtype=int)
+        self.soc = {asset: {'sum': np.zeros(number_of_houses), 'min': np.full(number_of_houses, np.inf),
+                            'max': np.full(number_of_houses, -np.inf)} for asset in ['batt', 'ev']}
+
+    def update(self, time_step : int, total_load : float, soc : Dict[str, np.ndarray]):
+        """
+        Adds one time step, soc holds the state of charge (energy / size) of every battery and EV after the step
+        """
+        time_step_seconds = constants.TIME_STEP_SECONDS
+        self.number_of_steps += 1
+        if total_load > 0:
+            self.energy_import += total_load * time_step_seconds / 3600
+            self.renewable_import += total_load * self.renewable_share[time_step]
+        elif total_load < 0:
+            self.energy_export += total_load * time_step_seconds / 3600
+        self.peak_load = max(self.peak_load, total_load)
+        self.minimum_load = min(self.minimum_load, total_load)
+        self.load_sum += total_load
+
+        step_of_day = time_step % constants.AMOUNT_OF_TIME_STEPS_IN_DAY
+        self.daily_profile_sum[step_of_day] += total_load
+        self.daily_profile_count[step_of_day] += 1
+
+        for asset, values in soc.items():
+            statistics = self.soc[asset]
+            statistics['sum'] += values
+            np.minimum(statistics['min'], values, out=statistics['min'])
+            np.maximum(statistics['max'], values, out=statistics['max'])
+
+    def get_state(self) -> Dict[str, np.ndarray]:
+        """
+        Copy of the running sums, named metrics.<name>, to save in a checkpoint with the state of the simulator
+        """
+        state = {f'metrics.{name}': np.array(getattr(self, name)) for name in SCALARS + ['daily_profile_sum',
+                                                                                      'daily_profile_count']}
+        for asset, statistics in self.soc.items():
+            state.update({f'metrics.{asset}_soc_{name}': values.copy() for name, values in statistics.items()})
+        return state
+
+    def set_state(self, state : Dict[str, np.ndarray]):
+        if 'metrics.number_of_steps' not in state:
+            raise ValueError("The state has no streaming metrics, it was saved by a simulator without streaming_metrics")
+        for name in SCALARS:
+            setattr(self, name, state[f'metrics.{name}'].item())
+        self.daily_profile_sum[:] = state['metrics.daily_profile_sum']
+        self.daily_profile_count[:] = state['metrics.daily_profile_count']
+        for asset, statistics in self.soc.items():
+            for name, values in statistics.items():
+                values[:] = state[f'metrics.{asset}_soc_{name}']
+
+    def results(self) -> Dict:
+        renewable_import = self.renewable_import * constants.TIME_STEP_SECONDS / 3600
+        average_load = self.load_sum / max(1, self.number_of_steps)
+        results = {'energy_export': abs(self.energy_export),
+                   'energy_import': self.energy_import,
+                   'renewable_percentage': renewable_import / self.energy_import * 100 if self.energy_import > 0 else np.nan,
+                   'peak_load': self.peak_load,
+                   'minimum_load': self.minimum_load,
+                   'average_load': average_load,
+                   'peak_to_average_ratio': self.peak_load / average_load if average_load != 0 else np.nan,
+                   'daily_profile': self.daily_profile_sum / np.maximum(1, self.daily_profile_count)}
+        for asset, statistics in self.soc.items():
+            results[f'{asset}_soc_mean'] = statistics['sum'] / max(1, self.number_of_steps)
+            results[f'{asset}_soc_min'] = statistics['min']
+            results[f'{asset}_soc_max'] = statistics['max']
+        return results
+
+    def print_results(self):
+        results = self.results()
+        print("METRICS:")
+        print("---------------------------------------")
+        print(f"Energy Exported: {results['energy_export']} kWh")
+        print(f"Energy Imported: {results['energy_import']} kWh")
+        print(f"Share Renewable Energy Imported: {results['renewable_percentage']} %")
+        print(f"Peak Load: {results['peak_load']} kW")
+        print(f"Peak to Average Ratio: {results['peak_to_average_ratio']}")
+        print(f"Mean Battery SoC: {np.mean(results['batt_soc_mean']):.1%}")
+        print(f"Mean EV SoC: {np.mean(results['ev_soc_mean']):.1%}")
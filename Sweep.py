@@ -0,0 +1,190 @@
+from typing import Dict, List, Optional
+import csv
+import functools
+import hashlib
+import inspect
+import itertools
+import json
+import multiprocessing
+import os.path
+import numpy as np
+
+from Simulator import Simulator
+from Validation import ValidationLevel
+from ScenarioStore import INDEX_FILE, is_scenario_store, cached_store, source_stamp
+from Vizualizer import Vizualizer, render_many
+from Analytics import grid_metrics
+
+# Arguments of the Simulator that can be varied in a sweep
+SWEEP_KEYS = ['control_order', 'battery_strategy', 'hp_strategy', 'pv_strategy', 'ev_strategy', 'neighborhood_strategy',
+              'house_strategy']
+# How much of the constraints a validation level checks: a cached point is only used for a sweep with the same or a
+# weaker level
+VALIDATION_STRENGTH = {ValidationLevel.OFF: 0, ValidationLevel.SAMPLED: 1, ValidationLevel.FULL: 2,
+                       ValidationLevel.END_OF_DAY: 2}
+
+def with_parameters(strategy, **parameters):
+    """
+    Binds keyword parameters to a strategy, for example with_parameters(hp_strategy, tank_T_set=318.0) for a strategy
+    defined as hp_strategy(time_step, temperature_data, renewable_share, hp, tank_T_set=313.0)
+    """
+    return functools.partial(strategy, **parameters)
+
+def describe(value) -> str:
+    """
+    Readable and stable description of a sweep value, used in the result table and for the config hash
+    """
+    if isinstance(value, functools.partial):
+        arguments = [describe(argument) for argument in value.args]
+        arguments += [f"{key}={describe(argument)}" for key, argument in sorted(value.keywords.items())]
+        return f"{describe(value.func)}({', '.join(arguments)})"
+    if callable(value) and hasattr(value, '__qualname__'):
+        return f"{value.__module__}.{value.__qualname__}"
+    if isinstance(value, (list, tuple)):
+        return "[" + ", ".join(describe(item) for item in value) + "]"
+    return repr(value)
+
+def _source(value) -> str:
+    if isinstance(value, functools.partial):
+        return _source(value.func)
+    try:
+        return inspect.getsource(value)
+    except (TypeError, OSError):
+        return ""
+
+def config_hash(config : Dict, settings : Dict) -> str:
+    """
+    Hash of a sweep point. Includes the source code of the strategies, so a changed strategy is simulated again.
+    """
+    key = {name: [describe(value), _source(value)] for name, value in sorted(config.items())}
+    key['settings'] = settings
+    return hashlib.sha256(json.dumps(key, sort_keys=True, default=repr).encode()).hexdigest()[:16]
+
+def expand_grid(base : Dict, grid : Dict[str, List]) -> List[Dict]:
+    """
+    All combinations of the values in grid, on top of the base configuration
+    """
+    for name in list(base.keys()) + list(grid.keys()):
+        if name not in SWEEP_KEYS:
+            raise ValueError(f"Unknown sweep key {name}, valid keys are {SWEEP_KEYS}")
+
+    names = list(grid.keys())
+    configs = []
+    for values in itertools.product(*[grid[name] for name in names]):
+        config = dict(base)
+        config.update(zip(names, values))
+        configs.append(config)
+    return configs
+
+def _run_point(arguments):
+    config, settings = arguments
+    simulator = Simulator(use_fleet=settings['use_fleet'], validation=settings['validation'], **config)
+    simulator.initialize(settings['sim_length'], settings['number_of_houses'], settings['path_to_data'],
+                         settings['path_to_reference_data'])
+    simulator.start_simulation(print_progress=False)
+    metrics = Vizualizer(settings['sim_length']).calculate_metrics_renewable_share_total_load(simulator.ren_share,
+                                                                                              simulator.total_load)
+    return {name: float(value) for name, value in metrics.items()}, simulator.total_load
+
+def _is_cached(cache_dir : str, point_hash : str, validation : ValidationLevel) -> bool:
+    path = os.path.join(cache_dir, point_hash + ".json")
+    if not os.path.isfile(path):
+        return False
+    with open(path, 'r') as f:
+        cached_validation = ValidationLevel[json.load(f).get('validation', 'OFF')]
+    return VALIDATION_STRENGTH[cached_validation] >= VALIDATION_STRENGTH[validation]
+
+def run_sweep(base : Dict, grid : Dict[str, List], sim_length : int, number_of_houses : int, path_to_data : str,
+              path_to_reference_data : str, processes : Optional[int] = None, cache_dir : str = "sweep_cache",
+              use_fleet : bool = True, validation : ValidationLevel = ValidationLevel.FULL) -> List[Dict]:
+    """
+    Runs a Simulator for every combination of the values in grid, in a pool of worker processes
+
+    - base: Simulator arguments that are the same for all points, for example {'control_order': [...], 'pv_strategy': ...}
+    - grid: Simulator arguments to vary, as lists of values. Use with_parameters to sweep strategy parameters.
+
+    The scenario data is converted to a memory-mapped scenario store once, which all workers share through the OS
+    cache. The metrics and total load of every point are cached in cache_dir under the hash of the point, so running
+    the sweep again only simulates the new points. The hash includes the size and modification time of the data, and
+    the store is converted again when the data changes. Returns one row with the configuration and metrics per point.
+    validation=ValidationLevel.OFF skips the constraint checks, for strategies that have already been validated. A
+    cached point is simulated again when it was validated with a weaker level than validation.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    if is_scenario_store(path_to_data):
+        data_stamp = source_stamp(os.path.join(path_to_data, INDEX_FILE))
+    else:
+        path_to_store = os.path.join(cache_dir, "store")
+        data_stamp = cached_store(path_to_data, path_to_store)
+        path_to_data = path_to_store
+
+    settings = {'sim_length': sim_length, 'number_of_houses': number_of_houses, 'path_to_data': path_to_data,
+                'path_to_reference_data': path_to_reference_data, 'use_fleet': use_fleet, 'validation': validation}
+    hash_settings = {key: value for key, value in settings.items() if key not in ['use_fleet', 'validation']}
+    hash_settings['data'] = data_stamp
+    configs = expand_grid(base, grid)
+    hashes = [config_hash(config, hash_settings) for config in configs]
+
+    todo = [index for index, point_hash in enumerate(hashes) if not _is_cached(cache_dir, point_hash, validation)]
+    if len(todo) > 0:
+        print(f"Simulating {len(todo)} of {len(configs)} sweep points")
+        with multiprocessing.Pool(processes) as pool:
+            results = pool.imap(_run_point, [(configs[index], settings) for index in todo])
+            for index, (metrics, total_load) in zip(todo, results):
+                np.save(os.path.join(cache_dir, hashes[index] + ".npy"), total_load)
+                with open(os.path.join(cache_dir, hashes[index] + ".json"), 'w') as f:
+                    json.dump({'config': {name: describe(value) for name, value in configs[index].items()},
+                               'settings': hash_settings, 'validation': validation.name, 'metrics': metrics}, f, indent=2)
+
+    rows = []
+    for config, point_hash in zip(configs, hashes):
+        with open(os.path.join(cache_dir, point_hash + ".json"), 'r') as f:
+            cached = json.load(f)
+        row = {'hash': point_hash}
+        row.update({name: describe(config[name]) for name in grid.keys()})
+        row.update(cached['metrics'])
+        rows.append(row)
+    return rows
+
+def load_total_load(cache_dir : str, point_hash : str) -> np.ndarray:
+    return np.load(os.path.join(cache_dir, point_hash + ".npy"))
+
+def evaluate_sweep(rows : List[Dict], cache_dir : str, renewable_share : np.ndarray,
+                   reference_load : Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+    """
+    Analytics.grid_metrics of all sweep points at once, on their stacked total loads. Every metric has one value (or row)
+    per point, in the order of rows.
+    """
+    total_loads = np.stack([load_total_load(cache_dir, row['hash']) for row in rows])
+    return grid_metrics(total_loads, renewable_share, reference_load)
+
+def render_sweep(rows : List[Dict], cache_dir : str, path_to_reference_data : str, output_dir : str,
+                 processes : Optional[int] = None, method : str = 'minmax') -> List[str]:
+    """
+    Renders the plots of every sweep point into output_dir/<hash>.png in a pool of worker processes, without a display
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    reference_load = np.load(path_to_reference_data)
+    jobs = [{'path': os.path.join(output_dir, row['hash'] + ".png"), 'reference_load': reference_load,
+             'total_load': load_total_load(cache_dir, row['hash']), 'method': method,
+             'title': ", ".join(f"{name}={value}" for name, value in row.items() if name != 'hash' and not isinstance(value, float))}
+            for row in rows]
+    return render_many(jobs, processes)
+
+def print_sweep_table(rows : List[Dict]):
+    if len(rows) == 0:
+        return
+    columns = list(rows[0].keys())
+    cells = [[str(row[column]) if not isinstance(row[column], float) else f"{row[column]:.2f}" for column in columns]
+             for row in rows]
+    widths = [max(len(column), *[len(cell[index]) for cell in cells]) for index, column in enumerate(columns)]
+    print(" | ".join(column.ljust(width) for column, width in zip(columns, widths)))
+    print("-+-".join("-" * width for width in widths))
+    for cell in cells:
+        print(" | ".join(value.ljust(width) for value, width in zip(cell, widths)))
+
+def write_sweep_csv(rows : List[Dict], path : str):
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+        writer.writeheader()
+        writer.writerows(rows)
@@ -0,0 +1,241 @@
+from typing import Dict, Tuple
+import json
+import os.path
+import pickle
+import sys
+import numpy as np
+
+import constants
+from ScenarioStore import INDEX_FILE, HP_HOUSE_KEYS, HP_TIME_KEYS
+
+TIME_STEP_SECONDS = constants.TIME_STEP_SECONDS
+
+# Houses that are generated at once when writing a scenario store, which bounds the memory use
+HOUSE_CHUNK_SIZE = 50
+
+# EV parameters, the same for every house
+EV_PARAMETERS = {'charge_cap': 11.0, 'max_SoC': 60.0, 'min_charge': 0.0, 'start_SoC': 30.0}
+# Fraction of the heat to the house that goes to each node of the building model (air, house, floor)
+F_INTER = np.array([0.0, 0.6, 0.4])
+INITIAL_TEMPERATURES = np.array([293.0, 293.0, 293.0])
+
+def generate_weather(sim_length : int, seed : int = 0) -> Dict[str, np.ndarray]:
+    """
+    Ambient temperature (in K), normalized irradiance and renewable share of the whole neighborhood
+    """
+    rng = np.random.default_rng([seed])
+    time_steps = np.arange(sim_length)
+    hour = (time_steps % constants.AMOUNT_OF_TIME_STEPS_IN_DAY) * TIME_STEP_SECONDS / 3600
+    day = time_steps / constants.AMOUNT_OF_TIME_STEPS_IN_DAY
+
+    ambient_temp = (283.0 - 8 * np.cos(2 * np.pi * (day - 15) / 365) - 3 * np.cos(2 * np.pi * (hour - 15) / 24)
+                    + 0.02 * rng.normal(0, 1, sim_length).cumsum())
+    sun = np.clip(np.sin(np.pi * (hour - 6) / 12), 0, None) * (0.6 + 0.4 * np.sin(2 * np.pi * (day - 80) / 365))
+    ren_share = np.clip(0.3 + 0.3 * sun + rng.normal(0, 0.05, sim_length), 0, 1)
+    return {'hour': hour, 'ambient_temp': ambient_temp, 'sun': sun, 'ren_share': ren_share}
+
+def _expm_dt(conductance : np.ndarray, capacity : np.ndarray) -> np.ndarray:
+    """
+    State transition matrix over one time step of dT/dt = -C^-1 K T, for a stack of symmetric K
+    """
+    c_inv_sqrt = capacity ** -0.5
+    symmetric = -c_inv_sqrt[:, :, None] * conductance * c_inv_sqrt[:, None, :]
+    eigenvalues, eigenvectors = np.linalg.eigh(symmetric)
+    exponential = np.matmul(eigenvectors * np.exp(eigenvalues * TIME_STEP_SECONDS)[:, None, :],
+                            np.swapaxes(eigenvectors, 1, 2))
+    return c_inv_sqrt[:, :, None] * exponential * (capacity ** 0.5)[:, None, :]
+
+def generate_houses(houses : np.ndarray, number_of_days : int, weather : Dict[str, np.ndarray],
+                    seed : int = 0) -> Dict[str, np.ndarray]:
+    """
+    Data of the given houses, with one row per house. Every house has its own random generator, so the data of a house
+    does not depend on which other houses are generated.
+
+    The EV sessions are padded to number_of_days + 1 sessions, with their lengths in Trip_Energy_lengths.
+    """
+    sim_length = number_of_days * constants.AMOUNT_OF_TIME_STEPS_IN_DAY
+    hour, sun, ambient_temp = weather['hour'], weather['sun'], weather['ambient_temp']
+    number_of_houses = len(houses)
+    data = {'baseloaddata': np.zeros((number_of_houses, sim_length)),
+            'irrdata': np.zeros((number_of_houses, sim_length)),
+            'EV_status': np.zeros((number_of_houses, sim_length)),
+            'Trip_Energy': np.zeros((number_of_houses, number_of_days + 1)),
+            'T_arrival': np.zeros((number_of_houses, number_of_days + 1), dtype=int),
+            'T_leave': np.zeros((number_of_houses, number_of_days + 1), dtype=int),
+            'Trip_Energy_lengths': np.zeros(number_of_houses, dtype=int),
+            'T_arrival_lengths': np.zeros(number_of_houses, dtype=int),
+            'T_leave_lengths': np.zeros(number_of_houses, dtype=int)}
+    capacity = np.zeros((number_of_houses, 3))
+    conductance = np.zeros((number_of_houses, 3, 3))
+    gains = np.zeros((number_of_houses, sim_length, 3))
+
+    for row, house in enumerate(houses):
+        rng = np.random.default_rng([seed, 1, int(house)])
+        data['baseloaddata'][row] = (0.3 + 0.4 * np.exp(-((hour - 19) / 2) ** 2) + 0.2 * np.exp(-((hour - 8) / 1.5) ** 2)
+                                     + rng.gamma(2, 0.05, sim_length))
+        data['irrdata'][row] = -rng.uniform(2, 6) * sun * rng.uniform(0.7, 1.0, sim_length)
+
+        # EV sessions: at home from arrival to departure, away (-1) in between, some days the EV stays at home
+        session = 0
+        arrivals = [0]
+        departures = []
+        for day in range(number_of_days):
+            departure = day * constants.AMOUNT_OF_TIME_STEPS_IN_DAY + int(rng.integers(26, 38))
+            arrival = day * constants.AMOUNT_OF_TIME_STEPS_IN_DAY + int(rng.integers(66, 78))
+            if rng.random() < 0.2:
+                continue
+            data['EV_status'][row, arrivals[-1]:departure] = session
+            data['EV_status'][row, departure:arrival] = -1
+            departures.append(departure)
+            arrivals.append(arrival)
+            session += 1
+        data['EV_status'][row, arrivals[-1]:] = session
+        departures.append(sim_length)
+        data['T_arrival'][row, :len(arrivals)] = arrivals
+        data['T_leave'][row, :len(departures)] = departures
+        data['Trip_Energy'][row, :len(departures)] = rng.uniform(4, 15, len(departures))
+        data['T_arrival_lengths'][row] = len(arrivals)
+        data['T_leave_lengths'][row] = len(departures)
+        data['Trip_Energy_lengths'][row] = len(departures)
+
+        # Building model with three nodes (air, house, floor): heat capacities and conductances
+        capacity[row] = np.array([5e6, 1e6, 8e6]) * rng.uniform(0.8, 1.2)
+        g_ambient, g_air_house, g_house, g_house_floor = 150 * rng.uniform(0.8, 1.2), 500.0, 50 * rng.uniform(0.8, 1.2), 400.0
+        conductance[row] = [[g_ambient + g_air_house, -g_air_house, 0.0],
+                            [-g_air_house, g_air_house + g_house + g_house_floor, -g_house_floor],
+                            [0.0, -g_house_floor, g_house_floor]]
+        gains[row] = np.stack([g_ambient * ambient_temp + 300 * sun, g_house * ambient_temp + 200 * sun, 100 * sun], axis=1)
+
+    # Exact discretization of the building model, in the form used by the Heatpump class:
+    # T[t + 1] = S (T[t] - b) + alpha[t] * dt + b, with b = K^-1 q + b_part[t]
+    super_matrix = _expm_dt(conductance, capacity)
+    K_inv = np.linalg.inv(conductance)
+    identity = np.eye(3)
+    b_part = np.matmul(gains, np.swapaxes(K_inv, 1, 2))
+    alpha = np.zeros_like(b_part)
+    alpha[:, :-1] = 0.1 * np.diff(b_part, axis=1) / TIME_STEP_SECONDS
+    data['super_matrix'] = super_matrix
+    data['K_inv'] = K_inv
+    data['M'] = np.matmul(identity - super_matrix, K_inv)
+    data['b_part'] = b_part
+    data['alpha'] = alpha
+    data['v_part'] = np.matmul(b_part, np.swapaxes(identity - super_matrix, 1, 2)) + alpha * TIME_STEP_SECONDS
+    return data
+
+def generate_scenario(number_of_houses : int, number_of_days : int, seed : int = 0) -> Tuple[Dict, np.ndarray]:
+    """
+    Synthetic scenario with the schema of data.pkl, and its reference load (the sum of the baseloads and the
+    uncurtailed PV). Keeps all data in memory, use write_synthetic_store for large scenarios.
+    """
+    sim_length = number_of_days * constants.AMOUNT_OF_TIME_STEPS_IN_DAY
+    weather = generate_weather(sim_length, seed)
+    data = generate_houses(np.arange(number_of_houses), number_of_days, weather, seed)
+
+    ev_data = []
+    for house in range(number_of_houses):
+        ev = dict(EV_PARAMETERS)
+        ev['EV_status'] = data['EV_status'][house]
+        for key in ['Trip_Energy', 'T_arrival', 'T_leave']:
+            ev[key] = data[key][house, :data[key + '_lengths'][house]]
+        ev_data.append(ev)
+
+    hp_data = {key: data[key] for key in HP_HOUSE_KEYS}
+    hp_data['temperatures'] = INITIAL_TEMPERATURES.copy()
+    hp_data['f_inter'] = F_INTER
+    hp_data['ambient_temp'] = weather['ambient_temp'][:, None]
+
+    scenario_data = {'baseloaddata': data['baseloaddata'], 'irrdata': data['irrdata'], 'ev_data': ev_data,
+                     'hp_data': hp_data, 'ren_share': weather['ren_share']}
+    reference_load = data['baseloaddata'].sum(axis=0) + data['irrdata'].sum(axis=0)
+    return scenario_data, reference_load
+
+def write_synthetic_pickle(path_to_directory : str, number_of_houses : int, number_of_days : int, seed : int = 0):
+    """
+    Writes data.pkl and reference_load.npy of a synthetic scenario to path_to_directory
+    """
+    os.makedirs(path_to_directory, exist_ok=True)
+    scenario_data, reference_load = generate_scenario(number_of_houses, number_of_days, seed)
+    with open(os.path.join(path_to_directory, "data.pkl"), 'wb') as f:
+        pickle.dump(scenario_data, f)
+    np.save(os.path.join(path_to_directory, "reference_load.npy"), reference_load)
+
+def write_synthetic_store(path_to_store : str, number_of_houses : int, number_of_days : int, seed : int = 0):
+    """
+    Writes a synthetic scenario directly as a scenario store, HOUSE_CHUNK_SIZE houses at a time, so scenarios that do
+    not fit in memory can be generated. The reference load is written to reference_load.npy in the store. The data of
+    every house is the same as with generate_scenario.
+    """
+    os.makedirs(path_to_store, exist_ok=True)
+    sim_length = number_of_days * constants.AMOUNT_OF_TIME_STEPS_IN_DAY
+    weather = generate_weather(sim_length, seed)
+    index = {'arrays': {}, 'ev_keys': [], 'hp_keys': [], 'other_keys': [], 'number_of_houses': number_of_houses,
+             'length': sim_length}
+    arrays = {}
+
+    def create(name : str, shape : Tuple, dtype, house_axis, time_axis) -> np.ndarray:
+        array = np.lib.format.open_memmap(os.path.join(path_to_store, name + ".npy"), mode='w+', dtype=dtype, shape=shape)
+        index['arrays'][name] = {'house_axis': house_axis, 'time_axis': time_axis}
+        return array
+
+    def save(name : str, array : np.ndarray, house_axis, time_axis):
+        np.save(os.path.join(path_to_store, name + ".npy"), array)
+        index['arrays'][name] = {'house_axis': house_axis, 'time_axis': time_axis}
+
+    for name in ['baseloaddata', 'irrdata']:
+        arrays[name] = create(name, (number_of_houses, sim_length), np.float64, 0, 1)
+    save('ren_share', weather['ren_share'], None, 0)
+
+    for key, value in EV_PARAMETERS.items():
+        save('ev_' + key, np.full(number_of_houses, value), 0, None)
+        index['ev_keys'].append(key)
+    arrays['ev_EV_status'] = create('ev_EV_status', (number_of_houses, sim_length), np.float64, 0, 1)
+    index['ev_keys'].append('EV_status')
+    for key, dtype in [('Trip_Energy', np.float64), ('T_arrival', np.int64), ('T_leave', np.int64)]:
+        arrays['ev_' + key] = create('ev_' + key, (number_of_houses, number_of_days + 1), dtype, 0, None)
+        arrays['ev_' + key + '_lengths'] = create('ev_' + key + '_lengths', (number_of_houses,), np.int64, 0, None)
+        index['ev_keys'].append(key)
+
+    for key, time_axis in HP_HOUSE_KEYS.items():
+        shape = (number_of_houses, 3, 3) if time_axis is None else (number_of_houses, sim_length, 3)
+        arrays['hp_' + key] = create('hp_' + key, shape, np.float64, 0, time_axis)
+        index['hp_keys'].append(key)
+    save('hp_temperatures', INITIAL_TEMPERATURES, None, None)
+    save('hp_f_inter', F_INTER, None, None)
+    save('hp_ambient_temp', weather['ambient_temp'][:, None], None, HP_TIME_KEYS['ambient_temp'])
+    index['hp_keys'] += ['temperatures', 'f_inter', 'ambient_temp']
+
+    reference_load = np.zeros(sim_length)
+    for start in range(0, number_of_houses, HOUSE_CHUNK_SIZE):
+        houses = np.arange(start, min(start + HOUSE_CHUNK_SIZE, number_of_houses))
+        data = generate_houses(houses, number_of_days, weather, seed)
+        for name, array in arrays.items():
+            key = name[3:] if name.startswith(('ev_', 'hp_')) else name
+            array[houses] = data[key]
+        reference_load += data['baseloaddata'].sum(axis=0) + data['irrdata'].sum(axis=0)
+
+    for array in arrays.values():
+        array.flush()
+    np.save(os.path.join(path_to_store, "reference_load.npy"), reference_load)
+    with open(os.path.join(path_to_store, INDEX_FILE), 'w') as f:
+        json.dump(index, f, indent=2)
+
+def main():
+    """
+    Generates a synthetic scenario: python SyntheticScenario.py <number_of_houses> <number_of_days> <output> [--store]
+
+    Writes output/data.pkl and output/reference_load.npy, or with --store a scenario store directory.
+    """
+    arguments = [argument for argument in sys.argv[1:] if argument != '--store']
+    if len(arguments) != 3:
+        print("Usage: python SyntheticScenario.py <number_of_houses> <number_of_days> <output> [--store]")
+        return 1
+    number_of_houses, number_of_days, output = int(arguments[0]), int(arguments[1]), arguments[2]
+    if '--store' in sys.argv:
+        write_synthetic_store(output, number_of_houses, number_of_days)
+    else:
+        write_synthetic_pickle(output, number_of_houses, number_of_days)
+    print(f"Generated a scenario with {number_of_houses} houses and {number_of_days} days in {output}")
+    return 0
+
+if __name__ == '__main__':
+    exit(main())
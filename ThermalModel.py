@@ -0,0 +1,181 @@
+from typing import Dict, Optional, Tuple
+import copy
+import numpy as np
+
+import constants
+
+TIME_STEP_SECONDS = constants.TIME_STEP_SECONDS
+
+class BatchedThermalModel:
+    """
+    Building model of all heat pump houses at once
+
+    Stacks super_matrix, K_inv and M of every house into 3-D arrays and advances all temperature vectors with one
+    batched matmul per time step. The time dependent v_part, b_part and alpha are gathered per step from the scenario
+    data, so they are never copied per house. np.matmul on stacked matrices gives exactly the same numbers as the
+    per-house calculation in the Heatpump class.
+    """
+    def __init__(self, hp_data : Dict, parameter_index : np.ndarray):
+        self.parameter_index = np.asarray(parameter_index, dtype=int)
+        self.super_matrix = np.asarray(hp_data['super_matrix'])[self.parameter_index]
+        self.K_inv = np.asarray(hp_data['K_inv'])[self.parameter_index]
+        self.M = np.asarray(hp_data['M'])[self.parameter_index]
+        self.v_part = np.asarray(hp_data['v_part'])
+        self.b_part = np.asarray(hp_data['b_part'])
+        self.alpha = np.asarray(hp_data['alpha'])
+        self.f_inter = np.asarray(hp_data['f_inter'])
+        # Heat (in W) that raises the house temperature by one Kelvin in one time step
+        self.heat_to_house_temperature = self.M[:, 1, 1] * self.f_inter[1] + self.M[:, 1, 2] * self.f_inter[2]
+
+    def free_temperatures(self, time_step : int, temperatures : np.ndarray) -> np.ndarray:
+        """
+        Temperatures of all houses at the end of the time step if they are not heated, shape (houses, nodes)
+        """
+        return np.matmul(self.super_matrix, temperatures[:, :, None])[:, :, 0] + self.v_part[self.parameter_index, time_step]
+
+    def heat_demand_house(self, time_step : int, temperatures : np.ndarray, house_temperature : np.ndarray) -> np.ndarray:
+        """
+        Heat (in J) required to bring every house to house_temperature (in K)
+        """
+        return self.heat_demand_from_free_temperatures(self.free_temperatures(time_step, temperatures), house_temperature)
+
+    def heat_demand_from_free_temperatures(self, free_temperatures : np.ndarray, house_temperature : np.ndarray) -> np.ndarray:
+        """
+        Heat (in J) required to bring every house to house_temperature (in K), given the result of free_temperatures
+        """
+        return np.maximum(0, ((house_temperature - free_temperatures[:, 1]) / self.heat_to_house_temperature) * 900)
+
+    def update_temperatures(self, time_step : int, temperatures : np.ndarray, heat_power_to_house : np.ndarray):
+        """
+        Advances the temperatures of all houses one time step in place
+        """
+        q_inter = heat_power_to_house[:, None] * self.f_inter
+        b = np.matmul(self.K_inv, q_inter[:, :, None])[:, :, 0] + self.b_part[self.parameter_index, time_step]
+        temperatures[:] = (np.matmul(self.super_matrix, (temperatures - b)[:, :, None])[:, :, 0]
+                           + self.alpha[self.parameter_index, time_step] * 900 + b)
+
+    def select(self, houses : np.ndarray) -> 'BatchedThermalModel':
+        """
+        Model of a subset of the houses, houses are indices into this model (and can repeat)
+        """
+        model = copy.copy(self)
+        model.parameter_index = self.parameter_index[houses]
+        model.super_matrix = self.super_matrix[houses]
+        model.K_inv = self.K_inv[houses]
+        model.M = self.M[houses]
+        model.heat_to_house_temperature = self.heat_to_house_temperature[houses]
+        return model
+
+    def heated_trajectory(self, time_step : int, temperatures : np.ndarray, T_set : np.ndarray, steps : int,
+                          max_iterations : Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Temperatures after every step (steps, houses, nodes) and heat (in J) given to every house (steps, houses), if
+        every house is heated to T_set whenever it needs heat, as when its tank never runs below tank_T_min_limit.
+
+        Every step a house is either heated to T_set or not heated because it is warm enough. In both regimes the
+        building model is an affine map of the temperatures, so for a guess of the regimes the whole trajectory follows
+        from a parallel prefix scan of these maps, with log2(steps) batched matrix products. The regimes of the
+        trajectory are then checked, and the scan is repeated from the corrected guess until it is consistent. Every
+        repetition fixes at least the first wrong step, usually few are needed because the regimes rarely switch.
+        """
+        nodes = temperatures.shape[1]
+        v_part = np.moveaxis(self.v_part[self.parameter_index, time_step:time_step + steps], 1, 0)  # (steps, houses, nodes)
+        heat_to_node = np.matmul(self.M, self.f_inter)  # (houses, nodes), temperature increase per W
+        # Heated: the heat brings the house node exactly to T_set, T' = P (S T + v_part) + heat_to_node T_set / k
+        projection = np.eye(nodes) - heat_to_node[:, :, None] * (np.eye(nodes)[1] / self.heat_to_house_temperature[:, None])[:, None, :]
+        heated_matrix = np.matmul(projection, self.super_matrix)
+        heated_offset = (np.matmul(projection, v_part[:, :, :, None])[:, :, :, 0]
+                         + heat_to_node * (T_set / self.heat_to_house_temperature)[:, None])
+
+        heated = np.ones((steps, temperatures.shape[0]), dtype=bool)
+        iterations = steps + 1 if max_iterations is None else max_iterations
+        for _ in range(iterations):
+            matrices = np.where(heated[:, :, None, None], heated_matrix, self.super_matrix)
+            offsets = np.where(heated[:, :, None], heated_offset, v_part)
+            # Inclusive scan: after it, (matrices[t], offsets[t]) maps the temperatures before step 0 to those after t
+            shift = 1
+            while shift < steps:
+                offsets = np.concatenate([offsets[:shift], offsets[shift:]
+                                          + np.matmul(matrices[shift:], offsets[:-shift, :, :, None])[:, :, :, 0]])
+                matrices = np.concatenate([matrices[:shift], np.matmul(matrices[shift:], matrices[:-shift])])
+                shift *= 2
+            after = np.matmul(matrices, temperatures[:, :, None])[:, :, :, 0] + offsets
+            before = np.concatenate([temperatures[None], after[:-1]])
+
+            free_house_temperature = np.matmul(self.super_matrix, before[:, :, :, None])[:, :, 1, 0] + v_part[:, :, 1]
+            heat_demand = np.maximum(0, ((T_set - free_house_temperature) / self.heat_to_house_temperature) * 900)
+            wrong = (heat_demand > 0) != heated
+            if not wrong.any():
+                return after, heat_demand
+            # keep the steps before the first wrong one of every house, and guess the rest from this trajectory
+            first_wrong = np.where(wrong.any(axis=0), np.argmax(wrong, axis=0), steps)
+            heated = np.where(np.arange(steps)[:, None] >= first_wrong[None, :], heat_demand > 0, heated)
+        raise ValueError(f"The heat pump trajectory did not converge in {iterations} iterations")
+
+    def simulate_schedule(self, time_step : int, temperatures : np.ndarray, tank_T : np.ndarray, heat_to_tank : np.ndarray,
+                          T_set : np.ndarray, tank_heat_capacity : np.ndarray,
+                          tank_T_min_limit : np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Temperatures of all houses and tanks over the time steps from time_step on, if the tanks get heat_to_tank (in J),
+        following Heatpump.response without changing any state. heat_to_tank has shape (steps, houses), or
+        (steps, houses, candidates) to evaluate several candidate schedules per house at once.
+
+        The house temperatures only depend on the schedule when a tank would run below tank_T_min_limit, and the house
+        is not heated. So the trajectory of the houses without that clamp is calculated once per house with
+        heated_trajectory, and the tank temperatures of all candidates follow from cumulative sums. Only a candidate
+        whose tank gets clamped is stepped through exactly, from the first clamp on.
+
+        tank_heat_capacity is tank_mass * heat_capacity_water (in J/K). Returns the temperatures after every step, shape
+        (steps, houses, [candidates,] nodes), and the tank temperatures after every step and the heat (in J) given to
+        the houses, shape (steps, houses, [candidates]). The results agree with response up to rounding errors.
+        """
+        candidates = heat_to_tank.ndim == 3
+        if not candidates:
+            heat_to_tank = heat_to_tank[:, :, None]
+        steps, houses, number_of_candidates = heat_to_tank.shape
+        tank_heat_capacity = np.asarray(tank_heat_capacity, dtype=np.float64)[:, None]
+        tank_T_min_limit = np.asarray(tank_T_min_limit, dtype=np.float64)[:, None]
+        house_temperatures, heat_demand = self.heated_trajectory(time_step, temperatures, T_set, steps)
+
+        # The cumulative sum adds the steps one after the other, like response
+        tank = np.cumsum(np.concatenate([np.broadcast_to(np.asarray(tank_T, dtype=np.float64)[:, None],
+                                                         (1, houses, number_of_candidates)),
+                                         (heat_to_tank - heat_demand[:, :, None]) / tank_heat_capacity]), axis=0)
+        clamped = (heat_demand[:, :, None] > 0) & (tank[:-1] + (heat_to_tank - heat_demand[:, :, None]) / tank_heat_capacity
+                                                   < tank_T_min_limit)
+        tank = tank[1:]
+        temperatures_out = np.repeat(house_temperatures[:, :, None], number_of_candidates, axis=2)
+        heat_to_house = np.repeat(heat_demand[:, :, None], number_of_candidates, axis=2)
+
+        clamped_house, clamped_candidate = np.nonzero(clamped.any(axis=0))
+        if clamped_house.size > 0:
+            first = np.argmax(clamped[:, clamped_house, clamped_candidate], axis=0)
+            model = self.select(clamped_house)
+            state = np.where(first[:, None] > 0, temperatures_out[first - 1, clamped_house, clamped_candidate],
+                             temperatures[clamped_house])
+            state_tank = np.where(first > 0, tank[first - 1, clamped_house, clamped_candidate],
+                                  np.asarray(tank_T, dtype=np.float64)[clamped_house])
+            pair_T_set = np.asarray(T_set)[clamped_house]
+            pair_capacity = tank_heat_capacity[clamped_house, 0]
+            pair_limit = tank_T_min_limit[clamped_house, 0]
+            # Exact steps like HeatpumpFleet.response, for every pair from its first clamp on
+            for step in range(int(first.min()), steps):
+                stepping = first <= step
+                pair_heat_to_tank = heat_to_tank[step, clamped_house, clamped_candidate]
+                demand = model.heat_demand_from_free_temperatures(model.free_temperatures(time_step + step, state),
+                                                                  pair_T_set)
+                pair_heat_to_house = np.where(state_tank + (pair_heat_to_tank - demand) / pair_capacity < pair_limit,
+                                              0.0, demand)
+                new_tank = state_tank + (pair_heat_to_tank - pair_heat_to_house) / pair_capacity
+                new_state = state.copy()
+                model.update_temperatures(time_step + step, new_state, pair_heat_to_house / 900)
+                state = np.where(stepping[:, None], new_state, state)
+                state_tank = np.where(stepping, new_tank, state_tank)
+                rows = (clamped_house[stepping], clamped_candidate[stepping])
+                temperatures_out[step][rows] = state[stepping]
+                tank[step][rows] = state_tank[stepping]
+                heat_to_house[step][rows] = pair_heat_to_house[stepping]
+
+        if not candidates:
+            return temperatures_out[:, :, 0], tank[:, :, 0], heat_to_house[:, :, 0]
+        return temperatures_out, tank, heat_to_house
@@ -0,0 +1,194 @@
+from enum import Enum
+from typing import Dict, List, Optional, Tuple
+import json
+import numpy as np
+
+import constants
+from ModelClasses import House, ConstraintViolation
+from Fleet import Fleet
+
+class ValidationLevel(Enum):
+    OFF = 0         # no checks
+    SAMPLED = 1     # the checks of FULL, at a random sample of the time steps
+    FULL = 2        # check every asset every time step
+    END_OF_DAY = 3  # check every asset every time step, all at once at the end of every day
+
+# Asset attributes of a House, in the order in which they are checked
+ASSETS = ['pv', 'ev', 'batt', 'hp']
+# State after the response that END_OF_DAY records every time step: (name, asset, attribute, column)
+RECORDED_STATE = [('ev_energy', 'ev', 'energy', None), ('batt_energy', 'batt', 'energy', None),
+                  ('house_temperature', 'hp', 'temperatures', 1), ('tank_T', 'hp', 'tank_T', None)]
+
+class Validator:
+    """
+    Checks the constraints of all assets after the response of every time step, at the chosen ValidationLevel
+
+    The checks are the ones of the check_response methods of the assets, with the same rounding to 4 decimals. The
+    first violation is raised as a ConstraintViolation with the house id and time step, at END_OF_DAY the first in
+    time. The assets do not check themselves when a Validator is used.
+    """
+    def __init__(self, level : ValidationLevel, houses : List[House], fleet : Optional[Fleet] = None,
+                 sample_rate : float = 0.1, seed : int = 0):
+        self.level = level
+        self.houses = houses
+        self.fleet = fleet
+        self.sample_rate = sample_rate
+        self.rng = np.random.default_rng(seed)
+        self.house_ids = np.array([house.id for house in houses])
+        # Asset types that a block strategy schedules, checked for a whole block by check_block instead of every step
+        self.scheduled_assets : List[str] = []
+
+        for house in houses:
+            for asset in ASSETS:
+                getattr(house, asset).check_constraints = False
+        if fleet is not None:
+            for asset_fleet in fleet.asset_fleets:
+                asset_fleet.check_constraints = False
+
+        if level == ValidationLevel.END_OF_DAY:
+            self.first_time_step : Optional[int] = None  # first time step that has not been checked yet
+            self.state = {name: np.zeros((constants.AMOUNT_OF_TIME_STEPS_IN_DAY, len(houses)))
+                          for name, _, _, _ in RECORDED_STATE}
+
+    def get_state(self) -> Dict[str, np.ndarray]:
+        """
+        State of the random sample of SAMPLED and of the time steps that END_OF_DAY has not checked yet, to save in a
+        checkpoint with the state of the simulator. The bit generator state holds 128-bit integers, so it is stored as
+        JSON text.
+        """
+        state = {'validator.rng': np.array(json.dumps(self.rng.bit_generator.state))}
+        if self.level == ValidationLevel.END_OF_DAY:
+            state['validator.first_time_step'] = np.array(-1 if self.first_time_step is None else self.first_time_step)
+            state.update({f'validator.{name}': values.copy() for name, values in self.state.items()})
+        return state
+
+    def set_state(self, state : Dict[str, np.ndarray]):
+        if 'validator.rng' in state:
+            self.rng.bit_generator.state = json.loads(state['validator.rng'].item())
+        if self.level == ValidationLevel.END_OF_DAY and 'validator.first_time_step' in state:
+            first_time_step = int(state['validator.first_time_step'])
+            self.first_time_step = None if first_time_step == -1 else first_time_step
+            for name, values in self.state.items():
+                values[...] = state[f'validator.{name}']
+
+    def validate(self, time_step : int, last_time_step : bool = False):
+        """
+        Called after the response of every time step. last_time_step makes END_OF_DAY check a partial last day.
+        """
+        if self.level == ValidationLevel.FULL:
+            self.check_time_step(time_step)
+        elif self.level == ValidationLevel.SAMPLED:
+            if self.rng.random() < self.sample_rate:
+                self.check_time_step(time_step)
+        elif self.level == ValidationLevel.END_OF_DAY:
+            if self.first_time_step is None:
+                self.first_time_step = time_step
+            self.record(time_step)
+            if (time_step + 1) % constants.AMOUNT_OF_TIME_STEPS_IN_DAY == 0 or last_time_step:
+                self.check_steps(self.first_time_step, time_step + 1)
+                self.first_time_step = None
+
+    def check_time_step(self, time_step : int):
+        if self.fleet is not None:
+            for name, asset_fleet in self.fleet.asset_fleets_by_name.items():
+                if name not in self.scheduled_assets:
+                    asset_fleet.check_response(time_step)
+            return
+        for house in self.houses:
+            for asset in ASSETS:
+                getattr(house, asset).check_response(time_step)
+
+    def record(self, time_step : int):
+        row = time_step % constants.AMOUNT_OF_TIME_STEPS_IN_DAY
+        for name, asset, attribute, column in RECORDED_STATE:
+            if self.fleet is not None:
+                value = getattr(self.fleet.asset_fleets_by_name[asset], attribute)
+                self.state[name][row] = value if column is None else value[:, column]
+            elif column is None:
+                self.state[name][row] = [getattr(getattr(house, asset), attribute) for house in self.houses]
+            else:
+                self.state[name][row] = [getattr(getattr(house, asset), attribute)[column] for house in self.houses]
+
+    def _parameter(self, asset : str, name : str) -> np.ndarray:
+        if self.fleet is not None:
+            return getattr(self.fleet.asset_fleets_by_name[asset], name)
+        return np.array([getattr(getattr(house, asset), name) for house in self.houses], dtype=np.float64)
+
+    def _consumption(self, asset : str, start : int, stop : int) -> np.ndarray:
+        """
+        Consumption of all houses from time step start to stop, shape (time steps, houses)
+        """
+        if self.fleet is not None:
+            consumption = self.fleet.asset_fleets_by_name[asset].consumption
+            return consumption[np.arange(start, stop) % consumption.shape[0]].astype(np.float64)
+        columns = [getattr(house, asset).consumption.values for house in self.houses]
+        rows = np.arange(start, stop) % columns[0].shape[0]
+        return np.stack([column[rows] for column in columns], axis=1).astype(np.float64)
+
+    def _max_power(self, start : int, stop : int) -> np.ndarray:
+        if self.fleet is not None:
+            return self.fleet.pv.max_power[start:stop]
+        return np.stack([house.pv.max_power[start:stop] for house in self.houses], axis=1)
+
+    def check_steps(self, start : int, stop : int):
+        """
+        Vectorized check of the time steps from start to stop, which END_OF_DAY has recorded
+        """
+        rows = np.arange(start, stop) % constants.AMOUNT_OF_TIME_STEPS_IN_DAY
+        pv_consumption = self._consumption('pv', start, stop)
+        pv = np.round(pv_consumption, 4)
+        pv_curtailment = np.round(pv_consumption - self._max_power(start, stop), 4)
+        house_temperature = np.round(self.state['house_temperature'][rows], 4)
+        tank_T = np.round(self.state['tank_T'][rows], 4)
+
+        checks : List[Tuple[np.ndarray, str]] = [
+            (pv > 0.0, "PV generation should be < 0"),
+            (pv_curtailment < 0.0, "PV generation should be lower than max power")]
+        checks += self.storage_checks('ev', self._consumption('ev', start, stop), self.state['ev_energy'][rows])
+        checks += self.storage_checks('batt', self._consumption('batt', start, stop), self.state['batt_energy'][rows])
+        checks += [
+            (house_temperature < self._parameter('hp', 'T_min'), "House temperature is smaller than T_min"),
+            (tank_T < self._parameter('hp', 'tank_T_min_limit'), "Tank temperature is smaller than tank_T_min_limit"),
+            (tank_T > self._parameter('hp', 'tank_T_max_limit'), "Tank temperature is greater than tank_T_max_limit")]
+        self.raise_first_in_time(checks, start)
+
+    def check_block(self, start : int, consumption : Dict[str, np.ndarray], energy : Dict[str, np.ndarray]):
+        """
+        Vectorized check of the EVs and batteries scheduled by a block strategy, with their consumption and their energy
+        after every time step of the block, shape (time steps, houses)
+        """
+        checks : List[Tuple[np.ndarray, str]] = []
+        for asset in ['ev', 'batt']:
+            if asset in consumption:
+                checks += self.storage_checks(asset, consumption[asset], energy[asset])
+        self.raise_first_in_time(checks, start)
+
+    def storage_checks(self, asset : str, consumption : np.ndarray, energy : np.ndarray) -> List[Tuple[np.ndarray, str]]:
+        """
+        The checks of the EVs or the batteries, as (violations, message)
+        """
+        consumption = np.round(consumption, 4)
+        energy = np.round(energy, 4)
+        if asset == 'ev':
+            return [(consumption < 0.0, "Consumption of EV should be above 0.0"),
+                    (consumption > self._parameter('ev', 'power_max'), "Consumption of EV should be below power_max"),
+                    (energy < 0.0, "Energy in EV {} is below 0"),
+                    (energy > self._parameter('ev', 'size'), "Energy in EV {} is above size")]
+        return [(consumption < - self._parameter('batt', 'power_max'), "Discharging power should be greater than -power_max"),
+                (consumption > self._parameter('batt', 'power_max'), "Charging power should be smaller than power_max"),
+                (energy < 0.0, "Energy in battery {} is below 0"),
+                (energy > self._parameter('batt', 'size'), "Energy in battery {} is above size")]
+
+    def raise_first_in_time(self, checks : List[Tuple[np.ndarray, str]], start : int):
+        """
+        Raises the first violation in time of checks, whose rows are the time steps from start on
+        """
+        first : Optional[Tuple[int, int, str]] = None
+        for violations, message in checks:
+            steps = np.flatnonzero(violations.any(axis=1))
+            if steps.size > 0 and (first is None or steps[0] < first[0]):
+                first = (int(steps[0]), int(np.argmax(violations[steps[0]])), message)
+        if first is not None:
+            step, house, message = first
+            house_id = int(self.house_ids[house])
+            raise ConstraintViolation(message.format(house_id), house_id, start + step)
@@ -1,76 +1,187 @@
+from typing import Dict, List, Optional, Tuple
+import multiprocessing
 import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 import numpy as np
 
 import constants
+from Analytics import grid_metrics
+
+# Points per series that are handed to matplotlib, a few per horizontal pixel of a typical figure
+MAX_PLOT_POINTS = 4000
+
+def decimate_min_max(values : np.ndarray, buckets : int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Indices and values of the minimum and maximum of every one of buckets equally sized buckets, in time order. Keeps
+    the peaks and the envelope of the series, which is what a line plot with one bucket per pixel shows.
+    """
+    values = np.asarray(values)
+    if values.size <= 2 * buckets:
+        return np.arange(values.size), values
+    size = -(-values.size // buckets)  # ceil
+    number_of_buckets = -(-values.size // size)
+    padded = np.concatenate([values, np.full(number_of_buckets * size - values.size, np.nan)]).reshape(-1, size)
+    start = np.arange(number_of_buckets) * size
+    indices = np.sort(np.stack([start + np.nanargmin(padded, axis=1), start + np.nanargmax(padded, axis=1)], axis=1),
+                      axis=1).ravel()
+    return indices, values[indices]
+
+def decimate_lttb(values : np.ndarray, points : int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Indices and values of points points chosen with Largest-Triangle-Three-Buckets, which keeps the visual shape of the
+    series with fewer points than decimate_min_max
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if values.size <= points or points < 3:
+        return np.arange(values.size), values
+    edges = np.linspace(1, values.size - 1, points - 1).astype(int)
+    indices = np.zeros(points, dtype=int)
+    indices[-1] = values.size - 1
+    for bucket in range(points - 2):
+        start, stop = edges[bucket], max(edges[bucket + 1], edges[bucket] + 1)
+        # the average of the next bucket is the third point of the triangle
+        next_stop = edges[bucket + 2] if bucket + 2 < points - 1 else values.size
+        next_x = (stop + max(next_stop, stop + 1) - 1) / 2
+        next_y = values[stop:max(next_stop, stop + 1)].mean()
+        previous = indices[bucket]
+        x = np.arange(start, stop)
+        area = np.abs((previous - next_x) * (values[start:stop] - values[previous])
+                      - (previous - x) * (next_y - values[previous]))
+        indices[bucket + 1] = start + int(np.argmax(area))
+    return indices, values[indices]
+
+def decimate(values : np.ndarray, max_points : int = MAX_PLOT_POINTS, method : str = 'minmax') -> Tuple[np.ndarray, np.ndarray]:
+    """
+    At most max_points (index, value) pairs of values, with method 'minmax' or 'lttb'
+    """
+    if method == 'minmax':
+        return decimate_min_max(values, max_points // 2)
+    if method == 'lttb':
+        return decimate_lttb(values, max_points)
+    raise ValueError(f"method should be 'minmax' or 'lttb', not {method}")
+
+def daily_profile(load : np.ndarray, sim_length : int) -> np.ndarray:
+    """
+    Sum of load over all whole days, per time step of the day
+    """
+    days = sim_length // constants.AMOUNT_OF_TIME_STEPS_IN_DAY
+    return load[:days * constants.AMOUNT_OF_TIME_STEPS_IN_DAY].reshape(days, constants.AMOUNT_OF_TIME_STEPS_IN_DAY).sum(axis=0)
+
+def normalized_daily_profiles(reference_load : np.ndarray, total_load : np.ndarray,
+                              sim_length : int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Daily profiles of total_load and reference_load, divided by the largest value of both
+    """
+    power_profile = daily_profile(total_load, sim_length)
+    reference_profile = daily_profile(reference_load, sim_length)
+    max_val = max(power_profile.max(), reference_profile.max())
+    return power_profile / max_val, reference_profile / max_val
+
+def _draw_total_load(axes, reference_load : np.ndarray, total_load : np.ndarray, max_points : int, method : str):
+    axes.set_title("Total Load Neighborhood")
+    axes.plot(*decimate(reference_load, max_points, method), label="Reference")
+    axes.plot(*decimate(total_load, max_points, method), label="Simulation")
+    axes.set_xlabel('PTU [-]')
+    axes.set_ylabel('Kilowatt [kW]')
+    axes.legend()
+    axes.grid(True)
+
+def _draw_daily_profile(axes, power_profile : np.ndarray, reference_profile : np.ndarray):
+    hours = np.arange(1, constants.AMOUNT_OF_TIME_STEPS_IN_DAY + 1) * constants.TIME_STEP_SECONDS / 3600
+    axes.set_title("Normalized Daily Power Profile")
+    axes.plot(hours, power_profile, label='Simulation')
+    axes.plot(hours, reference_profile, label="Reference")
+    axes.set_xlabel('Hour [-]')
+    axes.set_ylabel('Relative Power [-]')
+    axes.legend()
+    axes.grid(True)
+
+def render_results(path : str, reference_load : np.ndarray, total_load : np.ndarray, title : Optional[str] = None,
+                   max_points : int = MAX_PLOT_POINTS, method : str = 'minmax', dpi : int = 100):
+    """
+    Writes the two plots of Vizualizer.plot_results_reference_and_total_load into one image file, without a display.
+    The format follows from the extension of path, for example .png, .svg or .pdf.
+    """
+    sim_length = total_load.size
+    reference_load = reference_load[0:sim_length]
+    figure = Figure(figsize=(12, 8))
+    FigureCanvasAgg(figure)
+    if title is not None:
+        figure.suptitle(title)
+    load_axes, profile_axes = figure.subplots(2, 1)
+    _draw_total_load(load_axes, reference_load, total_load, max_points, method)
+    _draw_daily_profile(profile_axes, *normalized_daily_profiles(reference_load, total_load, sim_length))
+    figure.tight_layout()
+    figure.savefig(path, dpi=dpi)
+
+def _render_job(job : Dict):
+    render_results(**job)
+    return job['path']
+
+def render_many(jobs : List[Dict], processes : Optional[int] = None) -> List[str]:
+    """
+    Renders many runs or houses into image files in a pool of worker processes. Every job is a dict with the arguments
+    of render_results, for example {'path': 'run_1.png', 'reference_load': ..., 'total_load': ..., 'title': 'run 1'}.
+    Returns the paths in the order of the jobs.
+    """
+    if processes == 1:
+        return [_render_job(job) for job in jobs]
+    with multiprocessing.Pool(processes) as pool:
+        return pool.map(_render_job, jobs)
 
 class Vizualizer:
 
     def __init__(self, sim_length) -> None:
         self.sim_length = sim_length
 
-    def plot_results_reference_and_total_load(self, reference_load : np.ndarray, total_load : np.ndarray):
+    def plot_results_reference_and_total_load(self, reference_load : np.ndarray, total_load : np.ndarray,
+                                              path : Optional[str] = None, max_points : int = MAX_PLOT_POINTS,
+                                              method : str = 'minmax'):
         """
         Creates two plots:
         - The total load of the neighborhood over time, compared with a reference
         - The normalized daily profile of the neighborhood, compared with a reference
 
+        Long series are decimated to max_points points per line with decimate. With a path, both plots are written to
+        that image file instead of shown, which also works without a display.
+
         Feel free to include more plots if you want
         """
+        if path is not None:
+            render_results(path, reference_load, total_load[0:self.sim_length], max_points=max_points, method=method)
+            return
 
         # Plot total calculated load and the reference load
         reference_load = reference_load[0:self.sim_length]
-        plt.title("Total Load Neighborhood")
-        plt.plot(reference_load, label="Reference")
-        plt.plot(total_load, label="Simulation")
-        plt.xlabel('PTU [-]')
-        plt.ylabel('Kilowatt [kW]')
-        plt.legend()
-        plt.grid(True)
+        _draw_total_load(plt.gca(), reference_load, total_load, max_points, method)
         plt.show()
 
-        # Calculate average daily profile
-        amount_of_time_steps_in_day = constants.AMOUNT_OF_TIME_STEPS_IN_DAY
-        time_step_seconds = constants.TIME_STEP_SECONDS
-
-        power_split = np.split(total_load, self.sim_length / amount_of_time_steps_in_day)
-        reference_split = np.split(reference_load, self.sim_length / amount_of_time_steps_in_day)
-        power_split = sum(power_split)
-        reference_split = sum(reference_split)
-        max_val = max(max(power_split),max(reference_split))
-        power_split /= max_val
-        reference_split /= max_val
-    
         # Plot the average daily profiles
-        plt.title("Normalized Daily Power Profile")
-        plt.plot(np.arange(1, amount_of_time_steps_in_day + 1) * time_step_seconds / 3600, power_split, label = 'Simulation')
-        plt.plot(np.arange(1, amount_of_time_steps_in_day + 1) * time_step_seconds / 3600, reference_split, label = "Reference")
-        plt.xlabel('Hour [-]')
-        plt.ylabel('Relative Power [-]')
-        plt.legend()
-        plt.grid(True)
+        _draw_daily_profile(plt.gca(), *normalized_daily_profiles(reference_load, total_load, self.sim_length))
         plt.show()
 
-    def print_metrics_renewable_share_total_load(self, renewable_share : np.ndarray, total_load : np.ndarray):
+    def calculate_metrics_renewable_share_total_load(self, renewable_share : np.ndarray, total_load : np.ndarray) -> Dict[str, float]:
         """
         Calculates 3 metrics:
         - Total energy exported to the grid
         - Total energy imported from the grid
         - Percentage of imported energy to be from renewables
-
-        Feel free to include more metrics if you want
         """
 
-        time_step_seconds = constants.TIME_STEP_SECONDS
-        ren_share = renewable_share[0: self.sim_length]
+        metrics = grid_metrics(total_load, renewable_share[0: self.sim_length])
+        return {name: float(metrics[name]) for name in ['energy_export', 'energy_import', 'renewable_percentage']}
 
-        # Calculate metrics
-        energy_export = abs(sum(total_load[total_load < 0] * time_step_seconds/ 3600))
-        energy_import = sum(total_load[total_load>0] * time_step_seconds/ 3600)
-        renewable_import = sum(total_load[total_load > 0] * ren_share[total_load > 0]) * time_step_seconds/ 3600
-        renewable_percentage = renewable_import/energy_import * 100
+    def print_metrics_renewable_share_total_load(self, renewable_share : np.ndarray, total_load : np.ndarray):
+        """
+        Prints the metrics of calculate_metrics_renewable_share_total_load
+
+        Feel free to include more metrics if you want
+        """
+        metrics = self.calculate_metrics_renewable_share_total_load(renewable_share, total_load)
 
         print("METRICS:")
         print("---------------------------------------")
-        print(f"Energy Exported: {energy_export} kWh")
-        print(f"Energy Imported: {energy_import} kWh")
-        print(f"Share Renewable Energy Imported: {renewable_percentage} %")
\ No newline at end of file
+        print(f"Energy Exported: {metrics['energy_export']} kWh")
+        print(f"Energy Imported: {metrics['energy_import']} kWh")
+        print(f"Share Renewable Energy Imported: {metrics['renewable_percentage']} %")
@@ -0,0 +1,69 @@
+import os.path
+import numpy as np
+import pytest
+
+import main
+from Simulator import Simulator, StrategyOrder, noop_strategy
+from SyntheticScenario import write_synthetic_pickle, write_synthetic_store
+
+# The synthetic scenario of the tests, small enough to simulate in a second
+NUMBER_OF_HOUSES = 20
+NUMBER_OF_DAYS = 7
+SIM_LENGTH = NUMBER_OF_DAYS * 96
+
+@noop_strategy
+def noop(*args):
+    pass
+
+@pytest.fixture(scope='session')
+def scenario_store(tmp_path_factory) -> str:
+    path = str(tmp_path_factory.mktemp('scenario') / 'store')
+    write_synthetic_store(path, NUMBER_OF_HOUSES, NUMBER_OF_DAYS, seed=1)
+    return path
+
+@pytest.fixture(scope='session')
+def scenario_pickle(tmp_path_factory) -> str:
+    """
+    data.pkl of the same scenario as scenario_store, with its reference_load.npy next to it
+    """
+    path = str(tmp_path_factory.mktemp('pickle'))
+    write_synthetic_pickle(path, NUMBER_OF_HOUSES, NUMBER_OF_DAYS, seed=1)
+    return os.path.join(path, 'data.pkl')
+
+@pytest.fixture
+def make_simulator(scenario_store):
+    """
+    Builds an initialized Simulator with the example strategies of main.py and no neighborhood strategy. Keyword
+    arguments override the strategies and other arguments of the Simulator, and sim_length, number_of_houses, data
+    and houses those of initialize.
+    """
+    def make(sim_length : int = SIM_LENGTH, number_of_houses : int = NUMBER_OF_HOUSES, data : str = scenario_store,
+             houses=None, **arguments) -> Simulator:
+        strategies = {'control_order': [StrategyOrder.INDIVIDUAL, StrategyOrder.HOUSEHOLD],
+                      'battery_strategy': main.batt_strategy, 'hp_strategy': main.hp_strategy,
+                      'pv_strategy': main.pv_strategy, 'ev_strategy': main.ev_strategy, 'neighborhood_strategy': noop,
+                      'house_strategy': main.house_strategy}
+        strategies.update(arguments)
+        simulator = Simulator(**strategies)
+        reference = os.path.join(data if os.path.isdir(data) else os.path.dirname(data), 'reference_load.npy')
+        simulator.initialize(sim_length, number_of_houses, data, reference, houses=houses)
+        return simulator
+    return make
+
+def house_results(simulator : Simulator) -> dict:
+    """
+    Consumption of every asset, energy of the EV and battery and temperatures of the heat pump of every house
+    """
+    results = {}
+    for house in simulator.list_of_houses:
+        for asset in ['pv', 'ev', 'batt', 'hp']:
+            results[f'{house.id}.{asset}'] = np.asarray(getattr(house, asset).consumption.values, dtype=np.float64)
+        results[f'{house.id}.ev_energy'] = np.asarray(house.ev.energy_history, dtype=np.float64)
+        results[f'{house.id}.batt_energy'] = np.asarray(house.batt.energy_history, dtype=np.float64)
+        results[f'{house.id}.temperatures'] = np.asarray(house.hp.temperatures, dtype=np.float64)
+    return results
+
+def assert_same_results(first : dict, second : dict):
+    assert first.keys() == second.keys()
+    for key in first:
+        assert np.array_equal(first[key], second[key]), key
@@ -4,6 +4,7 @@ import time
 
 from Simulator import Simulator, StrategyOrder
 from ModelClasses import PVInstallation, EVInstallation, Heatpump, Battery
+from Fleet import FleetStepView, fleet_strategy
 import time
 from Vizualizer import Vizualizer
 import constants
@@ -60,7 +61,6 @@ def hp_strategy(time_step : int, temperature_data : np.ndarray, renewable_share
     # Example 2 : Consume power such that the house temperature is kept at the set point and such that the tank
     # temperature does not reach below its set point
     # All these calculations are in SI units, that is: Kelvin, Joule, and seconds
-    T_ambient = temperature_data[time_step]
 
     # Calculate the amount of heat needed to keep the house temperature constant at the set point
     heat_demand_house = hp.calculate_heat_demand_house(time_step, hp.T_set)
@@ -77,7 +77,8 @@ def hp_strategy(time_step : int, temperature_data : np.ndarray, renewable_share
         heat_power_to_tank = min(hp.nominal_power, heat_to_tank / TIME_STEP_SECONDS)
 
     # Convert the heating power to electrical power using the Coefficient of Performance
-    power = heat_power_to_tank / hp.cop(hp.tank_T_set, T_ambient)
+    # hp.cop_at_tank_T_set(time_step) is the same as hp.cop(hp.tank_T_set, temperature_data[time_step]), but precomputed
+    power = heat_power_to_tank / hp.cop_at_tank_T_set(time_step)
     hp.consumption[time_step] = power / 1000.0  # convert to kW
 
 def batt_strategy(time_step : int, temperature_data : np.ndarray, renewable_share : np.ndarray, batt : Battery):
@@ -123,6 +124,25 @@ def neighborhood_strategy(time_step, temperature_data : np.ndarray, renewable_sh
     """
     pass
 
+@fleet_strategy
+def fleet_neighborhood_strategy(time_step : int, temperature_data : np.ndarray, renewable_share : np.ndarray,
+                                fleet : FleetStepView):
+    """
+    Alternative to neighborhood_strategy that gets NumPy arrays of the whole fleet instead of lists of assets. Pass it as
+    neighborhood_strategy to the Simulator to use it.
+
+    Do this by assigning to one or more of the following arrays, which hold one value per house:
+    - fleet.pv.consumption[:]
+    - fleet.ev.consumption[:]
+    - fleet.hp.consumption[:]
+    - fleet.batt.consumption[:]
+    """
+
+    # Example: valley filling, all batteries together try to cancel the total load of the neighborhood
+    load = fleet.base_load + fleet.pv.consumption + fleet.ev.consumption + fleet.hp.consumption
+    setpoint = - load.sum() / load.size
+    fleet.batt.consumption[:] = np.clip(setpoint, fleet.batt.min, fleet.batt.max)
+
 def main():
     """
     Run this function to start a simulation
@@ -0,0 +1,54 @@
+import numpy as np
+
+import constants
+from Analytics import grid_metrics, load_duration_curve, simulator_metrics, storage_metrics
+
+def original_metrics(renewable_share : np.ndarray, total_load : np.ndarray) -> dict:
+    # the calculation of Vizualizer.calculate_metrics_renewable_share_total_load before it used grid_metrics
+    time_step_seconds = constants.TIME_STEP_SECONDS
+    ren_share = renewable_share[0: total_load.size]
+    energy_export = abs(sum(total_load[total_load < 0] * time_step_seconds/ 3600))
+    energy_import = sum(total_load[total_load>0] * time_step_seconds/ 3600)
+    renewable_import = sum(total_load[total_load > 0] * ren_share[total_load > 0]) * time_step_seconds/ 3600
+    renewable_percentage = renewable_import/energy_import * 100
+    return {'energy_export': energy_export, 'energy_import': energy_import, 'renewable_percentage': renewable_percentage}
+
+def test_metrics_are_the_numbers_of_the_vizualizer(make_simulator):
+    simulator = make_simulator()
+    simulator.start_simulation(print_progress=False)
+    rng = np.random.default_rng(0)
+    for total_load in [simulator.total_load] + list(rng.normal(0, 50, (5, simulator.sim_length))):
+        metrics = grid_metrics(total_load, simulator.ren_share)
+        for name, value in original_metrics(simulator.ren_share, total_load).items():
+            assert metrics[name] == value, name
+
+def test_stacked_runs_give_the_metrics_of_every_run():
+    rng = np.random.default_rng(0)
+    runs = rng.normal(0, 10, (3, 2 * 96))
+    renewable_share = rng.uniform(0, 1, 2 * 96)
+    reference_load = rng.normal(5, 10, 2 * 96)
+    stacked = grid_metrics(runs, renewable_share, reference_load, pv_generation=-np.abs(runs))
+    for run, total_load in enumerate(runs):
+        single = grid_metrics(total_load, renewable_share, reference_load, pv_generation=-np.abs(total_load))
+        for name, value in single.items():
+            assert np.array_equal(stacked[name][run], value), name
+    assert np.array_equal(load_duration_curve(runs)[1], np.sort(runs[1])[::-1])
+
+def test_storage_metrics():
+    energy_history = np.array([[1.0, 0.0], [3.0, 2.0], [2.0, 4.0], [4.0, 2.0]])
+    metrics = storage_metrics(energy_history, np.array([4.0, 8.0]))
+    assert np.array_equal(metrics['soc_mean'], [0.625, 0.25])
+    assert np.array_equal(metrics['soc_range'], [0.75, 0.5])
+    # charged 2 + 2 and discharged 1 kWh of 4, charged 4 and discharged 2 kWh of 8
+    assert np.array_equal(metrics['equivalent_full_cycles'], [5 / 8, 6 / 16])
+
+def test_simulator_metrics_are_the_same_in_both_modes(make_simulator):
+    objects = make_simulator(sim_length=192)
+    objects.start_simulation(print_progress=False)
+    fleet = make_simulator(sim_length=192, use_fleet=True)
+    fleet.start_simulation(print_progress=False)
+
+    expected, metrics = simulator_metrics(objects), simulator_metrics(fleet)
+    assert expected.keys() == metrics.keys() and 'batt_soc_mean' in metrics and 'self_consumption' in metrics
+    for name, value in expected.items():
+        np.testing.assert_array_equal(value, metrics[name], err_msg=name)
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from BlockSchedule import block_strategy
+from ModelClasses import ConstraintViolation
+from Simulator import StrategyOrder
+from Validation import ValidationLevel
+from conftest import NUMBER_OF_HOUSES, SIM_LENGTH, noop
+
+# A schedule that ignores the constraints, the simulations of these tests do not check them
+rng = np.random.default_rng(1)
+BATT_SCHEDULE = rng.uniform(-1.0, 1.0, (SIM_LENGTH, NUMBER_OF_HOUSES))
+EV_SCHEDULE = rng.uniform(0.0, 2.0, (SIM_LENGTH, NUMBER_OF_HOUSES))
+
+def scheduled_batt_strategy(time_step, temperature_data, renewable_share, batt):
+    batt.consumption[time_step] = BATT_SCHEDULE[time_step, batt.id]
+
+def scheduled_ev_strategy(time_step, temperature_data, renewable_share, ev):
+    ev.consumption[time_step] = EV_SCHEDULE[time_step, ev.id]
+
+@block_strategy(horizon=40)
+def scheduled_block_strategy(time_step, temperature_data, renewable_share, block):
+    # the last block is shorter
+    assert block.horizon == min(40, SIM_LENGTH - time_step)
+    return {'batt': BATT_SCHEDULE[time_step:time_step + block.horizon],
+            'ev': EV_SCHEDULE[time_step:time_step + block.horizon]}
+
+def fleet_results(simulator) -> dict:
+    fleet = simulator.fleet
+    return {'total_load': simulator.total_load, 'ev.energy': fleet.ev.energy, 'batt.energy': fleet.batt.energy,
+            'ev.energy_history': fleet.ev.energy_history, 'batt.energy_history': fleet.batt.energy_history,
+            'ev.consumption': fleet.ev.consumption, 'batt.consumption': fleet.batt.consumption,
+            'hp.tank_T': fleet.hp.tank_T, 'hp.temperatures': fleet.hp.temperatures}
+
+def test_block_strategy_matches_per_step_strategies(make_simulator):
+    arguments = {'control_order': [StrategyOrder.INDIVIDUAL], 'house_strategy': noop,
+                 'validation': ValidationLevel.OFF}
+    per_step = make_simulator(battery_strategy=scheduled_batt_strategy, ev_strategy=scheduled_ev_strategy,
+                              use_fleet=True, **arguments)
+    per_step.start_simulation(print_progress=False)
+    blocks = make_simulator(battery_strategy=noop, ev_strategy=noop, block_strategy=scheduled_block_strategy,
+                            **arguments)
+    blocks.start_simulation(print_progress=False)
+
+    expected, results = fleet_results(per_step), fleet_results(blocks)
+    for name, value in expected.items():
+        assert np.array_equal(value, results[name]), name
+
+def test_per_step_strategy_of_a_scheduled_asset_is_refused(make_simulator):
+    with pytest.raises(ValueError):
+        make_simulator(battery_strategy=scheduled_batt_strategy, ev_strategy=noop,
+                       block_strategy=scheduled_block_strategy)
+
+OVERCHARGE = np.zeros((SIM_LENGTH, NUMBER_OF_HOUSES))
+OVERCHARGE[50, 3] = 6.0
+
+def overcharging_batt_strategy(time_step, temperature_data, renewable_share, batt):
+    batt.consumption[time_step] = OVERCHARGE[time_step, batt.id]
+
+@block_strategy(assets=('batt',))
+def overcharging_block_strategy(time_step, temperature_data, renewable_share, block):
+    return {'batt': OVERCHARGE[time_step:time_step + block.horizon]}
+
+def test_block_violation_is_the_violation_of_the_step(make_simulator):
+    arguments = {'control_order': [StrategyOrder.INDIVIDUAL], 'house_strategy': noop, 'validation': ValidationLevel.FULL}
+    with pytest.raises(ConstraintViolation) as per_step:
+        make_simulator(battery_strategy=overcharging_batt_strategy, **arguments).start_simulation(print_progress=False)
+    with pytest.raises(ConstraintViolation) as blocks:
+        make_simulator(battery_strategy=noop, block_strategy=overcharging_block_strategy,
+                       **arguments).start_simulation(print_progress=False)
+
+    assert (blocks.value.message, blocks.value.house, blocks.value.time_step) == \
+           (per_step.value.message, per_step.value.house, per_step.value.time_step) == \
+           ("Charging power should be smaller than power_max", 3, 50)
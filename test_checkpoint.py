@@ -0,0 +1,26 @@
+import numpy as np
+import pytest
+
+from conftest import assert_same_results, house_results
+
+# the checkpoint of a simulation with or without a fleet is resumed in both modes
+@pytest.mark.parametrize('use_fleet, resume_with_fleet', [(False, False), (True, True), (False, True), (True, False)])
+def test_resume_matches_uninterrupted(make_simulator, tmp_path, use_fleet, resume_with_fleet):
+    uninterrupted = make_simulator(use_fleet=use_fleet)
+    uninterrupted.start_simulation(print_progress=False, checkpoint_interval_days=3,
+                                   checkpoint_dir=str(tmp_path / 'checkpoints'))
+    assert sorted(path.name for path in (tmp_path / 'checkpoints').iterdir()) == ['day_003.npz', 'day_006.npz']
+
+    resumed = make_simulator(use_fleet=resume_with_fleet)
+    assert resumed.load_checkpoint(str(tmp_path / 'checkpoints' / 'day_003.npz')) == 3 * 96
+    resumed.start_simulation(print_progress=False)
+
+    assert np.array_equal(uninterrupted.total_load, resumed.total_load)
+    assert_same_results(house_results(uninterrupted), house_results(resumed))
+
+def test_checkpoint_of_other_houses_is_refused(make_simulator, tmp_path):
+    simulator = make_simulator(number_of_houses=5)
+    simulator.start_simulation(print_progress=False, checkpoint_interval_days=3,
+                               checkpoint_dir=str(tmp_path / 'checkpoints'))
+    with pytest.raises(ValueError, match="State is of houses"):
+        make_simulator().load_checkpoint(str(tmp_path / 'checkpoints' / 'day_003.npz'))
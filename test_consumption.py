@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+
+from ModelClasses import ConsumptionBuffer, UnsetConsumptionError
+from Simulator import StrategyOrder
+
+def test_unset_consumption_cannot_be_read():
+    consumption = ConsumptionBuffer.unset(4)
+    consumption[1] = 2.5
+    assert consumption[1] == 2.5 and consumption.is_set(1) and not consumption.is_set(0)
+    with pytest.raises(UnsetConsumptionError):
+        consumption[0]
+    with pytest.raises(UnsetConsumptionError):
+        consumption[0:2]
+    consumption[0] = -1.0
+    assert np.array_equal(consumption[0:2], [-1.0, 2.5])
+
+def test_wrong_strategy_order_is_reported(make_simulator):
+    # the house strategy reads the consumption of the assets before their strategies set it
+    simulator = make_simulator(control_order=[StrategyOrder.HOUSEHOLD, StrategyOrder.INDIVIDUAL])
+    with pytest.raises(TypeError, match="correct strategy order"):
+        simulator.start_simulation(print_progress=False)
+
+def test_float32_consumption_is_close_to_float64(make_simulator):
+    float64 = make_simulator(sim_length=96)
+    float64.start_simulation(print_progress=False)
+    float32 = make_simulator(sim_length=96, consumption_dtype=np.float32)
+    float32.start_simulation(print_progress=False)
+
+    assert float32.list_of_houses[0].pv.consumption.values.dtype == np.float32
+    np.testing.assert_allclose(float32.total_load, float64.total_load, rtol=1e-4, atol=1e-3)
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+import main
+from Simulator import StrategyOrder, is_noop_strategy
+from conftest import noop
+
+def empty_ev_strategy(time_step, temperature_data, renewable_share, ev):
+    pass
+
+def calls_of(simulator, tier : StrategyOrder, asset : str) -> int:
+    return sum(len(group.calls) for group in simulator.dispatch_plan if group.tier == tier and group.asset == asset)
+
+def test_only_declared_noop_strategies_are_skipped(make_simulator):
+    assert is_noop_strategy(noop) and not is_noop_strategy(empty_ev_strategy) and not is_noop_strategy(main.batt_strategy)
+    simulator = make_simulator(ev_strategy=empty_ev_strategy, battery_strategy=noop)
+    simulator.update_dispatch_plan()
+    assert calls_of(simulator, StrategyOrder.INDIVIDUAL, 'ev') == len(simulator.list_of_houses)
+    assert calls_of(simulator, StrategyOrder.INDIVIDUAL, 'batt') == 0
+
+    # a strategy without the decorator is called, so the EVs that it does not set are reported
+    with pytest.raises(TypeError, match="correct strategy order"):
+        simulator.start_simulation(print_progress=False)
+
+@pytest.mark.parametrize('use_fleet', [False, True])
+def test_replaced_strategies_are_called(make_simulator, use_fleet):
+    expected = make_simulator(sim_length=192, use_fleet=use_fleet)
+    expected.start_simulation(print_progress=False)
+
+    # replaced on the simulator
+    replaced = make_simulator(sim_length=192, ev_strategy=noop, use_fleet=use_fleet)
+    replaced.ev_strategy = main.ev_strategy
+    replaced.start_simulation(print_progress=False)
+    assert np.array_equal(replaced.total_load, expected.total_load)
+
+    # replaced on the assets, after the plan was compiled, while another simulator keeps its plan
+    other = make_simulator(sim_length=192, ev_strategy=noop, use_fleet=use_fleet)
+    other.update_dispatch_plan()
+    replaced = make_simulator(sim_length=192, ev_strategy=noop, use_fleet=use_fleet)
+    replaced.update_dispatch_plan()
+    for house in replaced.list_of_houses:
+        house.ev.strategy = main.ev_strategy
+    replaced.start_simulation(print_progress=False)
+    assert np.array_equal(replaced.total_load, expected.total_load)
+    other.update_dispatch_plan()
+    assert calls_of(other, StrategyOrder.INDIVIDUAL, 'ev') == 0
@@ -0,0 +1,70 @@
+import os.path
+import numpy as np
+import pytest
+
+import main
+from Ensemble import P2Quantile, StreamingStatistics, member_seeds, run_ensemble
+from Simulator import StrategyOrder
+from conftest import NUMBER_OF_HOUSES, noop
+
+MEMBERS = 3
+SIM_LENGTH = 192
+STRATEGIES = {'control_order': [StrategyOrder.INDIVIDUAL, StrategyOrder.HOUSEHOLD],
+              'battery_strategy': main.batt_strategy, 'hp_strategy': main.hp_strategy, 'pv_strategy': main.pv_strategy,
+              'ev_strategy': main.ev_strategy, 'neighborhood_strategy': noop, 'house_strategy': main.house_strategy}
+
+def test_streaming_statistics_match_numpy():
+    values = np.random.default_rng(0).normal(2.0, 3.0, (20000, 4))
+    statistics = StreamingStatistics((4,), quantiles=(0.05, 0.5, 0.95))
+    for row in values:
+        statistics.update(row)
+    result = statistics.result()
+    np.testing.assert_allclose(result['mean'], values.mean(axis=0), rtol=1e-10)
+    np.testing.assert_allclose(result['std'], values.std(axis=0, ddof=1), rtol=1e-10)
+    assert np.array_equal(result['min'], values.min(axis=0))
+    assert np.array_equal(result['max'], values.max(axis=0))
+    # the P-square markers estimate the quantiles to within a small fraction of the standard deviation
+    for p in [0.05, 0.5, 0.95]:
+        np.testing.assert_allclose(result[f'q{p:g}'], np.quantile(values, p, axis=0), atol=0.05)
+
+def test_p2_quantile_is_exact_for_five_values():
+    values = np.random.default_rng(1).normal(size=(5, 3))
+    quantile = P2Quantile(0.3, (3,))
+    for count, row in enumerate(values, start=1):
+        quantile.update(row)
+        assert np.array_equal(quantile.value(), np.quantile(values[:count], 0.3, axis=0))
+
+@pytest.fixture
+def ensemble(scenario_store):
+    def run(processes : int):
+        return run_ensemble(STRATEGIES, SIM_LENGTH, NUMBER_OF_HOUSES - 5, scenario_store,
+                            os.path.join(scenario_store, 'reference_load.npy'), MEMBERS, seed=7, processes=processes)
+    return run
+
+def test_ensemble_matches_its_members(make_simulator, ensemble):
+    result = ensemble(processes=2)
+    total_loads = []
+    for seed_sequence in member_seeds(7, MEMBERS):
+        scenario_seed, expansion_seed = seed_sequence.spawn(2)
+        simulator = make_simulator(sim_length=SIM_LENGTH, number_of_houses=NUMBER_OF_HOUSES - 5, use_fleet=True,
+                                   keep_history=False, scenario_rng=np.random.default_rng(scenario_seed),
+                                   expansion_seed=int(expansion_seed.generate_state(1)[0]))
+        simulator.start_simulation(print_progress=False)
+        total_loads.append(simulator.total_load)
+    total_loads = np.array(total_loads)
+
+    # the members are different draws of the houses
+    assert not np.array_equal(total_loads[0], total_loads[1])
+    assert np.array_equal(result['total_load']['min'], total_loads.min(axis=0))
+    assert np.array_equal(result['total_load']['max'], total_loads.max(axis=0))
+    np.testing.assert_allclose(result['total_load']['mean'], total_loads.mean(axis=0), rtol=1e-10)
+    np.testing.assert_allclose(result['total_load']['q0.5'], np.median(total_loads, axis=0), rtol=1e-10)
+
+def test_ensemble_does_not_depend_on_the_number_of_processes(ensemble):
+    first, second = ensemble(processes=1), ensemble(processes=2)
+    for name in first['total_load']:
+        assert np.array_equal(first['total_load'][name], second['total_load'][name]), name
+    assert first['metrics'].keys() == second['metrics'].keys()
+    for metric in first['metrics']:
+        for name in first['metrics'][metric]:
+            assert np.array_equal(first['metrics'][metric][name], second['metrics'][metric][name]), (metric, name)
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+import main
+from Environment import SimulatorEnv
+from Simulator import StrategyOrder
+from conftest import NUMBER_OF_HOUSES, noop
+
+def max_hp_strategy(time_step, temperature_data, renewable_share, hp):
+    hp.consumption[time_step] = hp.max
+
+def idle_batt_strategy(time_step, temperature_data, renewable_share, batt):
+    batt.consumption[time_step] = 0.0
+
+def max_actions(observation : dict) -> dict:
+    return {'ev': observation['ev_max'], 'batt': np.zeros(NUMBER_OF_HOUSES), 'hp': observation['hp_max']}
+
+@pytest.fixture
+def env(make_simulator) -> SimulatorEnv:
+    simulator = make_simulator(control_order=[StrategyOrder.INDIVIDUAL], battery_strategy=noop, hp_strategy=noop,
+                               ev_strategy=noop, house_strategy=noop, use_fleet=True)
+    return SimulatorEnv(simulator, seed=0)
+
+def episode(env : SimulatorEnv, seed=None, start_day=None, n_days : int = 2):
+    observation, info = env.reset(seed=seed, start_day=start_day, n_days=n_days)
+    observations, rewards = [observation], []
+    truncated = False
+    while not truncated:
+        observation, reward, terminated, truncated, info = env.step(max_actions(observation))
+        observations.append(observation)
+        rewards.append(reward)
+    return info, observations, rewards
+
+def test_environment_reset_is_reproducible(env):
+    first, other, second = episode(env, 3), episode(env, 4), episode(env, 3)
+    assert first[0] == second[0] and first[1][0].keys() == second[1][0].keys()
+    assert first[2] == second[2]
+    for observation, repeated in zip(first[1], second[1]):
+        for key in observation:
+            assert np.array_equal(observation[key], repeated[key]), key
+
+def test_episode_matches_the_simulation_with_the_same_strategies(env, make_simulator):
+    simulator = make_simulator(sim_length=192, control_order=[StrategyOrder.INDIVIDUAL],
+                               battery_strategy=idle_batt_strategy, hp_strategy=max_hp_strategy,
+                               ev_strategy=main.ev_strategy, house_strategy=noop, use_fleet=True)
+    simulator.start_simulation(print_progress=False)
+    episode(env, start_day=1)
+    episode(env, start_day=0)
+
+    assert np.array_equal(env.simulator.total_load[:192], simulator.total_load)
+    assert np.array_equal(env.fleet.batt.energy, simulator.fleet.batt.energy)
+    assert np.array_equal(env.fleet.hp.temperatures, simulator.fleet.hp.temperatures)
+
+def test_controlled_assets_need_noop_strategies(make_simulator):
+    with pytest.raises(ValueError, match="controlled by the actions"):
+        SimulatorEnv(make_simulator(use_fleet=True))
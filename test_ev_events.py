@@ -0,0 +1,46 @@
+import numpy as np
+
+from conftest import SIM_LENGTH
+
+def expected_events(houses):
+    """
+    Presence, time to departure, trip energy, departures and arrivals read step by step from the sessions of the EVs
+    """
+    sessions = np.array([np.asarray(house.ev.session[:SIM_LENGTH]).astype(int) for house in houses]).T
+    present = sessions != -1
+    time_to_departure = np.zeros(sessions.shape, dtype=int)
+    trip_energy = np.zeros(sessions.shape)
+    for time_step, house in zip(*np.nonzero(present)):
+        session = sessions[time_step, house]
+        time_to_departure[time_step, house] = houses[house].ev.session_leave[session] - time_step
+        trip_energy[time_step, house] = houses[house].ev.session_trip_energy[session]
+    departures = np.zeros(sessions.shape, dtype=bool)
+    departures[1:] = ~present[1:] & present[:-1]
+    arrivals = np.zeros(sessions.shape, dtype=bool)
+    arrivals[1:] = present[1:] & ~present[:-1]
+    return present, time_to_departure, trip_energy, departures, arrivals
+
+def test_event_index_matches_the_sessions(make_simulator):
+    simulator = make_simulator()
+    houses = simulator.list_of_houses
+    events = simulator.exogenous.ev_events
+    present, time_to_departure, trip_energy, departures, arrivals = expected_events(houses)
+    assert departures.any() and arrivals.any()
+
+    for time_step in range(SIM_LENGTH):
+        assert np.array_equal(events.present_at(time_step), present[time_step])
+        assert np.array_equal(events.time_to_departure_at(time_step), time_to_departure[time_step])
+        assert np.array_equal(events.trip_energy_at(time_step), trip_energy[time_step])
+        assert np.array_equal(events.departures_at(time_step), np.flatnonzero(departures[time_step]))
+        assert np.array_equal(events.arrivals_at(time_step), np.flatnonzero(arrivals[time_step]))
+        assert np.array_equal(events.departure_trip_energies_at(time_step),
+                              trip_energy[time_step - 1, departures[time_step]])
+    for house in [0, 7]:
+        for time_step in range(0, SIM_LENGTH, 5):
+            assert events.time_to_departure_of(house, time_step) == time_to_departure[time_step, house]
+            assert events.trip_energy_of(house, time_step) == trip_energy[time_step, house]
+
+    for start, stop in [(0, SIM_LENGTH), (50, 51), (130, 300)]:
+        assert np.array_equal(events.present(start, stop), present[start:stop])
+        assert np.array_equal(events.time_to_departure(start, stop), time_to_departure[start:stop])
+        assert np.array_equal(events.trip_energy(start, stop), trip_energy[start:stop])
@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+
+from conftest import SIM_LENGTH
+
+@pytest.mark.parametrize('use_fleet', [False, True])
+def test_precomputed_cop_matches_the_heat_pump(make_simulator, use_fleet):
+    simulator = make_simulator(use_fleet=use_fleet)
+    hps = [house.hp for house in simulator.list_of_houses]
+    for time_step in range(SIM_LENGTH):
+        assert [hp.cop_at_tank_T_set(time_step) for hp in hps] == \
+               [hp.cop(hp.tank_T_set, simulator.temperature_data[time_step]) for hp in hps]
+
+    # a heat pump whose set point is changed calculates its COP itself
+    hps[2].tank_T_set += 5.0
+    assert hps[2].cop_at_tank_T_set(10) == hps[2].cop(hps[2].tank_T_set, simulator.temperature_data[10])
+    assert hps[3].cop_at_tank_T_set(10) == simulator.exogenous.cop_at(10)[3]
+    if use_fleet:
+        cop = simulator.fleet.hp.cop_at_tank_T_set(10)
+        assert cop[2] == hps[2].cop_at_tank_T_set(10) and cop[3] == hps[3].cop_at_tank_T_set(10)
+
+def test_totals_are_the_sums_over_the_houses(make_simulator):
+    simulator = make_simulator()
+    houses = simulator.list_of_houses
+    np.testing.assert_allclose(simulator.exogenous.base_load_total, np.sum([house.base_data for house in houses], axis=0),
+                               rtol=1e-12)
+    np.testing.assert_allclose(simulator.exogenous.pv_max_power_total,
+                               np.sum([house.pv.max_power for house in houses], axis=0), rtol=1e-12)
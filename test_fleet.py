@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from Fleet import fleet_strategy
+from Simulator import StrategyOrder
+from conftest import assert_same_results, house_results, noop
+
+def test_fleet_matches_objects(make_simulator):
+    objects = make_simulator()
+    objects.start_simulation(print_progress=False)
+    fleet = make_simulator(use_fleet=True)
+    fleet.start_simulation(print_progress=False)
+
+    assert np.array_equal(objects.total_load, fleet.total_load)
+    assert_same_results(house_results(objects), house_results(fleet))
+
+def neighborhood_charging(time_step, temperature_data, renewable_share, baseloads, pvs, evs, hps, batteries):
+    for base_data, pv, ev, hp, batt in zip(baseloads, pvs, evs, hps, batteries):
+        ev.consumption[time_step] = ev.max
+        load = base_data[time_step] + pv.consumption[time_step] + ev.consumption[time_step] + hp.consumption[time_step]
+        batt.consumption[time_step] = min(max(-load, batt.min), batt.max)
+
+@fleet_strategy
+def fleet_charging(time_step, temperature_data, renewable_share, fleet):
+    fleet.ev.consumption[:] = fleet.ev.max
+    load = fleet.base_load + fleet.pv.consumption + fleet.ev.consumption + fleet.hp.consumption
+    fleet.batt.consumption[:] = np.minimum(np.maximum(-load, fleet.batt.min), fleet.batt.max)
+
+def test_fleet_strategy_matches_neighborhood_strategy(make_simulator):
+    arguments = {'control_order': [StrategyOrder.INDIVIDUAL, StrategyOrder.NEIGHBORHOOD], 'ev_strategy': noop,
+                 'battery_strategy': noop, 'house_strategy': noop}
+    lists = make_simulator(neighborhood_strategy=neighborhood_charging, **arguments)
+    lists.start_simulation(print_progress=False)
+    arrays = make_simulator(neighborhood_strategy=fleet_charging, **arguments)
+    assert arrays.use_fleet
+    arrays.start_simulation(print_progress=False)
+
+    assert np.array_equal(lists.total_load, arrays.total_load)
+    assert_same_results(house_results(lists), house_results(arrays))
+
+@fleet_strategy
+def fleet_changing_max(time_step, temperature_data, renewable_share, fleet):
+    fleet.ev.max[:] = 0.0
+
+def test_fleet_strategy_cannot_change_the_flexibility(make_simulator):
+    simulator = make_simulator(neighborhood_strategy=fleet_changing_max,
+                               control_order=[StrategyOrder.INDIVIDUAL, StrategyOrder.NEIGHBORHOOD])
+    with pytest.raises(ValueError, match="read-only"):
+        simulator.start_simulation(print_progress=False)
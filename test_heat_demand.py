@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+
+def uncached_heat_demand(hp, time_step : int) -> float:
+    free_temperatures = np.matmul(hp.super_matrix, np.array(hp.temperatures)) + hp.v_part[time_step]
+    return max(0, ((hp.T_set - free_temperatures[1]) / hp.heat_to_house_temperature) * 900)
+
+@pytest.mark.parametrize('use_fleet', [False, True])
+def test_cached_heat_demand_follows_the_temperatures(make_simulator, use_fleet, tmp_path):
+    simulator = make_simulator(sim_length=192, use_fleet=use_fleet)
+    hp = simulator.list_of_houses[4].hp
+    for time_step in range(96):
+        simulator.do_time_step(time_step)
+        # the cache of this time step is filled by the strategies and updated by the response
+        heat_demand = hp.calculate_heat_demand_house(time_step + 1, hp.T_set)
+        assert heat_demand == pytest.approx(uncached_heat_demand(hp, time_step + 1), rel=1e-12)
+    simulator.save_checkpoint(str(tmp_path / 'checkpoint.npz'), 96)
+
+    # assigning the temperatures
+    heat_demand = hp.calculate_heat_demand_house(96, hp.T_set)
+    hp.temperatures = np.array(hp.temperatures) - 2.0
+    colder_heat_demand = hp.calculate_heat_demand_house(96, hp.T_set)
+    assert colder_heat_demand > heat_demand
+    assert colder_heat_demand == pytest.approx(uncached_heat_demand(hp, 96), rel=1e-12)
+    with pytest.raises(ValueError):
+        hp.free_temperatures(96)[1] = 0.0
+
+    # and restoring a checkpoint
+    simulator.load_checkpoint(str(tmp_path / 'checkpoint.npz'))
+    assert hp.calculate_heat_demand_house(96, hp.T_set) == heat_demand
@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+
+from conftest import NUMBER_OF_HOUSES, assert_same_results, house_results
+
+@pytest.mark.parametrize('use_fleet', [False, True])
+def test_profiling_does_not_change_the_results(make_simulator, use_fleet):
+    profiled = make_simulator(sim_length=192, profile=True, use_fleet=use_fleet)
+    profiled.start_simulation(print_progress=False)
+    simulator = make_simulator(sim_length=192, use_fleet=use_fleet)
+    simulator.start_simulation(print_progress=False)
+
+    assert np.array_equal(profiled.total_load, simulator.total_load)
+    assert_same_results(house_results(profiled), house_results(simulator))
+
+def test_profile_counts_the_calls_of_every_tier_and_asset(make_simulator):
+    simulator = make_simulator(sim_length=192, profile=True)
+    simulator.start_simulation(print_progress=False)
+    profiler = simulator.profiler
+
+    assert profiler.calls[('control_strategy', 'individual', '')] == 192
+    assert profiler.calls[('control_strategy', 'individual', 'hp')] == 192 * NUMBER_OF_HOUSES
+    assert profiler.calls[('response', '', 'hp')] == 192 * NUMBER_OF_HOUSES
+    # the time of a tier includes the time of its assets
+    assets = sum(profiler.seconds[('control_strategy', 'individual', asset)] for asset in ['pv', 'ev', 'batt', 'hp'])
+    assert assets <= profiler.seconds[('control_strategy', 'individual', '')]
+
+    timeline = profiler.timeline(simulator.total_load)
+    assert [row['day'] for row in timeline] == [0, 1]
+    assert timeline[1]['peak_load'] == simulator.total_load[96:].max()
+    assert sum(row['response/hp'] for row in timeline) == pytest.approx(profiler.seconds[('response', '', 'hp')])
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from ResultStore import COLUMNS, ResultStore, ResultWriter
+from Validation import ValidationLevel
+from conftest import NUMBER_OF_HOUSES, SIM_LENGTH
+
+def stored_results(path : str) -> dict:
+    store = ResultStore(path)
+    results = {column: store.read(column) for column in store.columns}
+    results['total_load'] = store.total_load()
+    return results
+
+@pytest.mark.parametrize('use_fleet', [False, True])
+def test_store_holds_the_results_of_the_simulation(make_simulator, tmp_path, use_fleet):
+    simulator = make_simulator(results_path=str(tmp_path / 'results'), use_fleet=use_fleet)
+    simulator.start_simulation(print_progress=False)
+    store = ResultStore(str(tmp_path / 'results'))
+    houses = simulator.list_of_houses
+
+    assert store.columns == COLUMNS and store.first_time_step == 0 and store.length == SIM_LENGTH
+    assert np.array_equal(store.total_load(), simulator.total_load)
+    for asset in ['pv', 'ev', 'batt', 'hp']:
+        consumption = np.stack([getattr(house, asset).consumption.values for house in houses], axis=1)
+        assert np.array_equal(store.read(f'{asset}.consumption'), consumption), asset
+    # the energy after a time step is the energy before the next one
+    batt_energy = np.stack([house.batt.energy_history for house in houses], axis=1)
+    assert np.array_equal(store.read('batt.energy', stop=SIM_LENGTH - 1), batt_energy[1:])
+    assert np.array_equal(store.read('hp.house_temperature')[-1], [house.hp.temperatures[1] for house in houses])
+    positions = store.house_positions([houses[5].id, houses[2].id])
+    assert np.array_equal(store.read('ev.energy', houses=positions, start=10, stop=20),
+                          store.read('ev.energy')[10:20, [5, 2]])
+
+@pytest.mark.parametrize('use_fleet', [False, True])
+def test_resume_continues_the_store(make_simulator, tmp_path, use_fleet):
+    arguments = {'use_fleet': use_fleet, 'streaming_metrics': True, 'validation': ValidationLevel.SAMPLED,
+                 'results_path': str(tmp_path / 'results')}
+    uninterrupted = make_simulator(**arguments)
+    uninterrupted.start_simulation(print_progress=False, checkpoint_interval_days=3,
+                                   checkpoint_dir=str(tmp_path / 'checkpoints'))
+    expected = stored_results(str(tmp_path / 'results'))
+
+    # the simulation is interrupted after day 4, and resumed from the checkpoint of day 3 into the same result store
+    resumed = make_simulator(**arguments)
+    resumed.load_checkpoint(str(tmp_path / 'checkpoints' / 'day_003.npz'))
+    resumed.start_simulation(print_progress=False)
+    results = stored_results(str(tmp_path / 'results'))
+    for name, value in expected.items():
+        assert np.array_equal(value, results[name]), name
+
+    # resumed into a new store, which starts at the checkpoint
+    arguments['results_path'] = str(tmp_path / 'new_results')
+    resumed = make_simulator(**arguments)
+    resumed.load_checkpoint(str(tmp_path / 'checkpoints' / 'day_003.npz'))
+    resumed.start_simulation(print_progress=False)
+    store = ResultStore(str(tmp_path / 'new_results'))
+    assert store.first_time_step == 3 * 96 and store.length == SIM_LENGTH
+    assert np.array_equal(store.read('hp.tank_T'), expected['hp.tank_T'][3 * 96:])
+    with pytest.raises(ValueError, match="not in the store"):
+        store.read('hp.tank_T', start=0)
+
+def test_unknown_column_is_refused(tmp_path):
+    with pytest.raises(ValueError, match="Unknown column"):
+        ResultWriter(str(tmp_path / 'results'), list(range(NUMBER_OF_HOUSES)), SIM_LENGTH, columns=['hp.power'])
@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+
+import main
+from RollingHorizon import RollingHorizonStrategy
+from Simulator import StrategyOrder
+from Validation import ValidationLevel
+from conftest import noop
+
+@pytest.mark.parametrize('objective', ['peak', 'import'])
+def test_plan_keeps_the_constraints_and_lowers_the_objective(make_simulator, objective):
+    example = make_simulator(sim_length=192)
+    example.start_simulation(print_progress=False)
+    strategy = RollingHorizonStrategy(horizon=96, resolve_interval=8, objective=objective)
+    optimized = make_simulator(sim_length=192, battery_strategy=noop, ev_strategy=main.ev_strategy, house_strategy=noop,
+                               control_order=[StrategyOrder.INDIVIDUAL, StrategyOrder.NEIGHBORHOOD],
+                               neighborhood_strategy=strategy, validation=ValidationLevel.FULL)
+    # FULL validation raises a ConstraintViolation if the plan breaks a constraint
+    optimized.start_simulation(print_progress=False)
+
+    if objective == 'peak':
+        assert (optimized.total_load ** 2).sum() < (example.total_load ** 2).sum()
+    else:
+        assert (np.maximum(optimized.total_load, 0) ** 2).sum() < (np.maximum(example.total_load, 0) ** 2).sum()
+
+def test_unknown_objective_is_refused():
+    with pytest.raises(ValueError, match="objective should be one of"):
+        RollingHorizonStrategy(objective='cost')
@@ -0,0 +1,57 @@
+import numpy as np
+
+from ScenarioExpansion import ScenarioExpansion
+from ScenarioStore import load_store
+from conftest import NUMBER_OF_HOUSES, SIM_LENGTH, assert_same_results, house_results
+
+EXPANDED_HOUSES = NUMBER_OF_HOUSES + 10
+
+def test_expansion_depends_only_on_the_seed(scenario_store):
+    scenario_data = load_store(scenario_store, NUMBER_OF_HOUSES, SIM_LENGTH)
+    first, again = ScenarioExpansion(scenario_data, EXPANDED_HOUSES, 3), ScenarioExpansion(scenario_data, EXPANDED_HOUSES, 3)
+    other = ScenarioExpansion(scenario_data, EXPANDED_HOUSES, 4)
+    houses = range(NUMBER_OF_HOUSES, EXPANDED_HOUSES)
+    assert all(np.array_equal(first.house_data(house)['baseload'], again.house_data(house)['baseload']) for house in houses)
+    assert not all(np.array_equal(first.house_data(house)['baseload'], other.house_data(house)['baseload'])
+                   for house in houses)
+
+def test_extra_houses_are_whole_days_shifted_houses(scenario_store):
+    scenario_data = load_store(scenario_store, NUMBER_OF_HOUSES, SIM_LENGTH)
+    expansion = ScenarioExpansion(scenario_data, EXPANDED_HOUSES, 0)
+    for house in range(NUMBER_OF_HOUSES, EXPANDED_HOUSES):
+        index = house - NUMBER_OF_HOUSES
+        data = expansion.house_data(house)
+        shift = int(expansion.baseload_shift[index])
+        assert shift % 96 == 0
+        assert np.array_equal(data['baseload'], np.roll(scenario_data['baseloaddata'][expansion.baseload_source[index]], -shift))
+        assert np.array_equal(data['pv_data'], scenario_data['irrdata'][expansion.pv_source[index]])
+
+        # the EV is at home at the same time steps as its source, shifted, with the trip energies of the same sessions
+        source = scenario_data['ev_data'][expansion.ev_source[index]]
+        ev_shift = int(expansion.ev_shift[index])
+        status = np.roll(np.asarray(source['EV_status']), -ev_shift)
+        assert np.array_equal(data['ev_data']['EV_status'] == -1, status == -1)
+        present = status != -1
+        assert np.array_equal(np.asarray(data['ev_data']['Trip_Energy'])[data['ev_data']['EV_status'][present].astype(int)],
+                              np.asarray(source['Trip_Energy'])[status[present].astype(int)])
+
+def test_expanded_simulation_is_the_same_from_the_store_the_pickle_and_for_a_subset(make_simulator, scenario_store,
+                                                                                   scenario_pickle):
+    arguments = {'number_of_houses': EXPANDED_HOUSES, 'sim_length': 192, 'expand_scenario': True, 'use_fleet': True}
+    from_store = make_simulator(**arguments)
+    from_store.start_simulation(print_progress=False)
+    from_pickle = make_simulator(data=scenario_pickle, **arguments)
+    from_pickle.start_simulation(print_progress=False)
+    assert np.array_equal(from_store.total_load, from_pickle.total_load)
+    assert_same_results(house_results(from_store), house_results(from_pickle))
+
+    # a subset gets the data of the same houses, so it computes the same; per house, since the batched heat pump model
+    # rounds differently for fewer houses
+    arguments['use_fleet'] = False
+    full = make_simulator(**arguments)
+    full.start_simulation(print_progress=False)
+    subset = make_simulator(houses=[3, 21, 28], **arguments)
+    subset.start_simulation(print_progress=False)
+    expected = house_results(full)
+    for key, value in house_results(subset).items():
+        assert np.array_equal(value, expected[key]), key
@@ -0,0 +1,39 @@
+import pickle
+import numpy as np
+import pytest
+
+from ScenarioStore import convert_pickle_to_store, load_store
+from conftest import NUMBER_OF_HOUSES, SIM_LENGTH, assert_same_results, house_results
+
+def test_store_has_the_data_of_the_pickle(scenario_pickle, tmp_path):
+    convert_pickle_to_store(scenario_pickle, str(tmp_path / 'store'))
+    store = load_store(str(tmp_path / 'store'), 5, 96)
+    with open(scenario_pickle, 'rb') as f:
+        scenario_data = pickle.load(f)
+
+    assert np.array_equal(store['baseloaddata'], np.asarray(scenario_data['baseloaddata'])[:5, :96])
+    assert np.array_equal(store['ren_share'], np.asarray(scenario_data['ren_share'])[:96])
+    for key, value in scenario_data['hp_data'].items():
+        # the store slices out the first houses and time steps
+        stored = store['hp_data'][key]
+        assert np.array_equal(stored, np.asarray(value)[tuple(slice(0, n) for n in stored.shape)]), key
+    for house in range(5):
+        for key, value in scenario_data['ev_data'][house].items():
+            if np.ndim(value) == 1 and len(value) == SIM_LENGTH:
+                value = value[:96]
+            assert np.array_equal(store['ev_data'][house][key], value), key
+    assert not store['baseloaddata'].flags.writeable
+
+def test_store_and_pickle_give_the_same_simulation(make_simulator, scenario_pickle, tmp_path):
+    from_pickle = make_simulator(data=scenario_pickle)
+    from_pickle.start_simulation(print_progress=False)
+    convert_pickle_to_store(scenario_pickle, str(tmp_path / 'store'))
+    from_store = make_simulator(data=str(tmp_path / 'store'))
+    from_store.start_simulation(print_progress=False)
+
+    assert np.array_equal(from_pickle.total_load, from_store.total_load)
+    assert_same_results(house_results(from_pickle), house_results(from_store))
+
+def test_store_is_smaller_than_requested(scenario_store):
+    with pytest.raises(ValueError, match=f"number_of_houses <= {NUMBER_OF_HOUSES}"):
+        load_store(scenario_store, NUMBER_OF_HOUSES + 1, SIM_LENGTH)
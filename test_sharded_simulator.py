@@ -0,0 +1,42 @@
+import os.path
+import numpy as np
+
+import main
+from Fleet import fleet_strategy
+from ShardedSimulator import ShardedSimulator
+from Simulator import StrategyOrder
+from conftest import NUMBER_OF_HOUSES, SIM_LENGTH, noop
+
+def neighborhood_load(fleet):
+    return (fleet.base_load + fleet.pv.consumption).sum()
+
+@fleet_strategy(aggregates={'load': neighborhood_load})
+def shared_battery_strategy(time_step, temperature_data, renewable_share, fleet, aggregates):
+    # every battery takes its share of the load of the whole neighborhood
+    share = aggregates['load'] / NUMBER_OF_HOUSES
+    fleet.batt.consumption[:] = np.minimum(np.maximum(-share, fleet.batt.min), fleet.batt.max)
+
+def simulate_sharded(scenario_store : str, control_order, neighborhood_strategy, house_strategy) -> ShardedSimulator:
+    sharded = ShardedSimulator(control_order, noop, main.hp_strategy, main.pv_strategy, main.ev_strategy,
+                               neighborhood_strategy, house_strategy, number_of_workers=3)
+    sharded.initialize(SIM_LENGTH, NUMBER_OF_HOUSES, scenario_store, os.path.join(scenario_store, 'reference_load.npy'))
+    sharded.start_simulation()
+    return sharded
+
+def test_sharded_matches_single_process(make_simulator, scenario_store):
+    single = make_simulator(battery_strategy=noop, use_fleet=True)
+    single.start_simulation(print_progress=False)
+    sharded = simulate_sharded(scenario_store, [StrategyOrder.INDIVIDUAL, StrategyOrder.HOUSEHOLD], noop,
+                               main.house_strategy)
+
+    # the shards sum their own houses, so only the order of the additions differs
+    np.testing.assert_allclose(sharded.total_load, single.total_load, rtol=1e-12, atol=1e-9)
+
+def test_sharded_aggregates_match_single_process(make_simulator, scenario_store):
+    control_order = [StrategyOrder.INDIVIDUAL, StrategyOrder.NEIGHBORHOOD]
+    single = make_simulator(control_order=control_order, battery_strategy=noop,
+                            neighborhood_strategy=shared_battery_strategy, house_strategy=noop)
+    single.start_simulation(print_progress=False)
+    sharded = simulate_sharded(scenario_store, control_order, shared_battery_strategy, noop)
+
+    np.testing.assert_allclose(sharded.total_load, single.total_load, rtol=1e-12, atol=1e-9)
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from Vizualizer import Vizualizer
+from conftest import SIM_LENGTH
+
+def assert_same_metrics(first : dict, second : dict):
+    assert first.keys() == second.keys()
+    for name, value in first.items():
+        np.testing.assert_array_equal(value, second[name], err_msg=name)
+
+def test_metrics_match_the_history(make_simulator):
+    simulator = make_simulator(streaming_metrics=True)
+    simulator.start_simulation(print_progress=False)
+    metrics = simulator.metrics.results()
+    total_load = simulator.total_load
+
+    expected = Vizualizer(SIM_LENGTH).calculate_metrics_renewable_share_total_load(simulator.ren_share, total_load)
+    for name, value in expected.items():
+        assert metrics[name] == pytest.approx(value, rel=1e-12), name
+    assert metrics['peak_load'] == total_load.max() and metrics['minimum_load'] == total_load.min()
+    assert metrics['average_load'] == pytest.approx(total_load.mean(), rel=1e-12)
+    np.testing.assert_allclose(metrics['daily_profile'], total_load.reshape(-1, 96).mean(axis=0), rtol=1e-12)
+    # the history holds the energy before every step, the metrics the energy after it
+    soc = np.array([np.append(house.batt.energy_history[1:], house.batt.energy) / house.batt.size
+                    for house in simulator.list_of_houses])
+    np.testing.assert_allclose(metrics['batt_soc_mean'], soc.mean(axis=1), rtol=1e-12)
+    assert np.array_equal(metrics['batt_soc_max'], soc.max(axis=1))
+
+@pytest.mark.parametrize('use_fleet', [False, True])
+def test_metrics_without_history_match_with_history(make_simulator, use_fleet):
+    with_history = make_simulator(streaming_metrics=True, use_fleet=use_fleet)
+    with_history.start_simulation(print_progress=False)
+    without_history = make_simulator(streaming_metrics=True, use_fleet=use_fleet, keep_history=False)
+    without_history.start_simulation(print_progress=False)
+
+    assert without_history.list_of_houses[0].batt.energy_history is None
+    assert np.array_equal(with_history.total_load, without_history.total_load)
+    assert_same_metrics(with_history.metrics.results(), without_history.metrics.results())
+
+def test_metrics_are_resumed_from_a_checkpoint(make_simulator, tmp_path):
+    uninterrupted = make_simulator(streaming_metrics=True, keep_history=False)
+    uninterrupted.start_simulation(print_progress=False, checkpoint_interval_days=3,
+                                   checkpoint_dir=str(tmp_path / 'checkpoints'))
+    resumed = make_simulator(streaming_metrics=True, keep_history=False)
+    resumed.load_checkpoint(str(tmp_path / 'checkpoints' / 'day_003.npz'))
+    resumed.start_simulation(print_progress=False)
+
+    assert_same_metrics(uninterrupted.metrics.results(), resumed.metrics.results())
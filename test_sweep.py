@@ -0,0 +1,70 @@
+import json
+import os.path
+import numpy as np
+import pytest
+
+import main
+from ModelClasses import ConstraintViolation
+from Simulator import StrategyOrder
+from Sweep import load_total_load, run_sweep, with_parameters
+from ScenarioStore import read_store_index, source_stamp
+from SyntheticScenario import write_synthetic_pickle
+from Validation import ValidationLevel
+from conftest import noop
+
+def idle_batt_strategy(time_step, temperature_data, renewable_share, batt):
+    batt.consumption[time_step] = 0.0
+
+def overcharging_batt_strategy(time_step, temperature_data, renewable_share, batt):
+    batt.consumption[time_step] = batt.max + 1.0
+
+def charging_batt_strategy(time_step, temperature_data, renewable_share, batt, fraction=1.0):
+    batt.consumption[time_step] = batt.max * fraction
+
+BASE = {'control_order': [StrategyOrder.INDIVIDUAL], 'hp_strategy': main.hp_strategy, 'pv_strategy': main.pv_strategy,
+        'ev_strategy': main.ev_strategy, 'neighborhood_strategy': noop, 'house_strategy': noop}
+
+def sweep(path_to_data : str, cache_dir : str, battery_strategies, validation : ValidationLevel, processes : int = 1):
+    return run_sweep(BASE, {'battery_strategy': battery_strategies}, 96, 5, path_to_data,
+                     os.path.join(os.path.dirname(path_to_data), 'reference_load.npy'), processes=processes,
+                     cache_dir=cache_dir, validation=validation)
+
+def test_sweep_points_match_single_simulations(make_simulator, tmp_path):
+    write_synthetic_pickle(str(tmp_path / 'data'), 5, 1)
+    path_to_data, cache_dir = str(tmp_path / 'data' / 'data.pkl'), str(tmp_path / 'cache')
+    strategies = [idle_batt_strategy, with_parameters(charging_batt_strategy, fraction=0.5)]
+    rows = sweep(path_to_data, cache_dir, strategies, ValidationLevel.FULL, processes=2)
+
+    assert [row['battery_strategy'] for row in rows] == ['test_sweep.idle_batt_strategy',
+                                                         'test_sweep.charging_batt_strategy(fraction=0.5)']
+    for row, strategy in zip(rows, strategies):
+        simulator = make_simulator(sim_length=96, number_of_houses=5, data=path_to_data, battery_strategy=strategy,
+                                   use_fleet=True, **BASE)
+        simulator.start_simulation(print_progress=False)
+        assert np.array_equal(load_total_load(cache_dir, row['hash']), simulator.total_load)
+
+def test_cached_point_is_validated_again_with_a_stronger_level(tmp_path):
+    write_synthetic_pickle(str(tmp_path / 'data'), 5, 1)
+    path_to_data, cache_dir = str(tmp_path / 'data' / 'data.pkl'), str(tmp_path / 'cache')
+    rows = sweep(path_to_data, cache_dir, [idle_batt_strategy, overcharging_batt_strategy], ValidationLevel.OFF)
+
+    # the point that passed without checks is not taken from the cache by a sweep with checks
+    with pytest.raises(ConstraintViolation):
+        sweep(path_to_data, cache_dir, [overcharging_batt_strategy], ValidationLevel.FULL)
+    # a point that was checked is used by a sweep with the same or a weaker level
+    assert sweep(path_to_data, cache_dir, [idle_batt_strategy], ValidationLevel.FULL) == rows[:1]
+    with open(os.path.join(cache_dir, rows[0]['hash'] + ".json")) as f:
+        assert json.load(f)['validation'] == 'FULL'
+    assert sweep(path_to_data, cache_dir, [idle_batt_strategy], ValidationLevel.SAMPLED) == rows[:1]
+
+def test_changed_data_is_converted_and_simulated_again(tmp_path):
+    write_synthetic_pickle(str(tmp_path / 'data'), 5, 1, seed=0)
+    path_to_data, cache_dir = str(tmp_path / 'data' / 'data.pkl'), str(tmp_path / 'cache')
+    first = sweep(path_to_data, cache_dir, [idle_batt_strategy], ValidationLevel.FULL)
+    assert sweep(path_to_data, cache_dir, [idle_batt_strategy], ValidationLevel.FULL) == first
+
+    write_synthetic_pickle(str(tmp_path / 'data'), 5, 1, seed=1)
+    second = sweep(path_to_data, cache_dir, [idle_batt_strategy], ValidationLevel.FULL)
+    assert read_store_index(os.path.join(cache_dir, 'store'))['source'] == source_stamp(path_to_data)
+    assert second[0]['hash'] != first[0]['hash']
+    assert second[0]['energy_import'] != first[0]['energy_import']
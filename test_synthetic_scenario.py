@@ -0,0 +1,37 @@
+import numpy as np
+
+import SyntheticScenario
+from Benchmark import PHASES, benchmark_simulation
+from ScenarioStore import load_store
+from SyntheticScenario import generate_scenario, write_synthetic_store
+
+def test_store_has_the_houses_of_the_scenario(tmp_path, monkeypatch):
+    # the store is generated a few houses at a time, which must not change the houses
+    monkeypatch.setattr(SyntheticScenario, 'HOUSE_CHUNK_SIZE', 3)
+    write_synthetic_store(str(tmp_path / 'store'), 7, 2, seed=4)
+    store = load_store(str(tmp_path / 'store'), 7, 192)
+    scenario_data, reference_load = generate_scenario(7, 2, seed=4)
+
+    for key in ['baseloaddata', 'irrdata', 'ren_share']:
+        assert np.array_equal(store[key], scenario_data[key]), key
+    for key, value in scenario_data['hp_data'].items():
+        assert np.array_equal(store['hp_data'][key], value), key
+    for stored, ev in zip(store['ev_data'], scenario_data['ev_data']):
+        for key, value in ev.items():
+            assert np.array_equal(stored[key], value), key
+    # the reference load is summed per chunk of houses
+    np.testing.assert_allclose(np.load(str(tmp_path / 'store' / 'reference_load.npy')), reference_load, rtol=1e-12)
+
+def test_scenario_depends_only_on_the_seed():
+    first, _ = generate_scenario(3, 1, seed=2)
+    again, _ = generate_scenario(3, 1, seed=2)
+    other, _ = generate_scenario(3, 1, seed=3)
+    assert np.array_equal(first['baseloaddata'], again['baseloaddata'])
+    assert np.array_equal(first['hp_data']['v_part'], again['hp_data']['v_part'])
+    assert not np.array_equal(first['baseloaddata'], other['baseloaddata'])
+
+def test_benchmark_times_every_phase(scenario_store):
+    result = benchmark_simulation(5, 1, scenario_store)
+    assert all(result[phase] > 0 for phase in PHASES)
+    # initialize comes before the simulation, the other phases are part of it
+    assert sum(result[phase] for phase in PHASES if phase != 'initialize') <= result['simulation']
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+START = 96
+STEPS = 48
+
+def test_batched_model_matches_heat_pumps(make_simulator):
+    houses = make_simulator().list_of_houses
+    model = make_simulator(use_fleet=True).fleet.hp.thermal_model
+    temperatures = np.array([house.hp.temperatures for house in houses], dtype=np.float64)
+    T_set = np.array([house.hp.T_set for house in houses])
+    rng = np.random.default_rng(0)
+
+    for time_step in range(96):
+        heat_demand = model.heat_demand_house(time_step, temperatures, T_set)
+        assert np.array_equal(heat_demand, [house.hp.calculate_heat_demand_house(time_step, house.hp.T_set)
+                                            for house in houses])
+        heat_power = rng.uniform(0.0, 1.5, len(houses)) * heat_demand / 900
+        model.update_temperatures(time_step, temperatures, heat_power)
+        for house, power in zip(houses, heat_power):
+            house.hp._update_house_temperatures(time_step, power)
+        assert np.array_equal(temperatures, [house.hp.temperatures for house in houses])
+
+    # a selection of the houses computes the same as the whole model, up to the rounding of the smaller matmul
+    selected = np.array([3, 0, 3])
+    np.testing.assert_allclose(model.select(selected).free_temperatures(96, temperatures[selected]),
+                               model.free_temperatures(96, temperatures)[selected], rtol=1e-12)
+
+@pytest.mark.parametrize('use_fleet', [False, True])
+def test_simulate_schedule_matches_stepping(make_simulator, use_fleet):
+    stepped = make_simulator(sim_length=START + STEPS, use_fleet=use_fleet)
+    stepped.start_simulation(print_progress=False)
+    consumption = np.stack([np.asarray(house.hp.consumption.values[START:], dtype=np.float64)
+                            for house in stepped.list_of_houses], axis=1)
+
+    planned = make_simulator(sim_length=START + STEPS, use_fleet=use_fleet)
+    for time_step in range(START):
+        planned.do_time_step(time_step)
+    tank_T_before = [house.hp.tank_T for house in planned.list_of_houses]
+    if use_fleet:
+        temperatures, tank_T, _ = planned.fleet.hp.simulate_schedule(START, consumption)
+    else:
+        schedules = [house.hp.simulate_schedule(START, consumption[:, index])
+                     for index, house in enumerate(planned.list_of_houses)]
+        temperatures = np.stack([schedule[0] for schedule in schedules], axis=1)
+        tank_T = np.stack([schedule[1] for schedule in schedules], axis=1)
+
+    # the schedule of the stepped simulation gives its temperatures after the last step
+    np.testing.assert_allclose(temperatures[-1], [house.hp.temperatures for house in stepped.list_of_houses], rtol=1e-10)
+    np.testing.assert_allclose(tank_T[-1], [house.hp.tank_T for house in stepped.list_of_houses], rtol=1e-10)
+    # without changing the state of the simulation it predicted from
+    assert [house.hp.tank_T for house in planned.list_of_houses] == tank_T_before
+
+def test_heated_trajectory_reports_the_iterations_it_ran(make_simulator):
+    # the first guess heats every step, which is wrong for houses far above their set point
+    simulator = make_simulator(sim_length=START + STEPS, use_fleet=True)
+    hp = simulator.fleet.hp
+    with pytest.raises(ValueError, match="in 1 iterations"):
+        hp.thermal_model.heated_trajectory(0, hp.temperatures, hp.T_set - 10.0, STEPS, max_iterations=1)
@@ -0,0 +1,42 @@
+import pickle
+import pytest
+
+from ModelClasses import ConstraintViolation
+from Simulator import StrategyOrder
+from Validation import ValidationLevel
+from conftest import noop
+
+VIOLATING_HOUSE = 3
+VIOLATION_TIME_STEP = 150
+
+def overcharging_batt_strategy(time_step, temperature_data, renewable_share, batt):
+    overcharge = time_step == VIOLATION_TIME_STEP and batt.id == VIOLATING_HOUSE
+    batt.consumption[time_step] = batt.max + 1.0 if overcharge else 0.0
+
+def simulate(make_simulator, validation : ValidationLevel, use_fleet : bool, sample_rate : float = 0.1):
+    simulator = make_simulator(sim_length=192, control_order=[StrategyOrder.INDIVIDUAL], house_strategy=noop,
+                               battery_strategy=overcharging_batt_strategy, validation=validation,
+                               validation_sample_rate=sample_rate, use_fleet=use_fleet)
+    simulator.start_simulation(print_progress=False)
+    return simulator
+
+@pytest.mark.parametrize('use_fleet', [False, True])
+@pytest.mark.parametrize('validation, sample_rate', [(ValidationLevel.FULL, 0.1), (ValidationLevel.END_OF_DAY, 0.1),
+                                                     (ValidationLevel.SAMPLED, 1.0)])
+def test_every_level_that_checks_the_time_step_raises_the_same_violation(make_simulator, use_fleet, validation,
+                                                                         sample_rate):
+    with pytest.raises(ConstraintViolation) as violation:
+        simulate(make_simulator, validation, use_fleet, sample_rate)
+    assert violation.value.message == "Charging power should be smaller than power_max"
+    assert violation.value.time_step == VIOLATION_TIME_STEP
+    assert violation.value.house == VIOLATING_HOUSE
+
+def test_no_checks_without_validation(make_simulator):
+    simulator = simulate(make_simulator, ValidationLevel.OFF, True)
+    batt = simulator.list_of_houses[VIOLATING_HOUSE].batt
+    assert batt.consumption[VIOLATION_TIME_STEP] > batt.power_max
+
+def test_violation_can_be_pickled():
+    violation = pickle.loads(pickle.dumps(ConstraintViolation("Energy in battery 3 is below 0", 3, 10)))
+    assert (violation.message, violation.house, violation.time_step) == ("Energy in battery 3 is below 0", 3, 10)
+    assert str(violation) == "Energy in battery 3 is below 0 (house 3, time step 10)"
@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from Vizualizer import decimate, render_many
+
+def test_minmax_keeps_the_extremes_of_every_bucket():
+    values = np.random.default_rng(0).normal(size=100_003)
+    indices, decimated = decimate(values, max_points=1000, method='minmax')
+
+    assert len(indices) <= 1000 and np.all(np.diff(indices) >= 0)
+    assert np.array_equal(decimated, values[indices])
+    assert decimated.max() == values.max() and decimated.min() == values.min()
+    # every bucket of 201 values keeps its own minimum and maximum
+    buckets = np.array_split(values, np.arange(201, values.size, 201))
+    assert np.array_equal(decimated[1::2], [bucket.max() if np.argmax(bucket) > np.argmin(bucket) else bucket.min()
+                                            for bucket in buckets])
+
+def test_lttb_keeps_the_ends_and_a_spike():
+    values = np.zeros(10_000)
+    values[4321] = 5.0
+    indices, decimated = decimate(values, max_points=100, method='lttb')
+
+    assert len(indices) == 100 and np.all(np.diff(indices) > 0)
+    assert indices[0] == 0 and indices[-1] == values.size - 1
+    assert 4321 in indices
+
+def test_short_series_are_not_decimated():
+    values = np.arange(10.0)
+    for method in ['minmax', 'lttb']:
+        indices, decimated = decimate(values, max_points=100, method=method)
+        assert np.array_equal(indices, np.arange(10)) and np.array_equal(decimated, values)
+    with pytest.raises(ValueError):
+        decimate(values, method='every_other')
+
+def test_runs_are_rendered_without_a_display(tmp_path):
+    load = np.sin(np.arange(96 * 3) / 10)
+    jobs = [{'path': str(tmp_path / f'run_{run}.png'), 'reference_load': load, 'total_load': load * run,
+             'title': f'run {run}'} for run in range(2)]
+    assert render_many(jobs, processes=1) == [job['path'] for job in jobs]
+    for job in jobs:
+        with open(job['path'], 'rb') as f:
+            assert f.read(8) == b'\x89PNG\r\n\x1a\n'